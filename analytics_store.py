@@ -0,0 +1,175 @@
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Union
+
+import pandas as pd
+import streamlit as st
+
+from db_utils import bulk_fetch_records, BULK_FETCH_ATTRIBUTES
+
+
+# analytics settings (optional "analytics" section in the secrets)
+analytics_settings = st.secrets.get("analytics", {})
+
+ANALYTICS_DB_PATH = analytics_settings.get("DB_PATH", os.path.join(".analytics", "records.sqlite3"))
+ANALYTICS_SYNC_SECONDS = int(analytics_settings.get("SYNC_SECONDS", 60))
+ANALYTICS_RETENTION_DAYS = int(analytics_settings.get("RETENTION_DAYS", 90))
+# records are re-fetched this far behind the watermark in case writes land slightly out of order
+ANALYTICS_SYNC_OVERLAP_SECONDS = int(analytics_settings.get("SYNC_OVERLAP_SECONDS", 300))
+
+RECORD_COLUMNS = list(BULK_FETCH_ATTRIBUTES)
+
+
+class AnalyticsStore:
+    """
+    Local SQLite snapshot of the upload records of one DynamoDB table.
+
+    sync() only fetches the records newer than the last synced creation_date
+    watermark; the dashboard views are then answered from the local copy.
+    """
+
+    def __init__(self, table_name: str, db_path: str = ANALYTICS_DB_PATH):
+        self.table_name = table_name
+        self.db_path = db_path
+        self._sync_lock = threading.Lock()
+
+        with contextlib.closing(self._connect()) as connection, connection:
+            connection.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS records (
+                    table_name TEXT NOT NULL,
+                    {", ".join(f"{column} TEXT" for column in RECORD_COLUMNS)},
+                    PRIMARY KEY (table_name, data_id)
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS records_creation_date ON records (table_name, creation_date)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state (table_name TEXT PRIMARY KEY, watermark TEXT, synced_at REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def sync_state(self) -> Dict:
+        """
+        Return the last synced watermark and the time of the last sync.
+        """
+        with contextlib.closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT watermark, synced_at FROM sync_state WHERE table_name = ?", (self.table_name,)
+            ).fetchone()
+
+        return {"watermark": row[0] if row else None, "synced_at": row[1] if row else None}
+
+    def sync(self, force: bool = False) -> Dict[str, Union[bool, str, int]]:
+        """
+        Fetch the records created since the watermark into the local store.
+
+        Syncs are skipped if the last one is less than ANALYTICS_SYNC_SECONDS
+        old, unless force is set.
+
+        Returns:
+            Dict: success, message and the number of records fetched
+        """
+        with self._sync_lock:
+            state = self.sync_state()
+            if not force and state["synced_at"] and time.time() - state["synced_at"] < ANALYTICS_SYNC_SECONDS:
+                return {"success": True, "message": "Local analytics are up to date", "fetched": 0}
+
+            retention_start = datetime.utcnow() - timedelta(days=ANALYTICS_RETENTION_DAYS)
+            if state["watermark"]:
+                since = datetime.fromisoformat(state["watermark"]) - timedelta(seconds=ANALYTICS_SYNC_OVERLAP_SECONDS)
+                since = max(since, retention_start)
+            else:
+                since = retention_start
+
+            response = bulk_fetch_records(self.table_name, since.isoformat(), datetime.utcnow().isoformat())
+            if not response["success"]:
+                return {"success": False, "message": response["message"], "fetched": 0}
+
+            columns = response["data"]
+            fetched = len(columns["creation_date"])
+            watermark = state["watermark"]
+            if fetched:
+                # bulk fetches come back oldest first
+                watermark = max(watermark or "", columns["creation_date"][-1])
+
+            with contextlib.closing(self._connect()) as connection, connection:
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO records (table_name, {', '.join(RECORD_COLUMNS)}) VALUES (?{', ?' * len(RECORD_COLUMNS)})",
+                    zip([self.table_name] * fetched, *(columns[column] for column in RECORD_COLUMNS))
+                )
+                connection.execute(
+                    "DELETE FROM records WHERE table_name = ? AND creation_date < ?",
+                    (self.table_name, retention_start.isoformat())
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO sync_state (table_name, watermark, synced_at) VALUES (?, ?, ?)",
+                    (self.table_name, watermark, time.time())
+                )
+
+        return {"success": True, "message": f"Synced {fetched} new records", "fetched": fetched}
+
+    def get_recent_records(self, days: int = 14) -> Dict[str, Union[bool, str, pd.DataFrame]]:
+        """
+        Local equivalent of db_utils.get_recent_records.
+
+        Returns:
+            Dict: success, message and the records as a DataFrame, newest first
+        """
+        start_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+        try:
+            with contextlib.closing(self._connect()) as connection, connection:
+                df = pd.read_sql_query(
+                    f"SELECT {', '.join(RECORD_COLUMNS)} FROM records WHERE table_name = ? AND creation_date >= ? ORDER BY creation_date DESC",
+                    connection,
+                    params=(self.table_name, start_date)
+                )
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error reading local analytics: {str(e)}',
+                'data': None
+            }
+
+        if df.empty:
+            return {
+                'success': True,
+                'message': 'No records found in the specified date range',
+                'data': pd.DataFrame()
+            }
+
+        df['creation_date'] = pd.to_datetime(df['creation_date'])
+        return {
+            'success': True,
+            'message': f'Successfully retrieved {len(df)} records',
+            'data': df
+        }
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_analytics_store(table_name: str) -> AnalyticsStore:
+    """
+    Return the process-wide analytics store for a table.
+    """
+    with _STORES_LOCK:
+        store = _STORES.get(table_name)
+        if store is None:
+            store = AnalyticsStore(table_name)
+            _STORES[table_name] = store
+
+    return store
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+import streamlit as st
+
+
+os.environ["AWS_ACCESS_KEY_ID"] = st.secrets["aws"]["AWS_ACCESS_KEY"]
+os.environ["AWS_SECRET_ACCESS_KEY"] = st.secrets["aws"]["AWS_SECRET_KEY"]
+os.environ["AWS_REGION"] = st.secrets["aws"]["REGION_NAME"]
+
+# connection settings (optional overrides in the "aws" secrets section)
+AWS_MAX_POOL_CONNECTIONS = int(st.secrets["aws"].get("MAX_POOL_CONNECTIONS", 32))
+AWS_MAX_ATTEMPTS = int(st.secrets["aws"].get("MAX_ATTEMPTS", 5))
+AWS_RETRY_MODE = st.secrets["aws"].get("RETRY_MODE", "adaptive")
+
+BOTO_CONFIG = Config(
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60,
+    retries={"mode": AWS_RETRY_MODE, "max_attempts": AWS_MAX_ATTEMPTS}
+)
+
+_SESSION = None
+_GENERATION = 0
+_CLIENTS = {}
+_LOCK = threading.Lock()
+_THREAD_RESOURCES = threading.local()
+
+
+def get_session() -> boto3.Session:
+    """
+    Return the process-wide boto3 session, resolving credentials only once.
+
+    Module state survives Streamlit reruns, so every rerun and worker thread
+    shares the same session.
+    """
+    global _SESSION
+
+    with _LOCK:
+        if _SESSION is None:
+            _SESSION = boto3.Session(
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name=os.getenv('AWS_REGION')
+            )
+
+    return _SESSION
+
+
+def get_client(service_name: str):
+    """
+    Return the shared low-level client for a service (e.g. 's3', 'dynamodb').
+
+    boto3 clients are thread-safe, so one pooled client per service is shared
+    by all threads. A local stand-in can be targeted with AWS_ENDPOINT_URL.
+    """
+    session = get_session()
+
+    with _LOCK:
+        client = _CLIENTS.get(service_name)
+        if client is None:
+            client = session.client(service_name, config=BOTO_CONFIG)
+            _CLIENTS[service_name] = client
+
+    return client
+
+
+def get_resource(service_name: str):
+    """
+    Return a resource for a service, cached per thread.
+
+    boto3 resources are not thread-safe, so each thread gets its own, created
+    from the shared session with the same pooled connection config.
+    """
+    if getattr(_THREAD_RESOURCES, "generation", None) != _GENERATION:
+        _THREAD_RESOURCES.generation = _GENERATION
+        _THREAD_RESOURCES.resources = {}
+    resources = _THREAD_RESOURCES.resources
+
+    resource = resources.get(service_name)
+    if resource is None:
+        session = get_session()
+        # creating objects from a shared session is not thread-safe
+        with _LOCK:
+            resource = session.resource(service_name, config=BOTO_CONFIG)
+        resources[service_name] = resource
+
+    return resource
+
+
+def reset_clients() -> None:
+    """
+    Drop the cached session, clients and per-thread resources, e.g. after
+    credentials or the endpoint change.
+    """
+    global _SESSION, _GENERATION
+
+    with _LOCK:
+        _SESSION = None
+        _GENERATION += 1
+        _CLIENTS.clear()
@@ -0,0 +1,77 @@
+"""
+Rebuild the daily upload rollups from the existing upload records.
+
+Every day of the window gets its rollup item overwritten with counts taken
+from the records, including days without uploads. Uploads saved while the
+backfill runs may be missed, so run it when the app is quiet.
+
+Usage:
+    python backfill_rollups.py --days 365
+    python backfill_rollups.py --days 90 --dry-run
+"""
+import argparse
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from db_utils import bulk_fetch_records, put_daily_rollups
+
+
+os.environ["ENV"] = st.secrets["aws"]["ENV"]
+
+DB_TABLE_NAME = f"{os.environ['ENV']}-reefcheck"
+
+
+def count_uploads(table_name: str, days: int) -> tuple:
+    """
+    Count the successful uploads per day and user over the last days.
+
+    Returns:
+        tuple: (day -> user_id -> uploads, user_id -> user name)
+    """
+    end_date = datetime.utcnow()
+    start_day = end_date.date() - timedelta(days=days - 1)
+    response = bulk_fetch_records(
+        table_name,
+        datetime.combine(start_day, datetime.min.time()).isoformat(),
+        end_date.isoformat(),
+        attributes=('creation_date', 'user_id', 'user_name')
+    )
+    if not response['success']:
+        raise RuntimeError(response['message'])
+
+    counts = {(start_day + timedelta(days=offset)).isoformat(): defaultdict(int) for offset in range(days)}
+    user_names = {}
+    columns = response['data']
+    for creation_date, user_id, user_name in zip(columns['creation_date'], columns['user_id'], columns['user_name']):
+        counts.setdefault(creation_date[:10], defaultdict(int))[user_id] += 1
+        user_names[user_id] = user_name
+
+    return {day: dict(user_counts) for day, user_counts in counts.items()}, user_names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", default=DB_TABLE_NAME, help="Records table to rebuild the rollups of")
+    parser.add_argument("--days", type=int, default=365, help="Number of days to rebuild, including today")
+    parser.add_argument("--dry-run", action="store_true", help="Print the counts without writing them")
+    args = parser.parse_args()
+
+    counts, user_names = count_uploads(args.table, args.days)
+    total = sum(sum(user_counts.values()) for user_counts in counts.values())
+    print(f"Counted {total} uploads by {len(user_names)} users over {len(counts)} days")
+
+    if args.dry_run:
+        for day, user_counts in sorted(counts.items()):
+            if user_counts:
+                print(day, sum(user_counts.values()))
+        return
+
+    result = put_daily_rollups(args.table, counts, user_names)
+    print(result['message'])
+
+
+if __name__ == "__main__":
+    main()
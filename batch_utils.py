@@ -0,0 +1,161 @@
+import asyncio
+import concurrent.futures
+import time
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from utils import handle_image_orientation
+from image_utils import preprocess_slate_image
+from llm import image_label_generator_tiled_async, image_label_generator_fish_invert_async
+from llm import recheck_unclear_substrate, recheck_unclear_fish_invert
+from llm import repair_substrate_labels, repair_fish_invert_labels
+from llm import segment_crop_regions
+from llm import RateLimitGate, submit_coroutine, RECHECK_UNCLEAR, TILE_SEGMENTS
+
+
+# constants
+BATCH_MAX_CONCURRENCY = 4
+BATCH_MAX_RETRIES = 5
+
+SLATE_GENERATORS = {
+    "substrate": image_label_generator_tiled_async,
+    "fish_and_invert": image_label_generator_fish_invert_async,
+}
+
+# alignment to the slate layout, re-requesting sections that cannot be repaired
+SLATE_REPAIRERS = {
+    "substrate": repair_substrate_labels,
+    "fish_and_invert": repair_fish_invert_labels,
+}
+
+# second pass over the cells the first extraction marked unclear
+SLATE_RECHECKERS = {
+    "substrate": recheck_unclear_substrate,
+    "fish_and_invert": recheck_unclear_fish_invert,
+}
+
+# regions of the slate sent as separate cropped requests
+SLATE_REGION_FINDERS = {
+    "substrate": segment_crop_regions,
+}
+
+
+async def crop_region_kwargs(slate_type: str, model_image: bytes) -> Dict:
+    """
+    crop_regions keyword for the generator, repairer and rechecker of a slate.
+
+    The regions are found once per slate and off the event loop, instead of
+    by each of the three steps; empty for slate types without regions or
+    when tiling is disabled.
+    """
+    finder = SLATE_REGION_FINDERS.get(slate_type)
+    if finder is None or not TILE_SEGMENTS:
+        return {}
+    return {"crop_regions": await asyncio.to_thread(finder, model_image)}
+
+
+def prepare_model_image(image_bytes: bytes) -> bytes:
+    """
+    Orient and preprocess a raw uploaded slate photo for the model.
+    """
+    image = handle_image_orientation(Image.open(BytesIO(image_bytes)))
+    model_image, _ = preprocess_slate_image(image, source_bytes=len(image_bytes))
+
+    return model_image
+
+
+async def extract_slate_async(
+    image_bytes: bytes,
+    slate_type: str,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    gate: Optional[RateLimitGate] = None,
+    max_retries: int = BATCH_MAX_RETRIES
+) -> Dict:
+    """
+    Preprocess and extract a single slate on the shared event loop.
+
+    Args:
+        image_bytes: Raw bytes of the uploaded slate photo
+        slate_type: "substrate" or "fish_and_invert"
+        semaphore: Limits how many slates are processed at once
+        gate: Rate limit gate shared with the other slates of the batch
+        max_retries: Retries after the first attempt
+
+    Returns:
+        Dict: status, labels (validated model output or None), model_image,
+        seconds and error
+    """
+    semaphore = semaphore or asyncio.Semaphore(1)
+
+    async with semaphore:
+        start = time.perf_counter()
+        model_image = None
+        try:
+            model_image = await asyncio.to_thread(prepare_model_image, image_bytes)
+            regions = await crop_region_kwargs(slate_type, model_image)
+            labels = await SLATE_GENERATORS[slate_type](model_image, gate=gate, max_retries=max_retries, **regions)
+            labels = await SLATE_REPAIRERS[slate_type](model_image, labels, gate=gate, max_retries=max_retries, **regions)
+            if RECHECK_UNCLEAR:
+                labels = await SLATE_RECHECKERS[slate_type](model_image, labels, gate=gate, max_retries=max_retries, **regions)
+        except Exception as error:
+            print(f"Error extracting {slate_type} slate: {str(error)}")
+            return {
+                "status": "failed",
+                "labels": None,
+                "model_image": model_image,
+                "seconds": time.perf_counter() - start,
+                "error": str(error) or type(error).__name__,
+            }
+
+        return {
+            "status": "done",
+            "labels": labels,
+            "model_image": model_image,
+            "seconds": time.perf_counter() - start,
+            "error": None,
+        }
+
+
+def run_batch_extraction(
+    slates: List[Tuple[str, bytes]],
+    slate_type: str,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    on_result: Optional[Callable[[str, Dict], None]] = None
+) -> Dict[str, Dict]:
+    """
+    Extract many slates concurrently, at most max_concurrency at a time.
+
+    on_result is called from the calling thread as each slate finishes, so it
+    is safe to update Streamlit elements from it. If the caller is interrupted
+    (e.g. a Streamlit rerun) the remaining extractions are cancelled.
+
+    Args:
+        slates: List of (name, raw image bytes)
+        slate_type: "substrate" or "fish_and_invert"
+        max_concurrency: Maximum number of extractions in flight
+        on_result: Callback receiving (name, result) as results arrive
+
+    Returns:
+        Dict: name -> result of extract_slate_async
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    gate = RateLimitGate()
+    results = {}
+
+    futures = {
+        submit_coroutine(extract_slate_async(image_bytes, slate_type, semaphore, gate)): name
+        for name, image_bytes in slates
+    }
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            results[name] = future.result()
+            if on_result is not None:
+                on_result(name, results[name])
+    finally:
+        for future in futures:
+            future.cancel()
+
+    return results
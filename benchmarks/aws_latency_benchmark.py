@@ -0,0 +1,63 @@
+"""
+Per-call latency of the S3/DynamoDB helpers against a local stand-in.
+
+Each helper is timed with the pooled clients from aws_clients ("pooled") and
+with the client cache dropped before every call ("fresh"), which is what the
+helpers used to pay when they built a new client/session per call.
+
+Usage:
+    python benchmarks/aws_latency_benchmark.py --calls 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aws_clients import reset_clients
+from s3_utils import upload_fileobj_to_s3
+from db_utils import add_record, get_recent_records
+from benchmarks.local_aws import local_aws
+
+
+TABLE_NAME = "benchmark-reefcheck"
+
+
+def time_calls(call, calls: int, fresh: bool) -> list:
+    latencies = []
+    for _ in range(calls):
+        if fresh:
+            reset_clients()
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    payload = os.urandom(200 * 1024)
+    operations = {
+        "upload_fileobj_to_s3": lambda: upload_fileobj_to_s3(payload, f"bench/{uuid.uuid4()}.png", "image/png"),
+        "add_record": lambda: add_record(TABLE_NAME, str(uuid.uuid4()), "user", "User", "image", "excel", "success"),
+        "get_recent_records": lambda: get_recent_records(TABLE_NAME, days=7),
+    }
+
+    with local_aws(table_name=TABLE_NAME, bucket_name=os.environ["AWS_BUCKET_NAME"]):
+        print(f"{'operation':<24}{'mode':<8}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, operation in operations.items():
+            for mode in ("fresh", "pooled"):
+                latencies = sorted(time_calls(operation, args.calls, fresh=mode == "fresh"))
+                p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+                print(f"{name:<24}{mode:<8}{statistics.median(latencies):>10.1f}{p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compare get_recent_records with the projected, concurrent bulk fetch on a
+large records table in a local DynamoDB stand-in.
+
+The table is filled with --records uploads spread over --days days, then the
+full window is fetched with the paginated query (all attributes, list of
+dicts) and with bulk_fetch_records for several segment counts.
+
+moto answers every query page by scanning the whole table in the benchmark
+process, so its timings are dominated by the stand-in itself. For numbers
+that reflect concurrent sub-range queries, point the benchmark at DynamoDB
+Local instead (docker run -p 8000:8000 amazon/dynamodb-local).
+
+Usage:
+    python benchmarks/bulk_fetch_benchmark.py --records 100000 --days 90
+    python benchmarks/bulk_fetch_benchmark.py --records 100000 --endpoint http://localhost:8000
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aws_clients import reset_clients
+from db_utils import get_recent_records, bulk_fetch_records
+from benchmarks.local_aws import local_aws, create_records_table
+
+
+TABLE_NAME = "benchmark-reefcheck"
+
+
+def _write_chunk(rows: list) -> None:
+    client = boto3.client("dynamodb")
+    for start in range(0, len(rows), 25):
+        request_items = {TABLE_NAME: [{"PutRequest": {"Item": row}} for row in rows[start:start + 25]]}
+        while request_items:
+            request_items = client.batch_write_item(RequestItems=request_items).get("UnprocessedItems")
+
+
+def fill_table(records: int, days: int) -> None:
+    end_date = datetime.utcnow()
+    step = timedelta(days=days) / records
+    rows = []
+    for index in range(records):
+        data_id = str(uuid.uuid4())
+        user_index = index % 40
+        rows.append({
+            "data_id": {"S": data_id},
+            "user_id": {"S": f"user-{user_index}"},
+            "user_name": {"S": f"Diver {user_index}"},
+            "creation_date": {"S": (end_date - step * index).isoformat()},
+            "image_url": {"S": f"https://bucket.s3.amazonaws.com/prod/substrate/user_{user_index}/images/{data_id}.png"},
+            "excel_url": {"S": f"https://bucket.s3.amazonaws.com/prod/substrate/user_{user_index}/excel/{data_id}.xlsx"},
+            "status": {"S": "success"},
+        })
+
+    chunk_size = 2500
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(_write_chunk, [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--endpoint", help="DynamoDB endpoint to use instead of a moto server, e.g. DynamoDB Local")
+    args = parser.parse_args()
+
+    if args.endpoint:
+        os.environ["AWS_ENDPOINT_URL"] = args.endpoint
+        reset_clients()
+        create_records_table(TABLE_NAME)
+        stand_in = contextlib.nullcontext()
+    else:
+        stand_in = local_aws(table_name=TABLE_NAME)
+
+    with stand_in:
+        start = time.perf_counter()
+        fill_table(args.records, args.days)
+        print(f"Loaded {args.records} records in {time.perf_counter() - start:.1f} s")
+
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=args.days + 1)
+
+        print(f"{'mode':<28}{'seconds':>10}{'records':>10}")
+        start = time.perf_counter()
+        response = get_recent_records(TABLE_NAME, days=args.days + 1)
+        print(f"{'get_recent_records':<28}{time.perf_counter() - start:>10.2f}{len(response['data']):>10}")
+
+        for segments in args.segments:
+            start = time.perf_counter()
+            response = bulk_fetch_records(TABLE_NAME, start_date.isoformat(), end_date.isoformat(), segments=segments)
+            seconds = time.perf_counter() - start
+            print(f"{f'bulk_fetch_records x{segments}':<28}{seconds:>10.2f}{len(response['data']['data_id']):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+End-to-end extraction benchmark over a folder of fixture slates, offline.
+
+Every image in the folder goes through the save pipeline of the pages:
+orientation, encode (preprocessing), grid (crop regions), model,
+validation (repair), recheck, dataframe, workbook and, with --upload, the
+S3 upload and record commit against a local stand-in (benchmarks/local_aws.py). The model calls are
+answered from recordings (llm.set_replay_mode), reproducing the recorded
+latency times --latency-scale, so runs are repeatable and free.
+
+A <image stem>.json next to an image holds its ground truth
+(SegmentationLabels / SegmentationLabelsFishInvert output or a saved result
+document); the per-cell accuracy of the extraction against it is reported.
+
+Record the fixtures once against the live API, then replay them:
+    python benchmarks/extraction_benchmark.py fixtures/substrate --mode record
+    python benchmarks/extraction_benchmark.py fixtures/substrate --latency-scale 0
+    python benchmarks/extraction_benchmark.py fixtures/fish --slate-type fish_and_invert --upload
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from io import BytesIO
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import set_replay_mode, submit_coroutine, RECHECK_UNCLEAR
+from batch_utils import SLATE_GENERATORS, SLATE_REPAIRERS, SLATE_RECHECKERS, crop_region_kwargs
+from utils import handle_image_orientation
+from utils import create_substrate_dataframe, substrate_excel_data_extractor, substrate_excel_creation
+from utils import create_fish_slate_dataframe, fish_excel_data_extractor, fish_slate_excel_creation
+from image_utils import preprocess_slate_image
+from substrate_grid import SubstrateGrid
+from fish_slate import FishSlate
+from validation import repair_substrate, repair_fish_invert
+from db_utils import add_record
+from s3_utils import upload_artifacts, upload_bucket_path
+from slate_results import build_result_document, encode_result, RESULT_CONTENT_TYPE
+
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+STAGES = ("orientation", "encode", "grid", "model", "validation", "recheck", "dataframe", "workbook", "upload")
+TABLE_NAME = "benchmark-reefcheck"
+
+
+def fixture_images(folder: str) -> list:
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_SUFFIXES)
+    )
+
+
+def load_truth(image_path: str):
+    truth_path = os.path.splitext(image_path)[0] + ".json"
+    if not os.path.exists(truth_path):
+        return None
+    with open(truth_path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def cell_accuracy(slate_type: str, output: dict, truth: dict) -> tuple:
+    """
+    (matching cells, compared cells, cells flagged unclear) of one slate.
+    Substrate compares the labels of the 160 points, fish/invert the 156 counts.
+    """
+    if slate_type == "substrate":
+        predicted = SubstrateGrid.from_response(repair_substrate(output).output)
+        expected = SubstrateGrid.from_response(repair_substrate(truth).output)
+        compared = expected.label_text() != ""
+        matches = (predicted.label_text() == expected.label_text()) & compared
+        return int(matches.sum()), int(compared.sum()), int((~predicted.clear).sum())
+
+    predicted = FishSlate.from_response(repair_fish_invert(output).output)
+    expected = FishSlate.from_response(repair_fish_invert(truth).output)
+    return int((predicted.counts == expected.counts).sum()), predicted.counts.size, int((~predicted.clear).sum())
+
+
+def run_slate(image_path: str, slate_type: str, upload: bool) -> tuple:
+    """
+    Run one fixture through the pipeline; returns (stage -> seconds, model output dict).
+    """
+    timings = {}
+
+    def timed(stage, function):
+        start = time.perf_counter()
+        result = function()
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    with open(image_path, "rb") as handle:
+        image_bytes = handle.read()
+
+    image = timed("orientation", lambda: handle_image_orientation(Image.open(BytesIO(image_bytes))))
+    model_image, _ = timed("encode", lambda: preprocess_slate_image(image, source_bytes=len(image_bytes)))
+
+    regions = timed("grid", lambda: submit_coroutine(crop_region_kwargs(slate_type, model_image)).result())
+    # use_cache=False: every run pays the (replayed) model latency
+    labels = timed("model", lambda: submit_coroutine(
+        SLATE_GENERATORS[slate_type](model_image, use_cache=False, **regions)
+    ).result())
+    labels = timed("validation", lambda: submit_coroutine(
+        SLATE_REPAIRERS[slate_type](model_image, labels, use_cache=False, **regions)
+    ).result())
+    if RECHECK_UNCLEAR:
+        labels = timed("recheck", lambda: submit_coroutine(
+            SLATE_RECHECKERS[slate_type](model_image, labels, use_cache=False, **regions)
+        ).result())
+    output = labels.model_dump()
+
+    if slate_type == "substrate":
+        data, info = timed("dataframe", lambda: create_substrate_dataframe(dict(output)))
+        edited = SubstrateGrid.from_dataframe(data)
+        excel_bytes = timed("workbook", lambda: substrate_excel_creation(
+            substrate_excel_data_extractor(data), info[0] if info else {}
+        ))
+        info = info[0] if info else {}
+    else:
+        data = timed("dataframe", lambda: create_fish_slate_dataframe(output))
+        edited = fish_excel_data_extractor(data)
+        excel_bytes = timed("workbook", lambda: fish_slate_excel_creation(edited, {}))
+        info = {}
+
+    if upload:
+        timed("upload", lambda: upload_slate(image_bytes, excel_bytes, slate_type, edited, info, output))
+
+    return timings, output
+
+
+def upload_slate(image_bytes: bytes, excel_bytes: bytes, slate_type: str, edited, info: dict, output: dict) -> None:
+    """
+    The artifact upload and record commit of a save, as done by the pages.
+    """
+    data_id = str(uuid.uuid4())
+    paths = {kind: upload_bucket_path("benchmark", "bench", kind, slate_type, data_id) for kind in ("image", "excel", "result")}
+    result = encode_result(build_result_document(data_id, slate_type, edited, info, output))
+    artifacts = {
+        "image": (image_bytes, paths["image"], "image/png"),
+        "excel": (excel_bytes, paths["excel"], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+        "result": (result, paths["result"], RESULT_CONTENT_TYPE),
+    }
+    response = upload_artifacts(artifacts, commit=lambda urls: add_record(
+        TABLE_NAME, data_id, "bench", "Benchmark", urls["image"], urls["excel"], "success",
+        additional_attributes={"result_key": paths["result"]}
+    ))
+    if not response["success"]:
+        raise RuntimeError(response["message"])
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of fixture images (and <stem>.json ground truth)")
+    parser.add_argument("--slate-type", choices=tuple(SLATE_GENERATORS), default="substrate")
+    parser.add_argument("--mode", choices=("replay", "record", "live"), default="replay")
+    parser.add_argument("--recordings", help="Recorded responses, default <folder>/recordings")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Replayed model latency factor, 0 for none")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--upload", action="store_true", help="Time the upload against a local S3/DynamoDB (needs moto)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    images = fixture_images(args.folder)
+    if not images:
+        parser.error(f"No images in {args.folder}")
+    set_replay_mode(
+        "off" if args.mode == "live" else args.mode,
+        args.recordings or os.path.join(args.folder, "recordings"),
+        args.latency_scale
+    )
+
+    aws = contextlib.nullcontext()
+    if args.upload:
+        from benchmarks.local_aws import local_aws
+        aws = local_aws(table_name=TABLE_NAME, bucket_name=os.environ["AWS_BUCKET_NAME"])
+
+    timings = defaultdict(list)
+    matches = compared = unclear = failed = 0
+    with aws:
+        for _ in range(args.repeat):
+            for image_path in images:
+                try:
+                    slate_timings, output = run_slate(image_path, args.slate_type, args.upload)
+                except Exception as error:
+                    print(f"{os.path.basename(image_path)}: {type(error).__name__}: {error}")
+                    failed += 1
+                    continue
+                for stage, seconds in slate_timings.items():
+                    timings[stage].append(seconds * 1000)
+                timings["total"].append(sum(slate_timings.values()) * 1000)
+
+                truth = load_truth(image_path)
+                if truth is not None:
+                    slate_matches, slate_compared, slate_unclear = cell_accuracy(args.slate_type, output, truth)
+                    matches += slate_matches
+                    compared += slate_compared
+                    unclear += slate_unclear
+
+    report = {"slates": len(images) * args.repeat, "failed": failed, "stages": {}}
+    print(f"{'stage':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage in STAGES + ("total",):
+        values = timings.get(stage)
+        if not values:
+            continue
+        report["stages"][stage] = {
+            "mean": statistics.fmean(values), "p50": statistics.median(values),
+            "p95": percentile(values, 0.95), "max": max(values),
+        }
+        row = report["stages"][stage]
+        print(f"{stage:<14}{row['mean']:>10.1f}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['max']:>10.1f}")
+
+    if compared:
+        report["cell_accuracy"] = matches / compared
+        report["cells_compared"] = compared
+        report["cells_unclear"] = unclear
+        print(f"\ncell accuracy  {matches}/{compared} = {matches / compared:.2%}, {unclear} cells flagged unclear")
+    if failed:
+        print(f"{failed} slates failed")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
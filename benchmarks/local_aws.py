@@ -0,0 +1,76 @@
+"""
+Local S3/DynamoDB stand-in for the benchmarks, backed by moto's server mode.
+
+moto is a development dependency only: pip install "moto[server]"
+"""
+import contextlib
+import logging
+import os
+import socket
+
+import boto3
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def create_records_table(table_name: str) -> None:
+    """
+    Create the records table with the CreationDateIndex GSI used by db_utils.
+    """
+    dynamodb = boto3.client("dynamodb")
+    dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "data_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "data_id", "AttributeType": "S"},
+            {"AttributeName": "status", "AttributeType": "S"},
+            {"AttributeName": "creation_date", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[{
+            "IndexName": "CreationDateIndex",
+            "KeySchema": [
+                {"AttributeName": "status", "KeyType": "HASH"},
+                {"AttributeName": "creation_date", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+@contextlib.contextmanager
+def local_aws(table_name: str = None, bucket_name: str = None):
+    """
+    Run a moto server on localhost and point boto3 (and aws_clients) at it.
+    """
+    from moto.server import ThreadedMotoServer
+    from aws_clients import reset_clients
+
+    # keep the request log of the stand-in out of the benchmark output
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    port = _free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    previous_endpoint = os.environ.get("AWS_ENDPOINT_URL")
+    os.environ["AWS_ENDPOINT_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("AWS_DEFAULT_REGION", os.environ.get("AWS_REGION", "us-east-1"))
+    reset_clients()
+
+    try:
+        if bucket_name:
+            boto3.client("s3").create_bucket(Bucket=bucket_name)
+        if table_name:
+            create_records_table(table_name)
+        yield os.environ["AWS_ENDPOINT_URL"]
+    finally:
+        server.stop()
+        if previous_endpoint is None:
+            os.environ.pop("AWS_ENDPOINT_URL", None)
+        else:
+            os.environ["AWS_ENDPOINT_URL"] = previous_endpoint
+        reset_clients()
@@ -0,0 +1,129 @@
+"""
+Compare extraction latency and accuracy for different preprocessing settings.
+
+Fixtures are a folder of slate photos, each next to a ground truth JSON file
+with the same stem (e.g. slate_01.jpg + slate_01.json). Ground truth files use
+the SegmentationLabels or SegmentationLabelsFishInvert JSON layout.
+
+Usage:
+    python benchmarks/preprocess_benchmark.py --fixtures fixtures/slates --long-edges 0 3072 2048 1536 1024
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import handle_image_orientation
+from image_utils import preprocess_slate_image
+from llm import image_label_generator, image_label_generator_fish_invert
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_fixtures(fixtures_dir: str) -> list:
+    fixtures = []
+    for file_name in sorted(os.listdir(fixtures_dir)):
+        stem, extension = os.path.splitext(file_name)
+        truth_path = os.path.join(fixtures_dir, f"{stem}.json")
+        if extension.lower() not in IMAGE_EXTENSIONS or not os.path.exists(truth_path):
+            continue
+        with open(truth_path, "r", encoding="utf-8") as truth_file:
+            truth = json.load(truth_file)
+        fixtures.append((os.path.join(fixtures_dir, file_name), truth))
+
+    return fixtures
+
+
+def cell_accuracy(predicted: dict, truth: dict) -> tuple:
+    """
+    Count matching cells between a prediction and the ground truth.
+
+    Substrate cells are matched by segment and distance, fish/invert cells by
+    group, species name and distance column.
+    """
+    correct, total = 0, 0
+    if "segment_one" in truth:
+        for segment in ("segment_one", "segment_two", "segment_three", "segment_four"):
+            predicted_labels = {float(row["distance"]): row["label"] for row in predicted.get(segment, [])}
+            for row in truth[segment]:
+                total += 1
+                correct += predicted_labels.get(float(row["distance"])) == row["label"]
+    else:
+        columns = ("distance_one", "distance_two", "distance_three", "distance_four")
+        for group, rows in truth.items():
+            predicted_rows = {row["name"].strip().lower(): row for row in predicted.get(group, [])}
+            for row in rows:
+                match = predicted_rows.get(row["name"].strip().lower(), {})
+                for column in columns:
+                    total += 1
+                    correct += match.get(column) == row[column]
+
+    return correct, total
+
+
+def run_setting(fixtures: list, long_edge: int, format_: str, quality: int) -> dict:
+    config = {"enabled": long_edge > 0, "long_edge": long_edge or 1, "format": format_, "quality": quality}
+    latencies, bytes_before, bytes_after = [], 0, 0
+    correct, total = 0, 0
+
+    for image_path, truth in fixtures:
+        image = handle_image_orientation(Image.open(image_path))
+        encoded, stats = preprocess_slate_image(image, source_bytes=os.path.getsize(image_path), config=config)
+        bytes_before += stats["bytes_before"]
+        bytes_after += stats["bytes_after"]
+
+        generator = image_label_generator if "segment_one" in truth else image_label_generator_fish_invert
+        start = time.perf_counter()
+        predicted = generator(encoded, use_cache=False)
+        latencies.append(time.perf_counter() - start)
+
+        fixture_correct, fixture_total = cell_accuracy(predicted.model_dump(), truth)
+        correct += fixture_correct
+        total += fixture_total
+
+    latencies.sort()
+    return {
+        "setting": f"{'original' if long_edge <= 0 else long_edge}/{format_}/q{quality}",
+        "mean_latency_s": sum(latencies) / len(latencies),
+        "p95_latency_s": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "accuracy": correct / total if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", required=True, help="Folder of slate images and ground truth JSON files")
+    parser.add_argument("--long-edges", type=int, nargs="+", default=[0, 3072, 2048, 1536, 1024], help="Target long edges, 0 sends the unprocessed image")
+    parser.add_argument("--formats", nargs="+", default=["JPEG"], help="Encodings to compare (JPEG, WEBP)")
+    parser.add_argument("--quality", type=int, default=85)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No fixtures found in {args.fixtures}")
+        sys.exit(1)
+
+    print(f"{'setting':<24}{'mean s':>10}{'p95 s':>10}{'MB before':>12}{'MB after':>12}{'accuracy':>10}")
+    for format_ in args.formats:
+        for long_edge in args.long_edges:
+            result = run_setting(fixtures, long_edge, format_.upper(), args.quality)
+            print(
+                f"{result['setting']:<24}"
+                f"{result['mean_latency_s']:>10.2f}"
+                f"{result['p95_latency_s']:>10.2f}"
+                f"{result['bytes_before'] / 1e6:>12.2f}"
+                f"{result['bytes_after'] / 1e6:>12.2f}"
+                f"{result['accuracy']:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Synthetic slate results shared by the benchmarks.
+"""
+import random
+
+
+SUBSTRATE_CODES = ["HC", "NIA", "RB", "OT", "SC", "SP", "SD", "RKC", "RC", "SI", "no_label"]
+SEGMENT_STARTS = {"segment_one": 0, "segment_two": 25, "segment_three": 50, "segment_four": 75}
+
+FISH_INVERT_SPECIES = {
+    "fish": [
+        "Butterflyfish", "Sweetlips", "Snapper", "Barramundi cod", "Humphead wrasse", "Bumphead parrotfish",
+        "Other parrotfish", "Moray eel", "Grouper 30-40 cm", "Grouper 40-50 cm", "Grouper 50-60 cm", "Grouper > 60 cm",
+    ],
+    "invertebrates": [
+        "Banded coral shrimp", "Diadema urchin", "Pencil urchin", "Collector urchin", "Sea cucumber", "Crown of Thorns",
+        "Triton", "Lobster", "Giant Clam < 10 cm", "Giant Clam 10-20 cm", "Giant Clam 20-30 cm", "Giant Clam 30-40 cm",
+        "Giant Clam 40-50 cm", "Giant Clam > 50 cm",
+    ],
+    "impacts": [
+        "Coral Damage – boat/anchor", "Coral Damage – dynamite", "Coral Damage – other", "Trash – fish nets",
+        "Trash – general", "Bleaching % population", "Bleaching % colony",
+    ],
+    "coral_disease": ["Black Band % colonies", "White band % colonies"],
+    "rare_animals": ["Shark", "Turtle", "Manta", "Other"],
+}
+
+
+def sample_info(rng: random.Random) -> dict:
+    return {
+        "site_name": f"Site {rng.randint(1, 50)}",
+        "country_island": "Sri Lanka",
+        "team_leader": "Team Leader",
+        "data_recorded_by": "Recorder",
+        "depth": f"{rng.randint(3, 15)}m",
+        "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "time": "09:30:00",
+    }
+
+
+def sample_substrate_response(seed: int = 0) -> dict:
+    """
+    Return a SegmentationLabels-shaped dict with random labels.
+    """
+    rng = random.Random(seed)
+    response = {"info_segment": [sample_info(rng)]}
+    for segment, start in SEGMENT_STARTS.items():
+        response[segment] = [
+            {
+                "distance": f"{start + 0.5 * index:g}",
+                "label": rng.choice(SUBSTRATE_CODES),
+                "label_status": rng.random() > 0.1,
+            }
+            for index in range(40)
+        ]
+
+    return response
+
+
+def sample_fish_response(seed: int = 0) -> dict:
+    """
+    Return a SegmentationLabelsFishInvert-shaped dict with random counts.
+    """
+    rng = random.Random(seed)
+    response = {}
+    for group, species in FISH_INVERT_SPECIES.items():
+        response[group] = []
+        for name in species:
+            row = {"name": name}
+            for column in ("distance_one", "distance_two", "distance_three", "distance_four"):
+                row[column] = rng.randint(0, 12)
+                row[f"{column}_clear"] = rng.random() > 0.1
+            response[group].append(row)
+
+    return response
@@ -0,0 +1,86 @@
+"""
+Season-wide substrate percent cover over many saved results.
+
+Writes --slates synthetic SegmentationLabels results to a temporary folder,
+then times loading them (JSON -> label codes), the vectorized aggregation
+and, on a sample, a per-slate pandas version of the workbook COUNTIF
+formulas for comparison.
+
+Usage:
+    python benchmarks/substrate_analytics_benchmark.py --slates 10000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from substrate_analytics import (
+    SubstrateBatch, load_substrate_batch, segment_cover_frame, site_cover_frame, slate_cover
+)
+from substrate_grid import SEGMENT_KEYS, SUMMARY_LABELS
+from benchmarks.sample_data import sample_substrate_response
+
+
+def per_slate_cover(result: dict) -> pd.DataFrame:
+    """
+    Percent cover of one slate the way the workbook computes it, with pandas.
+    """
+    rows = {}
+    for index, key in enumerate(SEGMENT_KEYS):
+        labels = pd.Series([record["label"] for record in result[key]])
+        rows[f"S{index + 1}"] = labels.value_counts().reindex(list(SUMMARY_LABELS), fill_value=0) / 40
+    cover = pd.DataFrame(rows)
+    return pd.DataFrame({"mean": cover.mean(axis=1), "sd": cover.std(axis=1)})
+
+
+def timed(name: str, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{name:<34}{time.perf_counter() - start:>10.3f}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slates", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=500, help="Slates timed with the per-slate pandas version")
+    args = parser.parse_args()
+
+    results = [sample_substrate_response(seed) for seed in range(args.slates)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for index, result in enumerate(results):
+            with open(os.path.join(directory, f"{index:06d}.json"), "w") as handle:
+                json.dump(result, handle)
+
+        print(f"{'stage':<34}{'seconds':>10}")
+        batch = timed(f"load {args.slates} results from disk", lambda: load_substrate_batch(directory))
+
+    timed("build batch from parsed results", lambda: SubstrateBatch.from_results(
+        (str(index), result) for index, result in enumerate(results)
+    ))
+    mean, sd = timed("slate mean and SD", lambda: slate_cover(batch.codes))
+    timed("segment cover frame", lambda: segment_cover_frame(batch))
+    timed("site cover frame", lambda: site_cover_frame(batch))
+    timed("site and date cover frame", lambda: site_cover_frame(batch, by=("site", "date")))
+
+    sample = min(args.sample, args.slates)
+    start = time.perf_counter()
+    reference = [per_slate_cover(result) for result in results[:sample]]
+    seconds = (time.perf_counter() - start) * args.slates / sample
+    print(f"{'per-slate pandas (extrapolated)':<34}{seconds:>10.3f}")
+
+    for index, frame in enumerate(reference):
+        assert np.allclose(frame["mean"].to_numpy(), mean[index])
+        assert np.allclose(frame["sd"].to_numpy(), sd[index])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Round-trip cost of the substrate grid conversions.
+
+Times model output -> editable DataFrame -> model output -> workbook rows,
+once with the previous dict/loop based helpers (kept below as "legacy") and
+once with SubstrateGrid.
+
+Usage:
+    python benchmarks/substrate_grid_benchmark.py --rounds 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+from collections import defaultdict
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from substrate_grid import SubstrateGrid
+from benchmarks.sample_data import sample_substrate_response
+
+
+LEGACY_SEGMENT_DISTANCES = ["0 - 19.5m", "25 - 44.5m", "50 - 65.5m", "75 - 94.5m"]
+
+
+def legacy_dataframe(response_data: dict) -> pd.DataFrame:
+    df = pd.concat([pd.DataFrame.from_dict(response_data[key]) for key in response_data], axis=1)
+    column_names = []
+    for num in range(len(response_data)):
+        column_names.extend([f"distance_{num}", f"label_{num}", f"clear_{num}"])
+    df.columns = column_names
+    columns = pd.MultiIndex.from_arrays([
+        [key for key in response_data for _ in range(3)],
+        [label for label in LEGACY_SEGMENT_DISTANCES for _ in range(3)],
+        column_names,
+    ])
+    return pd.DataFrame(df.iloc[:, :].values, columns=columns)
+
+
+def legacy_extract(data: pd.DataFrame) -> dict:
+    suffixes = ["one", "two", "three", "four"]
+    annots = defaultdict(list)
+    column_list = list(data.columns)
+    for count, index in enumerate(range(0, 12, 3)):
+        for distance_, label_, status_ in zip(
+            data[column_list[index]].to_list(),
+            data[column_list[index + 1]].to_list(),
+            data[column_list[index + 2]].to_list()
+        ):
+            annots[f"segment_{suffixes[count]}"].append({"distance": distance_, "label": label_, "label_status": status_})
+    return dict(annots)
+
+
+def legacy_excel_rows(response_data: dict) -> list:
+    def details(info):
+        return [info["distance"], info["label"], info["label_status"]]
+
+    final_segments = []
+    for index in range(20):
+        row = []
+        for key in ("segment_one", "segment_two", "segment_three", "segment_four"):
+            row.extend(details(response_data[key][index]))
+            row.extend(details(response_data[key][index + 20]))
+        final_segments.append(row)
+    return final_segments
+
+
+def legacy_round_trip(response_data: dict) -> list:
+    return legacy_excel_rows(legacy_extract(legacy_dataframe(response_data)))
+
+
+def grid_round_trip(response_data: dict) -> list:
+    df = SubstrateGrid.from_response(response_data).to_dataframe()
+    grid = SubstrateGrid.from_dataframe(df)
+    grid.to_response()
+    return grid.excel_rows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    response = sample_substrate_response()
+    response.pop("info_segment")
+    assert legacy_round_trip(response) == grid_round_trip(response)
+
+    stages = {
+        "legacy round trip": lambda: legacy_round_trip(response),
+        "grid round trip": lambda: grid_round_trip(response),
+        "grid from_response": lambda: SubstrateGrid.from_response(response),
+        "grid to_dataframe": lambda grid=SubstrateGrid.from_response(response): grid.to_dataframe(),
+        "grid from_dataframe": lambda df=SubstrateGrid.from_response(response).to_dataframe(): SubstrateGrid.from_dataframe(df),
+        "grid excel_rows": lambda grid=SubstrateGrid.from_response(response): grid.excel_rows(),
+    }
+
+    print(f"{'stage':<24}{'us per call':>14}")
+    for name, stage in stages.items():
+        seconds = min(timeit.repeat(stage, number=args.rounds // 10 or 1, repeat=5)) / (args.rounds // 10 or 1)
+        print(f"{name:<24}{seconds * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
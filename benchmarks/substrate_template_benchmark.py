@@ -0,0 +1,48 @@
+"""
+Substrate workbook export throughput: xlsxwriter per save vs the compiled template.
+
+Exports a full survey season of synthetic slates with both renderers and
+reports workbooks per second.
+
+Usage:
+    python benchmarks/substrate_template_benchmark.py --slates 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import substrate_excel_creation
+from excel_templates import SubstrateWorkbookTemplate
+from benchmarks.sample_data import sample_substrate_response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slates", type=int, default=2000, help="Number of slates in the season")
+    args = parser.parse_args()
+
+    season = [sample_substrate_response(seed) for seed in range(args.slates)]
+
+    start = time.perf_counter()
+    template = SubstrateWorkbookTemplate()
+    compile_seconds = time.perf_counter() - start
+    print(f"template compile: {compile_seconds * 1000:.1f} ms (once per process)")
+
+    renderers = {
+        "substrate_excel_creation": substrate_excel_creation,
+        "compiled template": template.render,
+    }
+    for name, render in renderers.items():
+        start = time.perf_counter()
+        total_bytes = 0
+        for response in season:
+            total_bytes += len(render(response, response["info_segment"][0]))
+        elapsed = time.perf_counter() - start
+        print(f"{name:<26}{args.slates / elapsed:>10.1f} workbooks/s{total_bytes / args.slates / 1024:>10.1f} KB/workbook")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Per-save workbook cost before and after dropping the openpyxl round-trip.
+
+"before" writes the workbook to disk and re-reads it with
+load_and_prepare_excel_* for the download button, as the pages used to.
+"after" uses the bytes returned by *_excel_creation directly.
+
+Usage:
+    python benchmarks/workbook_benchmark.py --saves 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import create_substrate_dataframe, substrate_excel_data_extractor, substrate_excel_creation
+from utils import create_fish_slate_dataframe, fish_excel_data_extractor, fish_slate_excel_creation
+from utils import load_and_prepare_excel_for_substrate, load_and_prepare_excel_for_fish_slate
+from benchmarks.sample_data import sample_substrate_response, sample_fish_response
+
+
+def measure(save, saves: int) -> tuple:
+    # warm up imports and caches before measuring
+    save(0)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for index in range(saves):
+        save(index)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed / saves, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--saves", type=int, default=50)
+    args = parser.parse_args()
+
+    substrate_df, substrate_info = create_substrate_dataframe(sample_substrate_response())
+    substrate_response = substrate_excel_data_extractor(substrate_df)
+    fish_response = fish_excel_data_extractor(create_fish_slate_dataframe(sample_fish_response()))
+    info = substrate_info[0]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, "slate.xlsx")
+
+        cases = {
+            "substrate before": lambda _: (
+                substrate_excel_creation(substrate_response, info, excel_path),
+                load_and_prepare_excel_for_substrate(excel_path),
+            ),
+            "substrate after": lambda _: substrate_excel_creation(substrate_response, info),
+            "fish before": lambda _: (
+                fish_slate_excel_creation(fish_response, info, excel_path),
+                load_and_prepare_excel_for_fish_slate(excel_path),
+            ),
+            "fish after": lambda _: fish_slate_excel_creation(fish_response, info),
+        }
+
+        print(f"{'case':<20}{'ms/save':>10}{'peak MB':>10}")
+        for name, save in cases.items():
+            seconds, peak = measure(save, args.saves)
+            print(f"{name:<20}{seconds * 1000:>10.1f}{peak / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
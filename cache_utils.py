@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+import PIL.Image
+
+
+# constants
+DEFAULT_CACHE_DIR = ".extraction_cache"
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+
+def image_fingerprint(image: PIL.Image.Image) -> str:
+    """
+    Hash the decoded pixels of an image so that the same slate photo maps to the
+    same digest regardless of the container it was saved in.
+
+    Args:
+        image: PIL Image object (already orientation corrected)
+
+    Returns:
+        str: hex sha256 digest of the normalized image
+    """
+    normalized = image if image.mode == "RGB" else image.convert("RGB")
+    digest = hashlib.sha256()
+    digest.update(f"{normalized.mode}:{normalized.size[0]}x{normalized.size[1]}".encode("utf-8"))
+    digest.update(normalized.tobytes())
+
+    return digest.hexdigest()
+
+
+def make_cache_key(image_digest: str, prompt: str, model_name: str, response_schema: type) -> str:
+    """
+    Build the content-addressed key for an extraction.
+
+    Args:
+        image_digest: digest returned by image_fingerprint
+        prompt: prompt text sent with the image
+        model_name: Gemini model name
+        response_schema: pydantic model used as the response schema
+
+    Returns:
+        str: hex sha256 digest identifying the extraction
+    """
+    schema_json = json.dumps(response_schema.model_json_schema(), sort_keys=True)
+    digest = hashlib.sha256()
+    for part in (image_digest, prompt, model_name, schema_json):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Local disk cache for model responses with size and age based eviction.
+
+    Every entry is a single JSON file named after its key, so the cache works
+    without any network access and survives app restarts.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS
+    ):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached response text for a key, or None on a miss or an expired entry.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                entry = json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.max_age_seconds:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+                self.evictions += 1
+            return None
+
+        # touch the entry so eviction is least recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return entry.get("response")
+
+    def set(self, key: str, response_text: str) -> None:
+        """
+        Store the response text for a key and evict old entries if the cache is over budget.
+        """
+        entry = {"created_at": time.time(), "response": response_text}
+
+        # write to a temporary file first so readers never see a partial entry
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as temp_file:
+                json.dump(entry, temp_file)
+            os.replace(temp_path, self._entry_path(key))
+        except OSError as error:
+            print(f"Error writing extraction cache entry: {str(error)}")
+            self._remove(temp_path)
+            return
+
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then the least recently used ones until the cache
+        fits within max_entries and max_bytes.
+
+        Returns:
+            int: number of entries removed
+        """
+        now = time.time()
+        entries = []
+        with os.scandir(self.cache_dir) as directory:
+            for dir_entry in directory:
+                if not dir_entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+
+        removed = 0
+        kept = []
+        for modified, size, path in entries:
+            if now - modified > self.max_age_seconds:
+                self._remove(path)
+                removed += 1
+            else:
+                kept.append((modified, size, path))
+
+        kept.sort()
+        total_bytes = sum(size for _, size, _ in kept)
+        while kept and (len(kept) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = kept.pop(0)
+            self._remove(path)
+            total_bytes -= size
+            removed += 1
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove every entry from the cache.
+        """
+        with os.scandir(self.cache_dir) as directory:
+            for dir_entry in directory:
+                if dir_entry.name.endswith(".json"):
+                    self._remove(dir_entry.path)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the hit/miss/eviction counters for this process.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
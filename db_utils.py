@@ -1,9 +1,13 @@
-import boto3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import os
 from typing import Dict, List, Optional, Union, Any
 import pandas as pd
 import streamlit as st
+from boto3.dynamodb.types import TypeDeserializer
+
+from aws_clients import get_client, get_resource
+from tracing import traced
 
 # Type alias for DynamoDB item
 dynamodb_item = Dict[str, Any]
@@ -14,7 +18,18 @@ os.environ["AWS_SECRET_ACCESS_KEY"] = st.secrets["aws"]["AWS_SECRET_KEY"]
 os.environ["AWS_REGION"] = st.secrets["aws"]["REGION_NAME"]
 os.environ["ENV"] = st.secrets["aws"]["ENV"]
 
+# attributes needed by the admin dashboard
+BULK_FETCH_ATTRIBUTES = ('creation_date', 'user_name', 'data_id', 'image_url', 'excel_url')
+BULK_FETCH_SEGMENTS = 8
+
+# daily upload counters live next to the records under data_id "rollup#YYYY-MM-DD";
+# they have no status attribute, so they stay out of the CreationDateIndex
+ROLLUP_PREFIX = 'rollup#'
+
+_DESERIALIZER = TypeDeserializer()
 
+
+@traced()
 def add_record(
     table_name: str,
     data_id: str,
@@ -24,10 +39,13 @@ def add_record(
     excel_url: str,
     status: str,
     creation_date: Optional[str] = None,
-    additional_attributes: Optional[Dict] = None
+    additional_attributes: Optional[Dict] = None,
+    count_upload: bool = True
 ) -> Dict:
     """
     Add a new record to the specified DynamoDB table.
+
+    A record with the same data_id is replaced.
     
     Args:
         table_name (str): Name of the DynamoDB table
@@ -36,18 +54,14 @@ def add_record(
         excel_url (str): URL of the Excel file
         creation_date (str, optional): ISO format datetime string. Defaults to current datetime.
         additional_attributes (Dict, optional): Additional attributes to store. Defaults to None.
+        count_upload (bool, optional): Count the record in the daily rollup; False when
+            it replaces an upload that was already counted. Defaults to True.
         
     Returns:
         Dict: The response from DynamoDB with success/error information
     """
-    # Initialize AWS session and DynamoDB resource
-    session = boto3.Session(
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('AWS_REGION')
-    )
-    
-    dynamodb = session.resource('dynamodb')
+    # Shared, pooled DynamoDB resource
+    dynamodb = get_resource('dynamodb')
     table = dynamodb.Table(table_name)
     
     # Prepare the item
@@ -68,21 +82,114 @@ def add_record(
     try:
         # Put the item in the table
         response = table.put_item(Item=item)
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error adding record: {str(e)}',
+            'item': item
+        }
+    
+    # Count successful uploads in the daily rollup; the record itself is already stored,
+    # so a failed counter update is reported but can be repaired with backfill_rollups.py
+    rollup = None
+    if status == 'success' and count_upload:
+        rollup = update_daily_rollup(table_name, item['creation_date'][:10], user_id, user_name)
+    return {
+        'success': True,
+        'message': 'Record added successfully',
+        'item': item,
+        'response': response,
+        'rollup': rollup
+    }
+
+
+@traced()
+def get_record(table_name: str, data_id: str) -> Dict[str, Union[bool, str, dynamodb_item]]:
+    """
+    Fetch a single record by its data_id.
+    
+    Args:
+        table_name (str): Name of the DynamoDB table
+        data_id (str): Record ID
+        
+    Returns:
+        Dict: A dictionary containing:
+            - success (bool): Whether a record was found
+            - message (str): Status message
+            - data (Dict): The record, or None if it was not found
+    """
+    try:
+        # Shared, pooled DynamoDB resource
+        dynamodb = get_resource('dynamodb')
+        table = dynamodb.Table(table_name)
+        
+        item = table.get_item(Key={'data_id': data_id}).get('Item')
+        if item is None or data_id.startswith(ROLLUP_PREFIX):
+            return {
+                'success': False,
+                'message': f'Record {data_id} not found',
+                'data': None
+            }
+        
         return {
             'success': True,
-            'message': 'Record added successfully',
-            'item': item,
-            'response': response
+            'message': 'Record retrieved successfully',
+            'data': item
         }
+        
     except Exception as e:
         return {
             'success': False,
-            'message': f'Error adding record: {str(e)}',
-            'item': item
+            'message': f'Error fetching record: {str(e)}',
+            'data': None
         }
 
 
-def get_recent_records(table_name: str, days: int = 14, gsi_name: str = 'CreationDateIndex') -> Dict[str, Union[bool, str, pd.DataFrame]]:
+def rollup_key(day: str) -> str:
+    """
+    Return the data_id of the rollup item of a day (YYYY-MM-DD).
+    """
+    return f'{ROLLUP_PREFIX}{day}'
+
+
+def update_daily_rollup(table_name: str, day: str, user_id: str, user_name: str, count: int = 1) -> Dict:
+    """
+    Atomically add uploads to the per-day and per-user counters of a day.
+    
+    Args:
+        table_name (str): Name of the DynamoDB table
+        day (str): Day of the uploads (YYYY-MM-DD)
+        user_id (str): User ID of the uploader
+        user_name (str): Display name of the uploader
+        count (int, optional): Number of uploads to add. Defaults to 1.
+        
+    Returns:
+        Dict: success and message
+    """
+    dynamodb = get_resource('dynamodb')
+    table = dynamodb.Table(table_name)
+    
+    try:
+        table.update_item(
+            Key={'data_id': rollup_key(day)},
+            UpdateExpression='ADD upload_count :count, #user_count :count SET #user_name = :user_name, rollup_date = :day',
+            ExpressionAttributeNames={
+                '#user_count': f'user_count#{user_id}',
+                '#user_name': f'user_name#{user_id}'
+            },
+            ExpressionAttributeValues={
+                ':count': count,
+                ':user_name': user_name,
+                ':day': day
+            }
+        )
+        return {'success': True, 'message': 'Rollup updated successfully'}
+    except Exception as e:
+        return {'success': False, 'message': f'Error updating rollup: {str(e)}'}
+
+
+@traced()
+def get_recent_records(table_name: str, days: int = 14, gsi_name: str = 'CreationDateIndex', bulk: bool = False) -> Dict[str, Union[bool, str, pd.DataFrame]]:
     """
     Fetch records from the DynamoDB table that were created within the specified number of days.
     
@@ -91,6 +198,8 @@ def get_recent_records(table_name: str, days: int = 14, gsi_name: str = 'Creatio
         days (int, optional): Number of days to look back. Defaults to 14 (2 weeks).
         gsi_name (str, optional): Name of the Global Secondary Index on creation_date.
                                  Defaults to 'CreationDateIndex'.
+        bulk (bool, optional): Fetch only BULK_FETCH_ATTRIBUTES with concurrent
+                               sub-range queries (see bulk_fetch_records). Defaults to False.
         
     Returns:
         Dict: A dictionary containing:
@@ -103,14 +212,26 @@ def get_recent_records(table_name: str, days: int = 14, gsi_name: str = 'Creatio
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Initialize AWS session and DynamoDB resource
-        session = boto3.Session(
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION')
-        )
+        if bulk:
+            response = bulk_fetch_records(table_name, start_date.isoformat(), end_date.isoformat(), gsi_name)
+            if not response['success']:
+                return response
+            df = pd.DataFrame(response['data'])
+            if df.empty:
+                return {
+                    'success': True,
+                    'message': 'No records found in the specified date range',
+                    'data': pd.DataFrame()
+                }
+            df['creation_date'] = pd.to_datetime(df['creation_date'])
+            return {
+                'success': True,
+                'message': f'Successfully retrieved {len(df)} records',
+                'data': df.iloc[::-1].reset_index(drop=True)
+            }
         
-        dynamodb = session.resource('dynamodb')
+        # Shared, pooled DynamoDB resource
+        dynamodb = get_resource('dynamodb')
         table = dynamodb.Table(table_name)
         
         # Use query on the GSI for creation_date
@@ -177,3 +298,222 @@ def get_recent_records(table_name: str, days: int = 14, gsi_name: str = 'Creatio
             'message': f'Error fetching records: {str(e)}',
             'data': None
         }
+
+
+def _query_range_columns(
+    table_name: str,
+    gsi_name: str,
+    start: str,
+    end: str,
+    attributes: tuple,
+    drop_end: bool
+) -> Dict[str, List]:
+    """
+    Query one creation_date sub-range and collect the projected attributes column by column.
+    """
+    client = get_client('dynamodb')
+    names = {f'#a{index}': attribute for index, attribute in enumerate(attributes)}
+    names.update({'#pk': 'status', '#cd': 'creation_date'})
+    query_kwargs = {
+        'TableName': table_name,
+        'IndexName': gsi_name,
+        'KeyConditionExpression': '#pk = :pk_value AND #cd BETWEEN :start_date AND :end_date',
+        'ProjectionExpression': ', '.join(f'#a{index}' for index in range(len(attributes))),
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {
+            ':pk_value': {'S': 'success'},
+            ':start_date': {'S': start},
+            ':end_date': {'S': end}
+        }
+    }
+
+    columns = {attribute: [] for attribute in attributes}
+    while True:
+        response = client.query(**query_kwargs)
+        for item in response.get('Items', []):
+            # BETWEEN is inclusive, items on the shared boundary belong to the next sub-range
+            if drop_end and item['creation_date']['S'] == end:
+                continue
+            for attribute in attributes:
+                value = item.get(attribute)
+                if value is None:
+                    columns[attribute].append(None)
+                elif 'S' in value:
+                    columns[attribute].append(value['S'])
+                else:
+                    columns[attribute].append(_DESERIALIZER.deserialize(value))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return columns
+
+
+@traced()
+def bulk_fetch_records(
+    table_name: str,
+    start_date: str,
+    end_date: str,
+    gsi_name: str = 'CreationDateIndex',
+    attributes: tuple = BULK_FETCH_ATTRIBUTES,
+    segments: int = BULK_FETCH_SEGMENTS
+) -> Dict[str, Union[bool, str, Dict[str, List]]]:
+    """
+    Fetch the records of a creation_date window as columns, oldest first.
+    
+    The window is split into equal sub-ranges that are queried concurrently
+    on the shared low-level client, fetching only the requested attributes.
+    
+    Args:
+        table_name (str): Name of the DynamoDB table
+        start_date (str): ISO format start of the window (inclusive)
+        end_date (str): ISO format end of the window (inclusive)
+        gsi_name (str, optional): Name of the Global Secondary Index on creation_date.
+                                 Defaults to 'CreationDateIndex'.
+        attributes (tuple, optional): Attributes to fetch. Defaults to BULK_FETCH_ATTRIBUTES.
+        segments (int, optional): Number of concurrently queried sub-ranges. Defaults to 8.
+        
+    Returns:
+        Dict: A dictionary containing:
+            - success (bool): Whether the operation was successful
+            - message (str): Status message
+            - data (Dict[str, List]): attribute -> list of values, or None if there was an error
+    """
+    if 'creation_date' not in attributes:
+        attributes = ('creation_date',) + tuple(attributes)
+
+    start = datetime.fromisoformat(start_date)
+    end = datetime.fromisoformat(end_date)
+    segments = max(1, segments)
+    step = (end - start) / segments
+    boundaries = [start_date] + [(start + step * index).isoformat() for index in range(1, segments)] + [end_date]
+
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            futures = [
+                executor.submit(
+                    _query_range_columns,
+                    table_name,
+                    gsi_name,
+                    boundaries[index],
+                    boundaries[index + 1],
+                    attributes,
+                    index < segments - 1
+                )
+                for index in range(segments)
+            ]
+            parts = [future.result() for future in futures]
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error fetching records: {str(e)}',
+            'data': None
+        }
+
+    columns = {attribute: [] for attribute in attributes}
+    for part in parts:
+        for attribute in attributes:
+            columns[attribute].extend(part[attribute])
+
+    return {
+        'success': True,
+        'message': f"Successfully retrieved {len(columns['creation_date'])} records",
+        'data': columns
+    }
+
+
+def _rollup_rows(item: dynamodb_item) -> List[Dict]:
+    """
+    Flatten a rollup item into one row per user.
+    """
+    rows = []
+    for attribute, value in item.items():
+        if not attribute.startswith('user_count#'):
+            continue
+        user_id = attribute[len('user_count#'):]
+        rows.append({
+            'date': item['rollup_date'],
+            'user_id': user_id,
+            'user_name': item.get(f'user_name#{user_id}', user_id),
+            'uploads': int(value)
+        })
+    return rows
+
+
+@traced()
+def get_daily_rollups(table_name: str, days: int = 30) -> Dict[str, Union[bool, str, pd.DataFrame]]:
+    """
+    Fetch the daily upload counters of the last days with BatchGetItem.
+    
+    Args:
+        table_name (str): Name of the DynamoDB table
+        days (int, optional): Number of days to look back, including today. Defaults to 30.
+        
+    Returns:
+        Dict: A dictionary containing:
+            - success (bool): Whether the operation was successful
+            - message (str): Status message
+            - data (pd.DataFrame): One row per day and user with columns date, user_id,
+              user_name and uploads, or None if there was an error
+    """
+    today = datetime.utcnow().date()
+    keys = [{'data_id': rollup_key((today - timedelta(days=offset)).isoformat())} for offset in range(days)]
+    
+    try:
+        dynamodb = get_resource('dynamodb')
+        items = []
+        # BatchGetItem takes at most 100 keys per request
+        for start in range(0, len(keys), 100):
+            request_items = {table_name: {'Keys': keys[start:start + 100]}}
+            while request_items:
+                response = dynamodb.batch_get_item(RequestItems=request_items)
+                items.extend(response.get('Responses', {}).get(table_name, []))
+                request_items = response.get('UnprocessedKeys')
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Error fetching rollups: {str(e)}',
+            'data': None
+        }
+    
+    rows = [row for item in items for row in _rollup_rows(item)]
+    df = pd.DataFrame(rows, columns=['date', 'user_id', 'user_name', 'uploads'])
+    df['date'] = pd.to_datetime(df['date'])
+    
+    return {
+        'success': True,
+        'message': f'Successfully retrieved {len(items)} daily rollups',
+        'data': df.sort_values('date', ascending=False).reset_index(drop=True)
+    }
+
+
+def put_daily_rollups(table_name: str, counts: Dict[str, Dict[str, int]], user_names: Dict[str, str]) -> Dict:
+    """
+    Overwrite the rollup items of the given days with absolute counts.
+    
+    Args:
+        table_name (str): Name of the DynamoDB table
+        counts (Dict): day (YYYY-MM-DD) -> user_id -> number of uploads
+        user_names (Dict): user_id -> display name
+        
+    Returns:
+        Dict: success, message and the number of rollup items written
+    """
+    try:
+        dynamodb = get_resource('dynamodb')
+        table = dynamodb.Table(table_name)
+        with table.batch_writer() as batch:
+            for day, user_counts in counts.items():
+                item = {
+                    'data_id': rollup_key(day),
+                    'rollup_date': day,
+                    'upload_count': sum(user_counts.values())
+                }
+                for user_id, uploads in user_counts.items():
+                    item[f'user_count#{user_id}'] = uploads
+                    item[f'user_name#{user_id}'] = user_names.get(user_id, user_id)
+                batch.put_item(Item=item)
+    except Exception as e:
+        return {'success': False, 'message': f'Error writing rollups: {str(e)}', 'written': 0}
+    
+    return {'success': True, 'message': f'Wrote {len(counts)} daily rollups', 'written': len(counts)}
@@ -0,0 +1,174 @@
+import re
+import threading
+import zipfile
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Union
+from xml.sax.saxutils import escape
+
+import xlsxwriter
+from xlsxwriter.utility import xl_rowcol_to_cell
+
+from substrate_grid import SubstrateGrid
+from utils import substrate_excel_rows, write_substrate_layout, write_substrate_info, write_substrate_records
+from tracing import traced
+
+
+# constants
+SHEET_PATH = "xl/worksheets/sheet1.xml"
+CORE_PATH = "docProps/core.xml"
+
+# info cells written by write_substrate_info, in the order of its info_fields
+SUBSTRATE_INFO_CELLS = [
+    ("site_name", 0, 3),
+    ("country_island", 0, 11),
+    ("depth", 1, 3),
+    ("date", 1, 11),
+    ("team_leader", 2, 3),
+    ("data_recorded_by", 2, 11),
+    ("time", 3, 3),
+]
+
+# the 20 x 16 block of distance/label cells written by write_substrate_records
+SUBSTRATE_FIRST_RECORD_ROW = 14
+SUBSTRATE_RECORD_ROWS = 20
+SUBSTRATE_RECORD_COLUMNS = 16
+
+
+def _string_cell(ref: str, style: int, value) -> str:
+    if value is None or value == "":
+        return f'<c r="{ref}" s="{style}"/>'
+    text = str(value)
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}" s="{style}" t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+class SubstrateWorkbookTemplate:
+    """
+    Substrate workbook compiled once and stamped per slate.
+
+    The static part of the sheet (formats, merged headers, legend and the
+    summary formula tables) is rendered by xlsxwriter a single time. Its sheet
+    XML is then split around the 7 info cells and the 20 x 16 record block, so
+    a save only has to format those cells and re-zip the package.
+    """
+
+    def __init__(self):
+        self.parts = {}
+        self.sheet_chunks = []
+        self.cell_slots = []
+        self.styles = {}
+        self._compile()
+
+    def _compile(self):
+        output = BytesIO()
+        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+        worksheet = workbook.add_worksheet()
+        formats = write_substrate_layout(workbook, worksheet)
+
+        # write numeric placeholders so the real values never enter the shared string table
+        write_substrate_info(worksheet, {field: 0 for field, _, _ in SUBSTRATE_INFO_CELLS}, formats)
+        placeholder_row = [0] * (SUBSTRATE_RECORD_COLUMNS // 2 * 3)
+        write_substrate_records(worksheet, [placeholder_row] * SUBSTRATE_RECORD_ROWS, formats)
+        workbook.close()
+
+        self.styles = {name: format_.xf_index for name, format_ in formats.items()}
+
+        with zipfile.ZipFile(BytesIO(output.getvalue())) as package:
+            for name in package.namelist():
+                self.parts[name] = package.read(name)
+
+        sheet_xml = self.parts.pop(SHEET_PATH).decode("utf-8")
+
+        # slots are ("info", field) or ("record", row, column)
+        slots = [(("info", field), row, col) for field, row, col in SUBSTRATE_INFO_CELLS]
+        for row_offset in range(SUBSTRATE_RECORD_ROWS):
+            for col in range(SUBSTRATE_RECORD_COLUMNS):
+                slots.append((("record", row_offset, col), SUBSTRATE_FIRST_RECORD_ROW + row_offset, col))
+
+        located = []
+        for slot, row, col in slots:
+            ref = xl_rowcol_to_cell(row, col)
+            match = re.search(rf'<c r="{ref}"[^>]*?(?:/>|>.*?</c>)', sheet_xml)
+            if match is None:
+                raise ValueError(f"Placeholder cell {ref} not found in the substrate template")
+            located.append((match.start(), match.end(), slot, ref))
+        located.sort()
+
+        position = 0
+        for cell_start, cell_end, slot, ref in located:
+            self.sheet_chunks.append(sheet_xml[position:cell_start])
+            self.cell_slots.append((slot, ref))
+            position = cell_end
+        self.sheet_chunks.append(sheet_xml[position:])
+
+    def render(self, response_data: Union[SubstrateGrid, dict], info_data: dict) -> bytes:
+        """
+        Render the workbook for one slate.
+
+        Args:
+            response_data: SubstrateGrid, or segment_one ... segment_four records
+            info_data: slate info fields
+
+        Returns:
+            bytes: the finished xlsx file
+        """
+        final_segments = substrate_excel_rows(response_data)
+        border = self.styles["border"]
+        bold_border = self.styles["bold_border"]
+        not_clear = self.styles["not_clear"]
+
+        cells = []
+        for (kind, *position), ref in self.cell_slots:
+            if kind == "info":
+                cells.append(_string_cell(ref, border, info_data.get(position[0], "")))
+                continue
+
+            row_offset, col = position
+            # each row holds (distance, label, label_status) triples for the 8 column pairs
+            triple = final_segments[row_offset][(col // 2) * 3:(col // 2) * 3 + 3]
+            if col % 2 == 0:
+                cells.append(_string_cell(ref, bold_border, triple[0]))
+            else:
+                cells.append(_string_cell(ref, border if triple[2] else not_clear, triple[1]))
+
+        sheet_parts = [self.sheet_chunks[0]]
+        for cell, chunk in zip(cells, self.sheet_chunks[1:]):
+            sheet_parts.append(cell)
+            sheet_parts.append(chunk)
+
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        output = BytesIO()
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as package:
+            for name, data in self.parts.items():
+                if name == CORE_PATH:
+                    data = re.sub(rb"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ", now.encode("ascii"), data)
+                package.writestr(name, data)
+            package.writestr(SHEET_PATH, "".join(sheet_parts))
+
+        return output.getvalue()
+
+
+_SUBSTRATE_TEMPLATE = None
+_TEMPLATE_LOCK = threading.Lock()
+
+
+def get_substrate_template() -> SubstrateWorkbookTemplate:
+    """
+    Return the process-wide substrate template, compiling it on first use.
+    """
+    global _SUBSTRATE_TEMPLATE
+
+    with _TEMPLATE_LOCK:
+        if _SUBSTRATE_TEMPLATE is None:
+            _SUBSTRATE_TEMPLATE = SubstrateWorkbookTemplate()
+
+    return _SUBSTRATE_TEMPLATE
+
+
+@traced()
+def render_substrate_workbook(response_data: Union[SubstrateGrid, dict], info_data: dict) -> bytes:
+    """
+    Template-compiled equivalent of utils.substrate_excel_creation.
+    """
+    return get_substrate_template().render(response_data, info_data)
@@ -0,0 +1,167 @@
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from fish_slate import (
+    FishSlate, stack_slates, SPECIES, SPECIES_GROUPS, FISH_GROUPS, GROUP_SLICES, DISTANCE_COLUMNS, SLATE_SHAPE
+)
+from result_loader import iter_results, RESULT_CHUNK_SIZE
+
+
+GROUP_STARTS = np.array([group_slice.start for group_slice in GROUP_SLICES.values()])
+KEY_COLUMNS = ("site", "date")
+UNKNOWN_SITE = "Unknown site"
+
+
+def result_key(result: dict) -> Tuple[str, str]:
+    """
+    (site, date) of a saved result, taken from its info_segment entry when present.
+    """
+    info = (result.get("info_segment") or [{}])[0]
+    site = (info.get("site_name") or "").strip() or UNKNOWN_SITE
+    return site, (info.get("date") or "").strip()
+
+
+class FishAggregate:
+    """
+    Running species totals of fish/invert slates per (site, date).
+
+    Every accumulator row is one (site, date); slates are added a chunk at a
+    time with grouped array sums, so the memory use depends on the number of
+    surveys, not on the number of slates streamed through it.
+
+    counts: (surveys, 39, 4) summed counts per species and transect segment
+    unclear: (surveys, 39, 4) number of slates with the cell marked not clear
+    slates: (surveys,) number of slates
+    """
+
+    def __init__(self):
+        self.keys = []
+        self._index = {}
+        self.counts = np.zeros((0,) + SLATE_SHAPE, dtype=np.int64)
+        self.unclear = np.zeros((0,) + SLATE_SHAPE, dtype=np.int64)
+        self.slates = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _rows(self, keys: Sequence[Tuple[str, str]]) -> np.ndarray:
+        rows = np.empty(len(keys), dtype=np.intp)
+        for position, key in enumerate(keys):
+            row = self._index.get(key)
+            if row is None:
+                row = self._index[key] = len(self.keys)
+                self.keys.append(key)
+            rows[position] = row
+
+        grow = len(self.keys) - len(self.slates)
+        if grow:
+            self.counts = np.concatenate([self.counts, np.zeros((grow,) + SLATE_SHAPE, dtype=np.int64)])
+            self.unclear = np.concatenate([self.unclear, np.zeros((grow,) + SLATE_SHAPE, dtype=np.int64)])
+            self.slates = np.concatenate([self.slates, np.zeros(grow, dtype=np.int64)])
+        return rows
+
+    def add_slates(self, keys: Sequence[Tuple[str, str]], slates: Sequence[FishSlate]) -> None:
+        """
+        Add slates, keys[i] being the (site, date) of slates[i].
+        """
+        if not slates:
+            return
+        rows = self._rows(keys)
+        counts, clear = stack_slates(slates)
+
+        np.add.at(self.counts, rows, counts)
+        np.add.at(self.unclear, rows, ~clear)
+        self.slates += np.bincount(rows, minlength=len(self.keys))
+
+    def add_results(self, results: Iterable[Tuple[str, dict]]) -> None:
+        """
+        Add (source, SegmentationLabelsFishInvert model_dump()) pairs.
+        """
+        keys, slates = [], []
+        for _, result in results:
+            keys.append(result_key(result))
+            slates.append(FishSlate.from_response(result))
+        self.add_slates(keys, slates)
+
+    def grouped(self, by: Sequence[str] = KEY_COLUMNS) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Combine the accumulator rows by a subset of ("site", "date").
+
+        Returns:
+            tuple: (group keys DataFrame, counts, unclear, slates) with one row per group
+        """
+        keys = pd.DataFrame(self.keys, columns=list(KEY_COLUMNS))
+        grouped = keys.groupby(list(by), sort=True)
+        rows = grouped.ngroup().to_numpy()
+        groups = grouped.size().index.to_frame(index=False)
+
+        counts = np.zeros((len(groups),) + SLATE_SHAPE, dtype=np.int64)
+        unclear = np.zeros((len(groups),) + SLATE_SHAPE, dtype=np.int64)
+        np.add.at(counts, rows, self.counts)
+        np.add.at(unclear, rows, self.unclear)
+        return groups, counts, unclear, np.bincount(rows, weights=self.slates, minlength=len(groups)).astype(np.int64)
+
+
+def aggregate_results(source: str, chunk_size: int = RESULT_CHUNK_SIZE) -> FishAggregate:
+    """
+    Stream the fish/invert results of a local directory or "s3://<prefix>"
+    into a FishAggregate, holding one chunk of documents at a time.
+    """
+    aggregate = FishAggregate()
+    for chunk in iter_results(source, chunk_size):
+        aggregate.add_results(chunk)
+    return aggregate
+
+
+def species_abundance_frame(aggregate: FishAggregate, by: Sequence[str] = KEY_COLUMNS) -> pd.DataFrame:
+    """
+    One row per group and species.
+
+    Columns: the group keys, species group, species, slates, total count,
+    mean count per slate for every transect segment (the DISTANCE_COLUMNS)
+    and the share of cells marked not clear.
+    """
+    groups, counts, unclear, slates = aggregate.grouped(by)
+    species = len(SPECIES)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        density = counts / slates[:, None, None]
+        unclear_share = unclear.sum(axis=2) / (slates[:, None] * len(DISTANCE_COLUMNS))
+
+    return pd.DataFrame({
+        **{name: np.repeat(groups[name].to_numpy(), species) for name in by},
+        "group": np.tile(np.asarray(SPECIES_GROUPS, dtype=object), len(groups)),
+        "species": np.tile(np.asarray(SPECIES, dtype=object), len(groups)),
+        "slates": np.repeat(slates, species),
+        "total": counts.sum(axis=2).ravel(),
+        **{column: density[:, :, index].ravel() for index, column in enumerate(DISTANCE_COLUMNS)},
+        "unclear_share": unclear_share.ravel(),
+    })
+
+
+def group_abundance_frame(aggregate: FishAggregate, by: Sequence[str] = KEY_COLUMNS) -> pd.DataFrame:
+    """
+    One row per group and species group (fish, invertebrates, impacts, ...)
+    with the same columns as species_abundance_frame, summed over the species.
+    """
+    groups, counts, unclear, slates = aggregate.grouped(by)
+    # sum the species of every species group: (groups, species group, segment)
+    group_counts = np.add.reduceat(counts, GROUP_STARTS, axis=1)
+    group_unclear = np.add.reduceat(unclear, GROUP_STARTS, axis=1).sum(axis=2)
+    group_sizes = np.array([len(names) for names in FISH_GROUPS.values()])
+    group_count = len(FISH_GROUPS)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        density = group_counts / slates[:, None, None]
+        unclear_share = group_unclear / (slates[:, None] * group_sizes * len(DISTANCE_COLUMNS))
+
+    return pd.DataFrame({
+        **{name: np.repeat(groups[name].to_numpy(), group_count) for name in by},
+        "group": np.tile(np.asarray(list(FISH_GROUPS), dtype=object), len(groups)),
+        "slates": np.repeat(slates, group_count),
+        "total": group_counts.sum(axis=2).ravel(),
+        **{column: density[:, :, index].ravel() for index, column in enumerate(DISTANCE_COLUMNS)},
+        "unclear_share": unclear_share.ravel(),
+    })
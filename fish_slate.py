@@ -0,0 +1,237 @@
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# species printed on the slate, in slate order (see FISH_INVERT_INSTRUCTIONS)
+FISH_GROUPS = {
+    "fish": (
+        "Butterflyfish", "Sweetlips", "Snapper", "Barramundi cod", "Humphead wrasse", "Bumphead parrotfish",
+        "Other parrotfish", "Moray eel", "Grouper 30-40 cm", "Grouper 40-50 cm", "Grouper 50-60 cm", "Grouper > 60 cm",
+    ),
+    "invertebrates": (
+        "Banded coral shrimp", "Diadema urchin", "Pencil urchin", "Collector urchin", "Sea cucumber", "Crown of Thorns",
+        "Triton", "Lobster", "Giant Clam < 10 cm", "Giant Clam 10-20 cm", "Giant Clam 20-30 cm", "Giant Clam 30-40 cm",
+        "Giant Clam 40-50 cm", "Giant Clam > 50 cm",
+    ),
+    "impacts": (
+        "Coral Damage – boat/anchor", "Coral Damage – dynamite", "Coral Damage – other", "Trash – fish nets",
+        "Trash – general", "Bleaching % population", "Bleaching % colony",
+    ),
+    "coral_disease": ("Black Band % colonies", "White band % colonies"),
+    "rare_animals": ("Shark", "Turtle", "Manta", "Other"),
+}
+
+SPECIES = tuple(name for names in FISH_GROUPS.values() for name in names)
+SPECIES_GROUPS = tuple(group for group, names in FISH_GROUPS.items() for _ in names)
+
+
+def _group_slices() -> dict:
+    slices, start = {}, 0
+    for group, names in FISH_GROUPS.items():
+        slices[group] = slice(start, start + len(names))
+        start += len(names)
+    return slices
+
+
+# row range of every group in SPECIES
+GROUP_SLICES = _group_slices()
+
+# model fields and DataFrame columns of the four transect distances
+DISTANCE_KEYS = ("distance_one", "distance_two", "distance_three", "distance_four")
+DISTANCE_COLUMNS = ("0 - 20m", "25 - 45m", "50 - 75m", "75 - 95m")
+CLEAR_COLUMNS = tuple(f"set_{index}_clear" for index in range(len(DISTANCE_KEYS)))
+DATAFRAME_COLUMNS = ("name",) + tuple(column for pair in zip(DISTANCE_COLUMNS, CLEAR_COLUMNS) for column in pair)
+
+SLATE_SHAPE = (len(SPECIES), len(DISTANCE_KEYS))
+# counts are stored as int16; edited counts are clipped to 0 ... MAX_COUNT
+MAX_COUNT = int(np.iinfo(np.int16).max)
+
+
+def normalize_species_name(name: str) -> str:
+    """
+    Lower-case a species name and unify dashes and spacing for matching.
+    """
+    name = re.sub(r"[–—−]", "-", str(name).lower())
+    return re.sub(r"\s+", " ", name).strip()
+
+
+_SPECIES_INDEX = {normalize_species_name(name): index for index, name in enumerate(SPECIES)}
+# names exactly as printed, so the usual case skips normalize_species_name
+_SPECIES_INDEX.update({name: index for index, name in enumerate(SPECIES)})
+
+
+@dataclass
+class FishSlate:
+    """
+    One fish/invert slate as fixed-size arrays.
+
+    Row i of counts and clear is SPECIES[i]; the columns are the four
+    transect distances (DISTANCE_KEYS). Both arrays are column-major, so every
+    distance column is a contiguous vector that DataFrames can use as is.
+    """
+    counts: np.ndarray
+    clear: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "FishSlate":
+        """
+        Slate with zero counts, all marked unclear.
+        """
+        return cls(np.zeros(SLATE_SHAPE, dtype=np.int16, order="F"), np.zeros(SLATE_SHAPE, dtype=bool, order="F"))
+
+    @classmethod
+    def from_response(cls, response_data: dict) -> "FishSlate":
+        """
+        Build the slate from SegmentationLabelsFishInvert output (model_dump()).
+
+        Rows are matched to the species index by name, falling back to their
+        position within the group. Species the model left out stay at 0 and
+        are marked unclear.
+        """
+        rows, records = [], []
+        for group, group_slice in GROUP_SLICES.items():
+            free = list(range(group_slice.start, group_slice.stop))
+            unmatched = []
+            for record in response_data.get(group) or []:
+                name = record["name"]
+                index = _SPECIES_INDEX.get(name)
+                if index is None:
+                    index = _SPECIES_INDEX.get(normalize_species_name(name))
+                if index in free:
+                    free.remove(index)
+                    rows.append(index)
+                    records.append(record)
+                else:
+                    unmatched.append(record)
+            for index, record in zip(free, unmatched):
+                rows.append(index)
+                records.append(record)
+
+        # fill all matched rows with one assignment per array
+        slate = cls.empty()
+        if rows:
+            slate.counts[rows] = [[record[key] for key in DISTANCE_KEYS] for record in records]
+            slate.clear[rows] = [[record[f"{key}_clear"] for key in DISTANCE_KEYS] for record in records]
+        return slate
+
+    def set_row(self, index: int, record: dict) -> None:
+        self.counts[index] = [record[key] for key in DISTANCE_KEYS]
+        self.clear[index] = [record[f"{key}_clear"] for key in DISTANCE_KEYS]
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame) -> "FishSlate":
+        """
+        Build the slate from the (edited) DataFrame returned by to_dataframe.
+
+        Rows are placed by their name, so a reordered frame is realigned;
+        species missing from the frame stay at 0 and unclear. Counts are
+        clipped to 0 ... MAX_COUNT instead of wrapping around in int16.
+
+        Raises:
+            ValueError: if a name is not a slate species or appears twice
+        """
+        rows = []
+        for name in data["name"]:
+            index = _SPECIES_INDEX.get(name)
+            if index is None:
+                index = _SPECIES_INDEX.get(normalize_species_name(name))
+            if index is None:
+                raise ValueError(f"Unknown species {name!r}")
+            if index in rows:
+                raise ValueError(f"Species {name!r} appears twice")
+            rows.append(index)
+
+        # cleared cells come back as missing values
+        counts = data[list(DISTANCE_COLUMNS)].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=float)
+        clear = data[list(CLEAR_COLUMNS)].fillna(False).to_numpy(dtype=bool)
+
+        slate = cls.empty()
+        slate.counts[rows] = np.clip(np.rint(counts), 0, MAX_COUNT).astype(np.int16)
+        slate.clear[rows] = clear
+        return slate
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Editable DataFrame with one row per species. The count and clarity
+        columns are views of the slate arrays, not copies.
+        """
+        columns = {"name": np.asarray(SPECIES, dtype=object)}
+        for index, (distance_column, clear_column) in enumerate(zip(DISTANCE_COLUMNS, CLEAR_COLUMNS)):
+            columns[distance_column] = self.counts[:, index]
+            columns[clear_column] = self.clear[:, index]
+
+        return pd.DataFrame(columns, copy=False)
+
+    def group_rows(self, group: str) -> tuple:
+        """
+        Return (names, counts, clear) of one species group.
+        """
+        group_slice = GROUP_SLICES[group]
+        return SPECIES[group_slice], self.counts[group_slice], self.clear[group_slice]
+
+    def to_response(self) -> dict:
+        """
+        SegmentationLabelsFishInvert-shaped group lists of plain dicts.
+        """
+        counts = self.counts.tolist()
+        clear = self.clear.tolist()
+        response = {}
+        for group, group_slice in GROUP_SLICES.items():
+            response[group] = []
+            for index in range(group_slice.start, group_slice.stop):
+                record = {"name": SPECIES[index]}
+                for position, key in enumerate(DISTANCE_KEYS):
+                    record[key] = counts[index][position]
+                    record[f"{key}_clear"] = clear[index][position]
+                response[group].append(record)
+
+        return response
+
+    def to_labels(self):
+        """
+        Return the slate as SegmentationLabelsFishInvert, built without validation.
+        """
+        # imported here so the array code does not pull in the model client
+        from llm import LabelRecordingsFishInvert, SegmentationLabelsFishInvert
+
+        counts = self.counts.tolist()
+        clear = self.clear.tolist()
+        groups = {}
+        for group, group_slice in GROUP_SLICES.items():
+            groups[group] = [
+                LabelRecordingsFishInvert.model_construct(
+                    name=SPECIES[index],
+                    distance_one=counts[index][0],
+                    distance_one_clear=clear[index][0],
+                    distance_two=counts[index][1],
+                    distance_two_clear=clear[index][1],
+                    distance_three=counts[index][2],
+                    distance_three_clear=clear[index][2],
+                    distance_four=counts[index][3],
+                    distance_four_clear=clear[index][3],
+                )
+                for index in range(group_slice.start, group_slice.stop)
+            ]
+
+        return SegmentationLabelsFishInvert.model_construct(**groups)
+
+
+def fish_slate(response_data) -> FishSlate:
+    """
+    Return response_data as a FishSlate, converting model output if needed.
+    """
+    if isinstance(response_data, FishSlate):
+        return response_data
+    return FishSlate.from_response(response_data)
+
+
+def stack_slates(slates: list) -> tuple:
+    """
+    Stack slates into (n, 39, 4) count and clarity arrays for aggregation.
+    """
+    if not slates:
+        return np.zeros((0,) + SLATE_SHAPE, dtype=np.int16), np.zeros((0,) + SLATE_SHAPE, dtype=bool)
+    return np.stack([slate.counts for slate in slates]), np.stack([slate.clear for slate in slates])
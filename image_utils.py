@@ -0,0 +1,303 @@
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+import streamlit as st
+
+from tracing import traced
+
+
+# default preprocessing settings (optional "preprocess" section in the secrets)
+PREPROCESS_CONFIG = {
+    "enabled": True,
+    "crop": True,
+    "long_edge": 2048,
+    "format": "JPEG",
+    "quality": 85,
+    "min_quality": 60,
+    "max_bytes": 1_500_000,
+}
+PREPROCESS_CONFIG.update(st.secrets.get("preprocess", {}))
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+}
+
+
+def _otsu_threshold(pixels: np.ndarray) -> int:
+    """
+    Pick the grey level that best separates a bright slate from a darker background.
+    """
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 127
+
+    levels = np.arange(256, dtype=np.float64)
+    weight_background = np.cumsum(histogram)
+    weight_foreground = total - weight_background
+    sum_background = np.cumsum(histogram * levels)
+    mean_background = sum_background / np.maximum(weight_background, 1)
+    mean_foreground = (sum_background[-1] - sum_background) / np.maximum(weight_foreground, 1)
+    between_variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+
+    return int(np.argmax(between_variance))
+
+
+def find_slate_bbox(
+    image: Image.Image,
+    max_side: int = 512,
+    bright_fraction: float = 0.5,
+    margin: float = 0.02,
+    min_area: float = 0.3
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Locate the slate in a photo using row/column brightness profiles on a thumbnail.
+
+    Args:
+        image: PIL Image object
+        max_side: Long edge of the thumbnail the profiles are computed on
+        bright_fraction: Fraction of bright pixels a row/column needs to count as slate
+        margin: Padding added around the detected region, relative to the image size
+        min_area: Detected regions smaller than this fraction of the image are ignored
+
+    Returns:
+        (left, upper, right, lower) box in full resolution pixels, or None if no
+        reliable slate region was found
+    """
+    thumbnail = image.convert("L")
+    thumbnail.thumbnail((max_side, max_side))
+    pixels = np.asarray(thumbnail, dtype=np.uint8)
+
+    mask = pixels > _otsu_threshold(pixels)
+    rows = np.flatnonzero(mask.mean(axis=1) > bright_fraction)
+    cols = np.flatnonzero(mask.mean(axis=0) > bright_fraction)
+    if rows.size == 0 or cols.size == 0:
+        return None
+
+    height, width = pixels.shape
+    top, bottom = rows[0], rows[-1] + 1
+    left, right = cols[0], cols[-1] + 1
+    if (bottom - top) * (right - left) < min_area * height * width:
+        return None
+
+    # pad and scale back to the full resolution image
+    pad_y, pad_x = int(margin * height), int(margin * width)
+    scale_x, scale_y = image.width / width, image.height / height
+    return (
+        max(0, int((left - pad_x) * scale_x)),
+        max(0, int((top - pad_y) * scale_y)),
+        min(image.width, int((right + pad_x) * scale_x)),
+        min(image.height, int((bottom + pad_y) * scale_y)),
+    )
+
+
+def _column_profile(dark: np.ndarray, max_skew_degrees: float, skew_step: float) -> Tuple[np.ndarray, float]:
+    """
+    Column profile of a dark-pixel mask along the most likely rule direction.
+
+    Every candidate skew shears the mask row by row and sums it per column;
+    the one with the sharpest profile (largest sum of squares) follows the
+    vertical rules of a slightly rotated slate.
+
+    Returns:
+        (profile, slope): fraction of dark rows per column, and the horizontal
+        shift of a rule per row away from the middle row
+    """
+    height, width = dark.shape
+    rows, cols = np.nonzero(dark)
+    offsets = rows - height / 2
+
+    best_profile, best_slope = None, 0.0
+    for angle in np.arange(-max_skew_degrees, max_skew_degrees + skew_step / 2, skew_step):
+        slope = np.tan(np.radians(angle))
+        shifted = np.rint(cols - slope * offsets).astype(np.intp)
+        inside = (shifted >= 0) & (shifted < width)
+        profile = np.bincount(shifted[inside], minlength=width) / height
+        if best_profile is None or np.dot(profile, profile) > np.dot(best_profile, best_profile):
+            best_profile, best_slope = profile, slope
+    return best_profile, best_slope
+
+
+def find_segment_grid(
+    image: Image.Image,
+    segments: int = 4,
+    max_side: int = 1024,
+    search: float = 0.08,
+    min_line_fraction: float = 0.4,
+    min_prominence: float = 3.0,
+    max_skew_degrees: float = 3.0,
+    overlap: float = 0.02
+) -> Optional[Tuple[List[Tuple[float, float]], Tuple[float, float]]]:
+    """
+    Find the segment columns of a slate photo from its column ink profile.
+
+    The segments are printed side by side in equal-width blocks separated
+    by vertical rules. Near every expected block boundary the column with
+    the most dark pixels is taken as the rule; it has to run through most
+    of the slate height and stand out from the columns around it. The rows
+    the rules run through are the vertical extent of the grid; what is above
+    or below it is the handwritten survey information.
+
+    Args:
+        image: PIL Image object, cropped to the slate
+        segments: Number of side-by-side segment blocks
+        max_side: Long edge of the thumbnail the profile is computed on
+        search: Half-width of the window around each expected boundary, relative to the width
+        min_line_fraction: Fraction of the rows a boundary rule has to darken
+        min_prominence: How many times darker than the median column of its window a rule has to be
+        max_skew_degrees: Largest rotation of the slate that is corrected for
+        overlap: Padding added on both sides of every column, relative to the width
+
+    Returns:
+        ((left, right) of every segment as fractions of the image width,
+        (top, bottom) of the grid as fractions of the image height), or None
+        if the boundaries could not be found reliably
+    """
+    thumbnail = image.convert("L")
+    thumbnail.thumbnail((max_side, max_side))
+    pixels = np.asarray(thumbnail, dtype=np.uint8)
+    if pixels.size == 0:
+        return None
+
+    dark = pixels < _otsu_threshold(pixels)
+    profile, slope = _column_profile(dark, max_skew_degrees, skew_step=0.25)
+
+    height, width = pixels.shape
+    reach = max(1, int(search * width))
+    rules = []
+    for index in range(1, segments):
+        expected = index * width // segments
+        start, stop = max(0, expected - reach), min(width, expected + reach + 1)
+        column = start + int(np.argmax(profile[start:stop]))
+        strength = profile[column]
+        if strength < min_line_fraction or strength < min_prominence * max(np.median(profile[start:stop]), 1e-6):
+            return None
+        rules.append(column)
+    boundaries = [0.0] + [(column + 0.5) / width for column in rules] + [1.0]
+
+    # a skewed rule drifts sideways by this much between the middle and the top/bottom row
+    pad = overlap + abs(slope) * height / 2 / width
+    columns = [
+        (float(max(0.0, left - pad)), float(min(1.0, right + pad)))
+        for left, right in zip(boundaries[:-1], boundaries[1:])
+    ]
+    return columns, _rule_extent(dark, rules, slope, overlap)
+
+
+def _rule_extent(dark: np.ndarray, rules: List[int], slope: float, overlap: float) -> Tuple[float, float]:
+    """
+    (top, bottom) fractions of the rows most of the rules run through, padded by overlap.
+    """
+    height, width = dark.shape
+    rows = np.arange(height)
+    hits = np.zeros(height)
+    for column in rules:
+        # follow the rule along its skew, one pixel of slack on either side
+        cols = np.rint(column + slope * (rows - height / 2)).astype(np.intp)
+        hits += np.max([dark[rows, np.clip(cols + shift, 0, width - 1)] for shift in (-1, 0, 1)], axis=0)
+
+    # smooth over broken stretches of the printed rules and stray handwriting across them
+    window = max(3, height // 50)
+    covered = np.convolve(hits / len(rules), np.ones(window) / window, mode="same") >= 0.5
+    found = np.flatnonzero(covered)
+    if found.size == 0:
+        return 0.0, 1.0
+    return float(max(0.0, found[0] / height - overlap)), float(min(1.0, (found[-1] + 1) / height + overlap))
+
+
+def resize_long_edge(image: Image.Image, long_edge: int) -> Image.Image:
+    """
+    Downscale an image so its longest side is at most long_edge pixels.
+    """
+    if max(image.size) <= long_edge:
+        return image
+
+    scale = long_edge / max(image.size)
+    new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(new_size, Image.Resampling.LANCZOS)
+
+
+def encode_image(image: Image.Image, format_: str = "JPEG", quality: int = 85, min_quality: int = 60, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Encode an image, lowering the quality step by step until it fits in max_bytes.
+
+    Args:
+        image: PIL Image object
+        format_: "JPEG", "WEBP" or "PNG"
+        quality: Starting encoder quality
+        min_quality: Lowest quality that will be tried
+        max_bytes: Size budget for the encoded image, None for no budget
+
+    Returns:
+        bytes: encoded image
+    """
+    if format_ in ("JPEG", "WEBP") and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    while True:
+        with BytesIO() as buffer:
+            if format_ == "PNG":
+                image.save(buffer, format=format_, optimize=True)
+            else:
+                image.save(buffer, format=format_, quality=quality)
+            encoded = buffer.getvalue()
+
+        if format_ == "PNG" or max_bytes is None or len(encoded) <= max_bytes or quality <= min_quality:
+            return encoded
+        quality = max(min_quality, quality - 10)
+
+
+@traced()
+def preprocess_slate_image(image: Image.Image, source_bytes: Optional[int] = None, config: Optional[Dict] = None) -> Tuple[bytes, Dict]:
+    """
+    Prepare a slate photo for the model: EXIF transpose, crop to the slate,
+    resize to the target long edge and re-encode within a size budget.
+
+    Args:
+        image: PIL Image object (output of handle_image_orientation)
+        source_bytes: Size of the uploaded file, reported as bytes_before
+        config: Overrides for PREPROCESS_CONFIG
+
+    Returns:
+        Tuple of the encoded image bytes and a stats dict with bytes_before,
+        bytes_after, original_size, final_size, crop_box and mime_type
+    """
+    settings = {**PREPROCESS_CONFIG, **(config or {})}
+    format_ = settings["format"].upper()
+
+    original_size = image.size
+    processed = ImageOps.exif_transpose(image)
+
+    crop_box = None
+    if settings["enabled"] and settings["crop"]:
+        crop_box = find_slate_bbox(processed)
+        if crop_box is not None:
+            processed = processed.crop(crop_box)
+
+    if settings["enabled"]:
+        processed = resize_long_edge(processed, int(settings["long_edge"]))
+        encoded = encode_image(
+            processed,
+            format_,
+            int(settings["quality"]),
+            int(settings["min_quality"]),
+            settings.get("max_bytes")
+        )
+    else:
+        encoded = encode_image(processed, format_, int(settings["quality"]))
+
+    stats = {
+        "bytes_before": source_bytes,
+        "bytes_after": len(encoded),
+        "original_size": original_size,
+        "final_size": processed.size,
+        "crop_box": crop_box,
+        "mime_type": MIME_TYPES.get(format_, "image/jpeg"),
+    }
+    print(f"Preprocessed slate image {original_size} -> {processed.size}, {source_bytes} -> {len(encoded)} bytes")
+
+    return encoded, stats
@@ -0,0 +1,296 @@
+import hashlib
+import os
+import sqlite3
+import time
+import uuid
+from typing import Dict, Optional
+
+import streamlit as st
+
+
+# job settings (optional "jobs" section in the secrets)
+job_settings = st.secrets.get("jobs", {})
+
+JOB_DB_PATH = job_settings.get("DB_PATH", os.path.join(".jobs", "jobs.sqlite3"))
+JOB_LEASE_SECONDS = int(job_settings.get("LEASE_SECONDS", 300))
+JOB_MAX_ATTEMPTS = int(job_settings.get("MAX_ATTEMPTS", 3))
+# finished jobs (with their image) are deleted after this long
+JOB_RETENTION_SECONDS = int(job_settings.get("RETENTION_SECONDS", 7 * 24 * 60 * 60))
+
+JOB_COLUMNS = "job_id, slate_type, image_digest, status, result, partial, error, attempts, worker_id, created_at, updated_at"
+
+
+def _connect(db_path: str = JOB_DB_PATH) -> sqlite3.Connection:
+    """
+    Open the job database, creating it on first use.
+
+    WAL mode lets the app poll job status while workers (threads or separate
+    processes) write results.
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            slate_type TEXT NOT NULL,
+            image BLOB NOT NULL,
+            image_digest TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            partial TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker_id TEXT,
+            lease_until REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    # job databases created before streamed results lack the partial column
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+    if "partial" not in columns:
+        connection.execute("ALTER TABLE jobs ADD COLUMN partial TEXT")
+    connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+    connection.execute("CREATE INDEX IF NOT EXISTS jobs_digest ON jobs (image_digest, slate_type)")
+
+    return connection
+
+
+def submit_job(image_bytes: bytes, slate_type: str, db_path: str = JOB_DB_PATH) -> str:
+    """
+    Queue an extraction for a preprocessed slate image.
+
+    Submitting the same image and slate type again returns the existing job
+    unless it failed or was cancelled, so reruns do not queue duplicate work.
+
+    Args:
+        image_bytes: Encoded image sent to the model
+        slate_type: "substrate" or "fish_and_invert"
+        db_path: Job database path
+
+    Returns:
+        str: job id
+    """
+    image_digest = hashlib.sha256(image_bytes).hexdigest()
+    now = time.time()
+
+    connection = _connect(db_path)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        existing = connection.execute(
+            "SELECT job_id FROM jobs WHERE image_digest = ? AND slate_type = ? AND status NOT IN ('failed', 'cancelled') ORDER BY created_at DESC LIMIT 1",
+            (image_digest, slate_type)
+        ).fetchone()
+        if existing is not None:
+            connection.execute("COMMIT")
+            return existing["job_id"]
+
+        job_id = str(uuid.uuid4())
+        connection.execute(
+            "INSERT INTO jobs (job_id, slate_type, image, image_digest, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, slate_type, image_bytes, image_digest, now, now)
+        )
+        connection.execute("COMMIT")
+        return job_id
+    finally:
+        connection.close()
+
+
+def get_job(job_id: str, include_image: bool = False, db_path: str = JOB_DB_PATH) -> Optional[Dict]:
+    """
+    Return a job as a dict (status, result, error, ...), or None if it does not exist.
+    """
+    columns = JOB_COLUMNS + (", image" if include_image else "")
+    connection = _connect(db_path)
+    try:
+        row = connection.execute(f"SELECT {columns} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    finally:
+        connection.close()
+
+    return dict(row) if row is not None else None
+
+
+def claim_job(worker_id: str, db_path: str = JOB_DB_PATH) -> Optional[Dict]:
+    """
+    Take the oldest runnable job for a worker.
+
+    Runnable jobs are queued ones and running ones whose lease expired, e.g.
+    because their worker died or the app restarted mid-extraction.
+
+    Returns:
+        Dict: the job including its image, or None if the queue is empty
+    """
+    now = time.time()
+    connection = _connect(db_path)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            f"""
+            SELECT {JOB_COLUMNS}, image FROM jobs
+            WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?))
+              AND attempts < ?
+            ORDER BY created_at
+            LIMIT 1
+            """,
+            (now, JOB_MAX_ATTEMPTS)
+        ).fetchone()
+        if row is None:
+            connection.execute("COMMIT")
+            return None
+
+        connection.execute(
+            "UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, partial = NULL, lease_until = ?, updated_at = ? WHERE job_id = ?",
+            (worker_id, now + JOB_LEASE_SECONDS, now, row["job_id"])
+        )
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
+
+    job = dict(row)
+    job.update({"status": "running", "worker_id": worker_id, "attempts": job["attempts"] + 1})
+    return job
+
+
+def update_job_partial(job_id: str, worker_id: str, partial_json: str, db_path: str = JOB_DB_PATH) -> bool:
+    """
+    Store the part of the model output received so far (JSON object of the
+    completed top-level fields) for the app to show while the job runs, and
+    extend the lease of the worker.
+
+    Returns:
+        bool: False if the job is no longer running for this worker, e.g. it
+        was cancelled or its lease expired and another worker claimed it
+    """
+    now = time.time()
+    connection = _connect(db_path)
+    try:
+        cursor = connection.execute(
+            "UPDATE jobs SET partial = ?, lease_until = ?, updated_at = ? WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+            (partial_json, now + JOB_LEASE_SECONDS, now, job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+def renew_job_lease(job_id: str, worker_id: str, db_path: str = JOB_DB_PATH) -> bool:
+    """
+    Extend the lease of a running job, so long extractions are not claimed again.
+
+    Returns:
+        bool: False if the job is no longer running for this worker
+    """
+    now = time.time()
+    connection = _connect(db_path)
+    try:
+        cursor = connection.execute(
+            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+            (now + JOB_LEASE_SECONDS, job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+def cancel_job(job_id: str, db_path: str = JOB_DB_PATH) -> bool:
+    """
+    Cancel a queued or running job; a running extraction stops at its next streamed field.
+
+    Returns:
+        bool: True if the job was cancelled
+    """
+    connection = _connect(db_path)
+    try:
+        cursor = connection.execute(
+            "UPDATE jobs SET status = 'cancelled', lease_until = NULL, updated_at = ? WHERE job_id = ? AND status IN ('queued', 'running')",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+def complete_job(job_id: str, worker_id: str, result_json: str, db_path: str = JOB_DB_PATH) -> bool:
+    """
+    Store the validated model output (JSON) of a finished job.
+
+    Returns:
+        bool: False if the job is no longer running for this worker; the
+        result is dropped then
+    """
+    connection = _connect(db_path)
+    try:
+        cursor = connection.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_until = NULL, updated_at = ? WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+            (result_json, time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+def fail_job(job_id: str, worker_id: str, error: str, retry: bool = True, db_path: str = JOB_DB_PATH) -> bool:
+    """
+    Record a failed attempt; the job is queued again until it runs out of attempts.
+
+    Returns:
+        bool: False if the job is no longer running for this worker
+    """
+    connection = _connect(db_path)
+    try:
+        cursor = connection.execute(
+            """
+            UPDATE jobs
+            SET status = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END,
+                error = ?, lease_until = NULL, updated_at = ?
+            WHERE job_id = ? AND worker_id = ? AND status = 'running'
+            """,
+            (retry, JOB_MAX_ATTEMPTS, error, time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+def fail_exhausted_jobs(db_path: str = JOB_DB_PATH) -> int:
+    """
+    Mark jobs whose lease expired on their last attempt as failed.
+
+    Returns:
+        int: number of jobs marked failed
+    """
+    connection = _connect(db_path)
+    try:
+        cursor = connection.execute(
+            "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'Worker lease expired'), updated_at = ? "
+            "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (time.time(), time.time(), JOB_MAX_ATTEMPTS)
+        )
+        return cursor.rowcount
+    finally:
+        connection.close()
+
+
+def purge_jobs(older_than_seconds: int = JOB_RETENTION_SECONDS, db_path: str = JOB_DB_PATH) -> int:
+    """
+    Delete finished, failed and cancelled jobs older than the given age.
+
+    Returns:
+        int: number of jobs deleted
+    """
+    connection = _connect(db_path)
+    try:
+        cursor = connection.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND updated_at < ?",
+            (time.time() - older_than_seconds,)
+        )
+        return cursor.rowcount
+    finally:
+        connection.close()
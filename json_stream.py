@@ -0,0 +1,69 @@
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJsonParser:
+    """
+    Incremental parser for a streamed JSON object.
+
+    feed() takes the response text as it arrives and returns the top-level
+    members that became complete, e.g. ("segment_one", [...]) as soon as the
+    segment_one array and the comma after it have been received. Every
+    character is scanned once, however the text is split into chunks.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add the next chunk of text; returns the (key, value) members completed by it.
+        """
+        self._text += chunk
+        members = []
+        text = self._text
+
+        for position in range(self._position, len(text)):
+            char = text[position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+                # a string at depth 1 outside a member is the key of the next member
+                if self._depth == 1 and self._member_start is None:
+                    self._member_start = position
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0 and self._member_start is not None:
+                    members.append(self._parse_member(text, position))
+            elif char == "," and self._depth == 1 and self._member_start is not None:
+                members.append(self._parse_member(text, position))
+
+        # drop the text of the finished members, keep the open one
+        keep_from = self._member_start if self._member_start is not None else len(text)
+        self._text = text[keep_from:]
+        if self._member_start is not None:
+            self._member_start = 0
+        self._position = len(text) - keep_from
+
+        return members
+
+    def _parse_member(self, text: str, end: int) -> Tuple[str, Any]:
+        member = json.loads("{" + text[self._member_start:end] + "}")
+        self._member_start = None
+        return next(iter(member.items()))
@@ -1,13 +1,34 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import inspect
+import json
 import os
+import random
+import threading
+import time
+from io import BytesIO
+from typing import Any, Callable, Optional, Tuple, Union
 from pydantic import BaseModel, Field
 import streamlit as st
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import PIL.Image
 from pydantic import BaseModel
 from typing import TypedDict, Annotated, List, Dict
 
 
 from prompts import SLATE_IMAGE_INSTRUCTIONS, FISH_INVERT_INSTRUCTIONS
+from prompts import SUBSTRATE_RECHECK_INSTRUCTIONS, FISH_INVERT_RECHECK_INSTRUCTIONS
+from prompts import SUBSTRATE_SEGMENT_INSTRUCTIONS, SUBSTRATE_INFO_INSTRUCTIONS, SECTION_REREQUEST_NOTE
+from cache_utils import ExtractionCache, image_fingerprint, make_cache_key
+from json_stream import IncrementalJsonParser
+from replay import REPLAY_MODES, wrap_model
+from tracing import annotate, carry_context, traced
+from image_utils import encode_image, find_segment_grid
+from substrate_grid import SEGMENT_KEYS, SUBSTRATE_LABELS, canonical_distances
+from fish_slate import FISH_GROUPS, DISTANCE_KEYS, normalize_species_name
+from validation import repair_substrate, repair_fish_invert
 
 
 
@@ -16,9 +37,42 @@ os.environ["GEMINI_API_KEY"] = st.secrets["gemini"]["GEMINI_API_KEY"]
 
 # constants
 MODEL = "gemini-2.5-flash"
+ASYNC_TIMEOUT_SECONDS = 120
+ASYNC_MAX_RETRIES = 3
 
 genai.configure(api_key=os.environ["GEMINI_API_KEY"])
 
+# extraction cache settings (optional "cache" section in the secrets)
+cache_settings = st.secrets.get("cache", {})
+
+EXTRACTION_CACHE = ExtractionCache(
+    cache_dir=cache_settings.get("CACHE_DIR", ".extraction_cache"),
+    max_entries=int(cache_settings.get("MAX_ENTRIES", 2000)),
+    max_bytes=int(cache_settings.get("MAX_BYTES", 200 * 1024 * 1024)),
+    max_age_seconds=int(cache_settings.get("MAX_AGE_SECONDS", 30 * 24 * 60 * 60))
+)
+
+# second pass over unclear cells (optional "recheck" section in the secrets)
+recheck_settings = st.secrets.get("recheck", {})
+RECHECK_UNCLEAR = bool(recheck_settings.get("ENABLED", True))
+# above this many unclear cells the photo itself is the problem, so skip the second pass
+RECHECK_MAX_CELLS = int(recheck_settings.get("MAX_CELLS", 60))
+
+# record / replay of the model calls for offline benchmarks (optional "replay" section in the secrets)
+replay_settings = st.secrets.get("replay", {})
+_REPLAY = {
+    "mode": replay_settings.get("MODE", "off"),
+    "directory": replay_settings.get("DIR", ".recordings"),
+    "latency_scale": float(replay_settings.get("LATENCY_SCALE", 1.0)),
+}
+
+# one request per substrate segment when the grid is found (optional "tiling" section in the secrets)
+tiling_settings = st.secrets.get("tiling", {})
+TILE_SEGMENTS = bool(tiling_settings.get("ENABLED", True))
+# the survey information is sent cropped when the band above / below the grid is at least this tall
+INFO_MIN_HEIGHT = float(tiling_settings.get("INFO_MIN_HEIGHT", 0.05))
+
+
 class LabelRecordings(BaseModel):
     distance: str
     label: str
@@ -62,46 +116,700 @@ class SegmentationLabelsFishInvert(BaseModel):
     rare_animals: List[LabelRecordingsFishInvert]
 
 
+class SegmentLabels(BaseModel):
+  labels: List[LabelRecordings]
 
-def image_label_generator(image_path: str, prompt: str = SLATE_IMAGE_INSTRUCTIONS):
-    img = PIL.Image.open(image_path)
 
-    model = genai.GenerativeModel(
-        model_name=MODEL,
-        generation_config={
-            "response_mime_type": "application/json",
-            "response_schema": SegmentationLabels,
-        }
-    )
+class SlateInformation(BaseModel):
+  info_segment: List[InfoRecordings]
+
+
+class RecheckRecordings(BaseModel):
+  segment: str = Field(description = "segment_one, segment_two, segment_three or segment_four")
+  distance: str
+  label: str
+  label_status: bool
+
+
+class SubstrateRecheck(BaseModel):
+  cells: List[RecheckRecordings]
+
+
+class FishInvertRecheck(BaseModel):
+    rows: List[LabelRecordingsFishInvert]
+
+
+
+# errors worth retrying; the first two are Gemini rate limits (HTTP 429)
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests))
+
+
+def is_retryable_error(error: Exception) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """
+    Exponential backoff with full jitter for the given (0-based) retry attempt.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+ImageInput = Union[str, bytes, PIL.Image.Image]
+
+
+def _detect_mime_type(image_bytes: bytes) -> str:
+    if image_bytes[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def prepare_image_part(image: ImageInput):
+    """
+    Turn a path, encoded image bytes or a PIL image into a request part plus its cache digest.
+
+    Encoded bytes (e.g. the output of image_utils.preprocess_slate_image) are sent
+    to the model as-is, without being decoded and re-encoded.
+    """
+    if isinstance(image, bytes):
+        part = {"mime_type": _detect_mime_type(image), "data": image}
+        return part, hashlib.sha256(image).hexdigest()
+
+    img = PIL.Image.open(image) if isinstance(image, str) else image
+    return img, image_fingerprint(img)
+
+
+_MODEL_INSTANCES = {}
+_MODEL_LOCK = threading.Lock()
+
+
+def set_replay_mode(mode: str, directory: Optional[str] = None, latency_scale: float = 1.0) -> None:
+    """
+    Switch the model calls to "record" (call the API and save the responses
+    to directory), "replay" (answer from the saved responses, reproducing
+    their latency times latency_scale) or "off".
+    """
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"Unknown replay mode {mode!r}, expected one of {REPLAY_MODES}")
+    _REPLAY.update(mode=mode, latency_scale=latency_scale)
+    if directory is not None:
+        _REPLAY["directory"] = directory
+
+
+def get_model(response_schema: type) -> genai.GenerativeModel:
+    """
+    Return the shared GenerativeModel for a response schema, creating it on first use.
+    In record or replay mode (set_replay_mode) it is wrapped accordingly.
+    """
+    if _REPLAY["mode"] == "replay":
+        # answered from the recordings, no API model needed
+        return wrap_model(None, MODEL, response_schema, "replay", _REPLAY["directory"], _REPLAY["latency_scale"])
+
+    with _MODEL_LOCK:
+        model = _MODEL_INSTANCES.get(response_schema)
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=MODEL,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": response_schema,
+                }
+            )
+            _MODEL_INSTANCES[response_schema] = model
+
+    return wrap_model(model, MODEL, response_schema, _REPLAY["mode"], _REPLAY["directory"], _REPLAY["latency_scale"])
+
+
+@traced()
+def generate_structured_output(image: ImageInput, prompt: str, response_schema: type, use_cache: bool = True):
+    """
+    Run a structured extraction for an image, serving repeated requests from the extraction cache.
+
+    Args:
+        image: Local path, encoded image bytes or PIL image of the slate
+        prompt: Instructions sent along with the image
+        response_schema: Pydantic model the response is validated against
+        use_cache: Look up and store the response in EXTRACTION_CACHE
+
+    Returns:
+        Validated instance of response_schema
+    """
+    img, image_digest = prepare_image_part(image)
+    annotate(schema=response_schema.__name__)
+
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(image_digest, prompt, MODEL, response_schema)
+        cached_response = EXTRACTION_CACHE.get(cache_key)
+        annotate(cache_hit=cached_response is not None)
+        if cached_response is not None:
+            return response_schema.model_validate_json(cached_response)
+
+    model = get_model(response_schema)
 
     response = model.generate_content([prompt, img])
 
     # Convert JSON string into validated Pydantic object
-    structured_output = SegmentationLabels.model_validate_json(response.text)
+    structured_output = response_schema.model_validate_json(response.text)
+
+    if use_cache:
+        EXTRACTION_CACHE.set(cache_key, response.text)
 
     return structured_output
 
 
+_EVENT_LOOP = None
+_EVENT_LOOP_LOCK = threading.Lock()
 
-def image_label_generator_fish_invert(image_path: str, prompt: str = FISH_INVERT_INSTRUCTIONS):
-    img = PIL.Image.open(image_path)
 
-    model = genai.GenerativeModel(
-        model_name=MODEL,
-        generation_config={
-            "response_mime_type": "application/json",
-            "response_schema": SegmentationLabelsFishInvert,
-        }
-    )
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide event loop that async extractions run on.
 
-    response = model.generate_content([prompt, img])
+    The SDK caches its async client on the loop that first used it, so every
+    async call in the app goes through this one loop, running in a daemon thread.
+    """
+    global _EVENT_LOOP
+
+    with _EVENT_LOOP_LOCK:
+        if _EVENT_LOOP is None:
+            _EVENT_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_EVENT_LOOP.run_forever, name="llm-event-loop", daemon=True).start()
+
+    return _EVENT_LOOP
+
+
+def submit_coroutine(coroutine) -> concurrent.futures.Future:
+    """
+    Schedule a coroutine on the shared event loop from any thread.
+
+    Cancelling the returned future cancels the coroutine. Spans started by
+    the coroutine belong to the caller's trace.
+    """
+    return asyncio.run_coroutine_threadsafe(carry_context(coroutine), get_event_loop())
+
+
+# called with (key, value) for every top-level field of a streamed response,
+# e.g. ("segment_one", [...]); may be a coroutine function
+SectionCallback = Callable[[str, Any], Any]
+
+
+async def _emit_section(on_section: SectionCallback, key: str, value: Any) -> None:
+    result = on_section(key, value)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def _generate_text(model: genai.GenerativeModel, contents: list, on_section: Optional[SectionCallback] = None) -> str:
+    """
+    Run one request and return the response text.
+
+    With on_section the response is streamed and every top-level field is
+    handed to on_section as soon as it has been received completely.
+    """
+    if on_section is None:
+        response = await model.generate_content_async(contents)
+        return response.text
+
+    parser = IncrementalJsonParser()
+    parts = []
+    response = await model.generate_content_async(contents, stream=True)
+    async for chunk in response:
+        parts.append(chunk.text)
+        for key, value in parser.feed(chunk.text):
+            await _emit_section(on_section, key, value)
+
+    return "".join(parts)
+
+
+class RateLimitGate:
+    """
+    Shared pause for every extraction that uses the gate.
+
+    When one call is rate limited the others wait until its backoff has
+    passed, instead of all of them hitting the quota again straight away.
+    """
+
+    def __init__(self):
+        self._resume_at = 0.0
+
+    async def wait(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._resume_at - time.monotonic()
+
+    def block_for(self, seconds: float) -> None:
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+@traced()
+async def generate_structured_output_async(
+    image: ImageInput,
+    prompt: str,
+    response_schema: type,
+    use_cache: bool = True,
+    timeout: float = ASYNC_TIMEOUT_SECONDS,
+    max_retries: int = ASYNC_MAX_RETRIES,
+    gate: RateLimitGate = None,
+    on_section: Optional[SectionCallback] = None
+):
+    """
+    Async version of generate_structured_output using generate_content_async.
+
+    Each attempt is bounded by timeout; timeouts, rate limits and transient
+    errors are retried up to max_retries times with jittered backoff.
+    Cancelling the calling task stops the extraction immediately, and so
+    does an exception raised by on_section.
+
+    Args:
+        image: Local path, encoded image bytes or PIL image of the slate
+        prompt: Instructions sent along with the image
+        response_schema: Pydantic model the response is validated against
+        use_cache: Look up and store the response in EXTRACTION_CACHE
+        timeout: Seconds allowed per attempt
+        max_retries: Retries after the first attempt
+        gate: Rate limit gate shared with other extractions
+        on_section: Stream the response and call this with every top-level
+            field as it arrives; a retry sends the fields again
+
+    Returns:
+        Validated instance of response_schema
+    """
+    img, image_digest = await asyncio.to_thread(prepare_image_part, image)
+    annotate(schema=response_schema.__name__)
+
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(image_digest, prompt, MODEL, response_schema)
+        cached_response = EXTRACTION_CACHE.get(cache_key)
+        annotate(cache_hit=cached_response is not None)
+        if cached_response is not None:
+            if on_section is not None:
+                for key, value in json.loads(cached_response).items():
+                    await _emit_section(on_section, key, value)
+            return response_schema.model_validate_json(cached_response)
+
+    model = get_model(response_schema)
+    gate = gate or RateLimitGate()
+
+    attempt = 0
+    while True:
+        await gate.wait()
+        try:
+            response_text = await asyncio.wait_for(_generate_text(model, [prompt, img], on_section), timeout)
+            annotate(attempts=attempt + 1)
+            break
+        except Exception as error:
+            if attempt >= max_retries or not (isinstance(error, asyncio.TimeoutError) or is_retryable_error(error)):
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Retrying extraction in {delay:.1f}s after: {str(error) or type(error).__name__}")
+            if is_rate_limit_error(error):
+                gate.block_for(delay)
+            else:
+                await asyncio.sleep(delay)
+            attempt += 1
 
     # Convert JSON string into validated Pydantic object
-    structured_output = SegmentationLabelsFishInvert.model_validate_json(response.text)
+    structured_output = response_schema.model_validate_json(response_text)
+
+    if use_cache:
+        EXTRACTION_CACHE.set(cache_key, response_text)
 
     return structured_output
 
 
+def image_label_generator(image: ImageInput, prompt: str = SLATE_IMAGE_INSTRUCTIONS, use_cache: bool = True):
+    return generate_structured_output(image, prompt, SegmentationLabels, use_cache)
+
+
+def image_label_generator_fish_invert(image: ImageInput, prompt: str = FISH_INVERT_INSTRUCTIONS, use_cache: bool = True):
+    return generate_structured_output(image, prompt, SegmentationLabelsFishInvert, use_cache)
+
+
+async def image_label_generator_async(image: ImageInput, prompt: str = SLATE_IMAGE_INSTRUCTIONS, **kwargs):
+    return await generate_structured_output_async(image, prompt, SegmentationLabels, **kwargs)
+
+
+async def image_label_generator_fish_invert_async(image: ImageInput, prompt: str = FISH_INVERT_INSTRUCTIONS, **kwargs):
+    return await generate_structured_output_async(image, prompt, SegmentationLabelsFishInvert, **kwargs)
+
+
+# (left, top, right, bottom) as fractions of the image size
+CropBox = Tuple[float, float, float, float]
+
+
+def unclear_substrate_cells(labels: SegmentationLabels) -> Dict[str, List[str]]:
+    """
+    Return segment -> distances of the points read with label_status False.
+    """
+    cells = {}
+    for segment in SEGMENT_KEYS:
+        distances = [record.distance for record in getattr(labels, segment) if not record.label_status]
+        if distances:
+            cells[segment] = distances
+    return cells
+
+
+def unclear_fish_invert_rows(labels: SegmentationLabelsFishInvert) -> Dict[str, List[str]]:
+    """
+    Return group -> names of the species with at least one count not marked clear.
+    """
+    rows = {}
+    for group in SegmentationLabelsFishInvert.model_fields:
+        names = [
+            record.name for record in getattr(labels, group)
+            if not all(getattr(record, f"{key}_clear") for key in DISTANCE_KEYS)
+        ]
+        if names:
+            rows[group] = names
+    return rows
+
+
+def _open_image(image: ImageInput) -> PIL.Image.Image:
+    if isinstance(image, bytes):
+        return PIL.Image.open(BytesIO(image))
+    if isinstance(image, str):
+        return PIL.Image.open(image)
+    return image
+
+
+def crop_images(image: ImageInput, boxes: Dict[str, CropBox]) -> Dict[str, bytes]:
+    """
+    Cut regions out of a slate image and encode them for requests.
+    CPU bound, run it off the event loop (asyncio.to_thread).
+    """
+    image = _open_image(image)
+    width, height = image.size
+    crops = {}
+    for key, (left, top, right, bottom) in boxes.items():
+        region = image.crop((round(left * width), round(top * height), round(right * width), round(bottom * height)))
+        crops[key] = encode_image(region, "JPEG", quality=90)
+    return crops
+
+
+async def _find_crop_regions(image: ImageInput, crop_regions: Optional[Dict[str, CropBox]]) -> Dict[str, CropBox]:
+    """
+    crop_regions, or the substrate regions found on the image when they were
+    not passed in and tiling is enabled; empty for no cropping.
+    """
+    if crop_regions is None and TILE_SEGMENTS:
+        crop_regions = await asyncio.to_thread(segment_crop_regions, image)
+    return crop_regions or {}
+
+
+def _distance_key(distance: str) -> Optional[float]:
+    try:
+        return float(str(distance).lower().rstrip("m").strip())
+    except ValueError:
+        return None
+
+
+async def _run_rechecks(requests: List[Tuple[ImageInput, str]], response_schema: type, **kwargs) -> list:
+    """
+    Send follow-up requests concurrently; a failed request only loses its own
+    part. Returns the responses in request order, None for the failed ones.
+    """
+    responses = await asyncio.gather(
+        *(generate_structured_output_async(image, prompt, response_schema, **kwargs) for image, prompt in requests),
+        return_exceptions=True
+    )
+    for response in responses:
+        if isinstance(response, BaseException) and not isinstance(response, Exception):
+            raise response
+        if isinstance(response, Exception):
+            print(f"Follow-up request failed: {str(response) or type(response).__name__}")
+    return [None if isinstance(response, BaseException) else response for response in responses]
+
+
+@traced()
+async def recheck_unclear_substrate(
+    image: ImageInput,
+    labels: SegmentationLabels,
+    crop_regions: Optional[Dict[str, CropBox]] = None,
+    max_cells: int = RECHECK_MAX_CELLS,
+    **kwargs
+) -> SegmentationLabels:
+    """
+    Ask the model again about the points read with label_status False.
+
+    Only the unclear cells are listed, so the response holds a few records
+    instead of all 160. With crop_regions (segment -> box) every segment is
+    sent as its own cropped request, otherwise one request covers all cells.
+    When crop_regions is None the regions are found on the image
+    (segment_crop_regions) if tiling is enabled; pass them in when they are
+    already known.
+    A second reading only replaces a cell when it is confident and its label
+    is a known code.
+
+    Args:
+        image: The image the labels were extracted from
+        labels: First extraction
+        crop_regions: Region of each segment on the image, {} for no cropping
+        max_cells: Skip the second pass when more cells than this are unclear
+        **kwargs: Passed to generate_structured_output_async (gate, use_cache, ...)
+
+    Returns:
+        SegmentationLabels: labels with the rechecked cells merged in
+    """
+    cells = unclear_substrate_cells(labels)
+    cell_count = sum(len(distances) for distances in cells.values())
+    if cell_count == 0 or cell_count > max_cells:
+        return labels
+    crop_regions = await _find_crop_regions(image, crop_regions)
+
+    def prompt_for(segments):
+        listing = "\n".join(f"{segment}: {', '.join(cells[segment])}" for segment in segments)
+        return SUBSTRATE_RECHECK_INSTRUCTIONS.format(cells=listing)
+
+    if crop_regions:
+        crops = await asyncio.to_thread(crop_images, image, {segment: crop_regions[segment] for segment in cells if segment in crop_regions})
+        requests = [(crops.get(segment, image), prompt_for([segment])) for segment in cells]
+    else:
+        requests = [(image, prompt_for(list(cells)))]
+
+    merged = labels.model_copy(deep=True)
+    records = {
+        (segment, _distance_key(record.distance)): record
+        for segment in cells for record in getattr(merged, segment) if not record.label_status
+    }
+    replaced = 0
+    for response in await _run_rechecks(requests, SubstrateRecheck, **kwargs):
+        for cell in (response.cells if response else []):
+            record = records.get((cell.segment, _distance_key(cell.distance)))
+            if record is not None and cell.label_status and cell.label in SUBSTRATE_LABELS:
+                record.label = cell.label
+                record.label_status = True
+                replaced += 1
+
+    print(f"Recheck resolved {replaced} of {cell_count} unclear substrate cells")
+    return merged
+
+
+@traced()
+async def recheck_unclear_fish_invert(
+    image: ImageInput,
+    labels: SegmentationLabelsFishInvert,
+    crop_regions: Optional[Dict[str, CropBox]] = None,
+    max_cells: int = RECHECK_MAX_CELLS,
+    **kwargs
+) -> SegmentationLabelsFishInvert:
+    """
+    Ask the model again about the species rows with counts not marked clear.
+
+    Works like recheck_unclear_substrate with species rows instead of
+    points; crop_regions maps a species group to its region. Only the
+    counts that were unclear are replaced, and only by confident readings.
+    """
+    rows = unclear_fish_invert_rows(labels)
+    merged = labels.model_copy(deep=True)
+    unclear = {}
+    for group, names in rows.items():
+        for record in getattr(merged, group):
+            if record.name in names:
+                unclear[normalize_species_name(record.name)] = (record, [key for key in DISTANCE_KEYS if not getattr(record, f"{key}_clear")])
+    cell_count = sum(len(keys) for _, keys in unclear.values())
+    if cell_count == 0 or cell_count > max_cells:
+        return labels
+
+    def prompt_for(groups):
+        listing = "\n".join(f"{group}: {' · '.join(rows[group])}" for group in groups)
+        return FISH_INVERT_RECHECK_INSTRUCTIONS.format(rows=listing)
+
+    if crop_regions:
+        crops = await asyncio.to_thread(crop_images, image, {group: crop_regions[group] for group in rows if group in crop_regions})
+        requests = [(crops.get(group, image), prompt_for([group])) for group in rows]
+    else:
+        requests = [(image, prompt_for(list(rows)))]
+
+    replaced = 0
+    for response in await _run_rechecks(requests, FishInvertRecheck, **kwargs):
+        for row in (response.rows if response else []):
+            record, keys = unclear.get(normalize_species_name(row.name), (None, []))
+            for key in keys:
+                if getattr(row, f"{key}_clear") and not getattr(record, f"{key}_clear"):
+                    setattr(record, key, getattr(row, key))
+                    setattr(record, f"{key}_clear", True)
+                    replaced += 1
+
+    print(f"Recheck resolved {replaced} of {cell_count} unclear fish/invert counts")
+    return merged
+
+
+@traced()
+def segment_crop_regions(image: ImageInput) -> Dict[str, CropBox]:
+    """
+    Region of every substrate segment on a slate image, empty if the grid was not found.
+
+    The band above the grid (below it when there is no room above) is
+    included as "info_segment" when it is at least INFO_MIN_HEIGHT tall.
+    CPU bound, run it off the event loop (asyncio.to_thread).
+    """
+    grid = find_segment_grid(_open_image(image), segments=len(SEGMENT_KEYS))
+    if grid is None:
+        return {}
+
+    columns, (top, bottom) = grid
+    regions = {segment: (left, 0.0, right, 1.0) for segment, (left, right) in zip(SEGMENT_KEYS, columns)}
+    if top >= INFO_MIN_HEIGHT:
+        regions["info_segment"] = (0.0, 0.0, 1.0, top)
+    elif 1.0 - bottom >= INFO_MIN_HEIGHT:
+        regions["info_segment"] = (0.0, bottom, 1.0, 1.0)
+    return regions
+
+
+@traced()
+async def image_label_generator_tiled_async(
+    image: ImageInput,
+    prompt: str = SLATE_IMAGE_INSTRUCTIONS,
+    on_section: Optional[SectionCallback] = None,
+    crop_regions: Optional[Dict[str, CropBox]] = None,
+    **kwargs
+) -> SegmentationLabels:
+    """
+    Extract a substrate slate with one request per segment.
+
+    The segment columns are found on the image (segment_crop_regions) and
+    each one is sent as its own tile with the SegmentLabels schema, next to a
+    small request for the survey information with the band outside the grid
+    (the whole image when there is none). The requests run concurrently and
+    are stitched back into SegmentationLabels, so every call carries a
+    quarter of the image and the latency is that of the slowest tile.
+    Falls back to a single full-image request with prompt when tiling is
+    disabled or the grid is not found.
+
+    Args:
+        image: Local path, encoded image bytes or PIL image of the slate
+        prompt: Instructions for the full-image fallback
+        on_section: Called with (key, value) as each segment / the info arrives
+        crop_regions: segment_crop_regions of the image when already known
+        **kwargs: Passed to generate_structured_output_async (gate, use_cache, ...)
+
+    Returns:
+        SegmentationLabels: validated, stitched model output
+    """
+    regions = await _find_crop_regions(image, crop_regions)
+    if not regions:
+        return await image_label_generator_async(image, prompt, on_section=on_section, **kwargs)
+    tiles = await asyncio.to_thread(crop_images, image, regions)
+
+    async def extract(key, image_part, request_prompt, response_schema, field):
+        response = await generate_structured_output_async(image_part, request_prompt, response_schema, **kwargs)
+        records = getattr(response, field)
+        if on_section is not None:
+            await _emit_section(on_section, key, [record.model_dump() for record in records])
+        return key, records
+
+    requests = [extract("info_segment", tiles.get("info_segment", image), SUBSTRATE_INFO_INSTRUCTIONS, SlateInformation, "info_segment")]
+    for segment in SEGMENT_KEYS:
+        requests.append(extract(segment, tiles[segment], _segment_prompt(segment), SegmentLabels, "labels"))
+
+    tasks = [asyncio.ensure_future(request) for request in requests]
+    try:
+        sections = dict(await asyncio.gather(*tasks))
+    except BaseException:
+        # a failed or cancelled tile stops the others
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return SegmentationLabels(**sections)
+
+
+def _segment_prompt(segment: str) -> str:
+    distances = canonical_distances()[SEGMENT_KEYS.index(segment)]
+    return SUBSTRATE_SEGMENT_INSTRUCTIONS.format(
+        segment_name=segment.replace("_", " "), first=distances[0], last=distances[-1]
+    )
+
+
+@traced()
+async def repair_substrate_labels(
+    image: ImageInput,
+    labels: SegmentationLabels,
+    crop_regions: Optional[Dict[str, CropBox]] = None,
+    **kwargs
+) -> SegmentationLabels:
+    """
+    Validate and repair substrate output (validation.repair_substrate).
+
+    Segments too broken to repair are requested again, one request per
+    segment (cropped when the grid is found), and repaired once more; the
+    rest of the slate is kept as it is.
+
+    Args:
+        image: The image the labels were extracted from
+        labels: Model output
+        crop_regions: segment_crop_regions of the image when already known
+        **kwargs: Passed to generate_structured_output_async (gate, use_cache, ...)
+
+    Returns:
+        SegmentationLabels: 40 canonical distances per segment with labels in the vocabulary
+    """
+    report = repair_substrate(labels.model_dump())
+    if report.issues:
+        print(f"Repaired substrate output: {len(report.issues)} issues")
+
+    if report.failed_sections:
+        print(f"Requesting substrate segments again: {', '.join(report.failed_sections)}")
+        regions = await _find_crop_regions(image, crop_regions)
+        crops = await asyncio.to_thread(crop_images, image, {segment: regions[segment] for segment in report.failed_sections if segment in regions})
+        requests = [
+            (crops.get(segment, image), _segment_prompt(segment) + SECTION_REREQUEST_NOTE)
+            for segment in report.failed_sections
+        ]
+        output = dict(report.output)
+        responses = await _run_rechecks(requests, SegmentLabels, **kwargs)
+        for segment, response in zip(report.failed_sections, responses):
+            if response is not None:
+                output[segment] = [record.model_dump() for record in response.labels]
+        report = repair_substrate(output)
+
+    return SegmentationLabels.model_validate(report.output)
+
+
+@traced()
+async def repair_fish_invert_labels(image: ImageInput, labels: SegmentationLabelsFishInvert, **kwargs) -> SegmentationLabelsFishInvert:
+    """
+    Validate and repair fish/invert output (validation.repair_fish_invert).
+
+    Species groups too broken to repair are requested again with the
+    species of the group listed, and repaired once more.
+    """
+    report = repair_fish_invert(labels.model_dump())
+    if report.issues:
+        print(f"Repaired fish/invert output: {len(report.issues)} issues")
+
+    if report.failed_sections:
+        print(f"Requesting species groups again: {', '.join(report.failed_sections)}")
+        requests = [
+            (image, FISH_INVERT_RECHECK_INSTRUCTIONS.format(rows=f"{group}: {' · '.join(FISH_GROUPS[group])}") + SECTION_REREQUEST_NOTE)
+            for group in report.failed_sections
+        ]
+        output = dict(report.output)
+        responses = await _run_rechecks(requests, FishInvertRecheck, **kwargs)
+        for group, response in zip(report.failed_sections, responses):
+            if response is not None:
+                output[group] = [row.model_dump() for row in response.rows]
+        report = repair_fish_invert(output)
+
+    return SegmentationLabelsFishInvert.model_validate(report.output)
+
+
+
 
 
 
@@ -147,4 +855,4 @@ def image_label_generator_fish_invert(image_path: str, prompt: str = FISH_INVERT
 #     # invoke the llm to generatr an query
 #     invoke_image_query = structured_llm.invoke([message])
 
-#     return invoke_image_query
\ No newline at end of file
+#     return invoke_image_query
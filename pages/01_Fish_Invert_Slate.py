@@ -1,16 +1,24 @@
 import streamlit as st
 import os
 import uuid
+import json
+import datetime
+from io import BytesIO
 from PIL import Image
-import io
 
-from utils import handle_image_orientation
-from llm import image_label_generator_fish_invert
-from utils import create_fish_slate_dataframe, fish_slate_excel_creation, load_and_prepare_excel_for_fish_slate
+from utils import handle_image_orientation, encode_png
+from batch_utils import run_batch_extraction, BATCH_MAX_CONCURRENCY
+from image_utils import preprocess_slate_image
+from job_queue import submit_job, get_job, cancel_job
+from worker import start_background_worker
+from utils import create_fish_slate_dataframe, fish_slate_excel_creation
 from utils import fish_excel_data_extractor
-from s3_utils import upload_to_s3, upload_bucket_path
+from fish_slate import FishSlate, FISH_GROUPS
+from s3_utils import upload_artifacts, upload_bucket_path
+from slate_results import build_result_document, encode_result, reopen_result, RESULT_CONTENT_TYPE
 from db_utils import add_record
 from session_records import init_slate_information
+from tracing import span, trace_context
 
 # enivironment variables
 os.environ["ENV"] = st.secrets["aws"]["ENV"]
@@ -19,8 +27,8 @@ os.environ["ENV"] = st.secrets["aws"]["ENV"]
 DB_TABLE_NAME = f"{os.environ['ENV']}-reefcheck"
 
 # constants
-FISH_INVERT_IMAGE = "fish_and_invert.png"
-FISH_INVERT_CSV = "fish_and_invert.csv"
+EXCEL_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+JOB_POLL_SECONDS = 2
 
 if "fish_dataframe" not in st.session_state:
     st.session_state.fish_dataframe = False
@@ -31,13 +39,38 @@ if "fish_invert_df" not in st.session_state:
 if "fish_invert_image" not in st.session_state:
     st.session_state.fish_invert_image = None
 
+if "fish_invert_image_bytes" not in st.session_state:
+    st.session_state.fish_invert_image_bytes = None
+
 if "fish_invert_button" not in st.session_state:
     st.session_state.fish_invert_button = False
 
 if "fish_invert_file_name" not in st.session_state:
     st.session_state.fish_invert_file_name = False
 
+if "fish_invert_batch_results" not in st.session_state:
+    st.session_state.fish_invert_batch_results = {}
+
+if "fish_invert_job_id" not in st.session_state:
+    st.session_state.fish_invert_job_id = None
+
+if "fish_invert_model_output" not in st.session_state:
+    st.session_state.fish_invert_model_output = None
+
+if "fish_invert_reopened_from" not in st.session_state:
+    st.session_state.fish_invert_reopened_from = None
+
+if "fish_invert_image_url" not in st.session_state:
+    st.session_state.fish_invert_image_url = None
+
+if "fish_invert_reopened_record" not in st.session_state:
+    st.session_state.fish_invert_reopened_record = None
+
+if "fish_invert_job_cancelled" not in st.session_state:
+    st.session_state.fish_invert_job_cancelled = False
+
 init_slate_information()
+start_background_worker()
 
 
 def interacting_editable_df():
@@ -45,7 +78,19 @@ def interacting_editable_df():
 
 def off_interacting_editable_df():
     st.session_state.fish_dataframe = False
+    st.session_state.fish_invert_df = None
     st.session_state.fish_invert_image = None
+    st.session_state.fish_invert_image_bytes = None
+    st.session_state.fish_invert_button = False
+    st.session_state.fish_invert_file_name = False
+    st.session_state.fish_invert_job_id = None
+    st.session_state.fish_invert_model_output = None
+    st.session_state.fish_invert_reopened_from = None
+    st.session_state.fish_invert_image_url = None
+    st.session_state.fish_invert_reopened_record = None
+    st.session_state.fish_invert_job_cancelled = False
+    st.query_params.pop("fish_invert_job", None)
+    st.query_params.pop("fish_invert_reopen", None)
 
 def save_button():
     st.session_state.fish_invert_button = True
@@ -55,11 +100,154 @@ def file_name_input():
     st.session_state.fish_invert_file_name = True
 
 
-def save_uploaded_image(image, target_name):
-    img_byte_arr = io.BytesIO()
-    image.save(img_byte_arr, format='JPEG')
-    img_byte_arr = img_byte_arr.getvalue()
-    image.save(target_name)
+def batch_status_row(name: str, result: dict) -> dict:
+    return {
+        "Slate": name,
+        "Status": result["status"],
+        "Seconds": round(result.get("seconds", 0.0), 1),
+        "Error": result.get("error") or "",
+    }
+
+
+def open_batch_slate(name: str, uploaded_files: list):
+    result = st.session_state.fish_invert_batch_results[name]
+    uploaded_file = next(file_ for file_ in uploaded_files if file_.name == name)
+
+    off_interacting_editable_df()
+    image = handle_image_orientation(Image.open(uploaded_file))
+    st.session_state.fish_invert_image = image
+    st.session_state.fish_invert_image_bytes = encode_png(image)
+
+    st.session_state.fish_invert_model_output = result["labels"].model_dump()
+    st.session_state.fish_invert_df = create_fish_slate_dataframe(st.session_state.fish_invert_model_output)
+
+
+def cancel_fish_invert_job(job_id: str):
+    cancel_job(job_id)
+    off_interacting_editable_df()
+    # keep the uploaded file from being queued again until a new one is chosen
+    st.session_state.fish_invert_job_cancelled = True
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def fish_invert_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None or job["status"] in ("done", "failed", "cancelled"):
+        # rerun the whole page to pick up the result
+        st.rerun()
+
+    elapsed = datetime.datetime.now().timestamp() - job["created_at"]
+    st.info(f"Generating Fish and Invert Labels ({job['status']}, {elapsed:.0f}s)", icon="⏳")
+    st.button("Cancel", key="fish_invert_cancel_job", on_click=cancel_fish_invert_job, args=(job_id,))
+
+    # species groups fill in as the model streams them, editing starts once all are in
+    if job["partial"]:
+        sections = json.loads(job["partial"])
+        received = [group for group in FISH_GROUPS if group in sections]
+        st.caption(f"{len(received)} of {len(FISH_GROUPS)} species groups received")
+        st.data_editor(FishSlate.from_response(sections).to_dataframe(), disabled=True, key="fish_invert_partial_df")
+
+
+def load_fish_invert_job(job_id: str):
+    job = get_job(job_id, include_image=st.session_state.fish_invert_image_bytes is None)
+    if job is None or job["status"] == "failed":
+        # keep the job id so the same upload is not queued again on every rerun
+        st.query_params.pop("fish_invert_job", None)
+        error = job["error"] if job is not None else "job not found"
+        st.error(f"Label generation failed ({error}). Please upload the image again.")
+        return
+
+    if job["status"] == "cancelled":
+        # cancelled in another tab or before a reload; polling it would rerun forever
+        st.query_params.pop("fish_invert_job", None)
+        st.session_state.fish_invert_job_id = None
+        st.session_state.fish_invert_job_cancelled = True
+        st.info("Label generation cancelled. Upload another image to start again.")
+        return
+
+    if job["status"] != "done":
+        fish_invert_job_status(job_id)
+        return
+
+    st.session_state.fish_invert_model_output = json.loads(job["result"])
+    st.session_state.fish_invert_df = create_fish_slate_dataframe(st.session_state.fish_invert_model_output)
+
+    if st.session_state.fish_invert_image_bytes is None:
+        # the page was reloaded, fall back to the image the model labelled
+        st.session_state.fish_invert_image = Image.open(BytesIO(job["image"]))
+        st.session_state.fish_invert_image_bytes = encode_png(st.session_state.fish_invert_image)
+    st.toast("Fish and Invert Labels Generated", icon='✅')
+
+
+def reopen_fish_invert_upload(data_id: str):
+    off_interacting_editable_df()
+    response = reopen_result(DB_TABLE_NAME, data_id, st.user['sub'], 'fish_and_invert')
+    if not response['success']:
+        st.error(f"Could not reopen the upload: {response['message']}")
+        return
+
+    # the saved result replaces the model call; the stored image is shown from its URL
+    document = response['data']
+    st.session_state.fish_invert_model_output = document.get('model_output')
+    st.session_state.fish_invert_df = create_fish_slate_dataframe(document)
+    if document.get('info_segment'):
+        st.session_state.slate_information.update(document['info_segment'][0])
+    st.session_state.fish_invert_reopened_from = data_id
+    st.session_state.fish_invert_image_url = response['record'].get('image_url')
+    st.session_state.fish_invert_reopened_record = response['record']
+    st.query_params["fish_invert_reopen"] = data_id
+    st.toast("Saved upload reopened", icon='✅')
+
+
+def fish_invert_batch():
+    uploaded_files = st.file_uploader(
+        "Upload Fish and Invert Images",
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True,
+        key="fish_invert_batch_uploader"
+    )
+    max_concurrency = st.number_input(
+        "Concurrent extractions",
+        min_value=1,
+        max_value=16,
+        value=BATCH_MAX_CONCURRENCY
+    )
+
+    if not uploaded_files:
+        return
+
+    if st.button("Generate Labels for All Slates"):
+        st.session_state.fish_invert_batch_results = {}
+        status_rows = {file_.name: batch_status_row(file_.name, {"status": "queued"}) for file_ in uploaded_files}
+        progress = st.progress(0.0, text="Generating Fish and Invert Labels")
+        status_table = st.empty()
+        status_table.dataframe(list(status_rows.values()), hide_index=True)
+
+        def on_result(name: str, result: dict):
+            st.session_state.fish_invert_batch_results[name] = result
+            status_rows[name] = batch_status_row(name, result)
+            finished = len(st.session_state.fish_invert_batch_results)
+            progress.progress(finished / len(status_rows), text=f"{finished}/{len(status_rows)} slates done")
+            status_table.dataframe(list(status_rows.values()), hide_index=True)
+
+        run_batch_extraction(
+            [(file_.name, file_.getvalue()) for file_ in uploaded_files],
+            "fish_and_invert",
+            max_concurrency=int(max_concurrency),
+            on_result=on_result
+        )
+        st.toast("Fish and Invert Labels Generated", icon='✅')
+    elif st.session_state.fish_invert_batch_results:
+        st.dataframe(
+            [batch_status_row(name, result) for name, result in st.session_state.fish_invert_batch_results.items()],
+            hide_index=True
+        )
+
+    done_slates = [name for name, result in st.session_state.fish_invert_batch_results.items() if result["status"] == "done"]
+    if done_slates:
+        selected_slate = st.selectbox("Slate to review", done_slates)
+        st.button("Open in Editor", on_click=open_batch_slate, args=(selected_slate, uploaded_files))
+
 
 def fish_invert_slate():
     if not st.user.is_logged_in:
@@ -68,81 +256,121 @@ def fish_invert_slate():
     
     st.header("Fish and Invert Slate")
     
-    uploaded_fish_invert = st.file_uploader(
-        "Upload Fish and Invert Image",
-        type=["jpg", "jpeg", "png"],
-        key="fish_invert_uploader",
-        on_change=off_interacting_editable_df
-    )
-    
-    if uploaded_fish_invert is not None:
-        if not st.session_state.fish_dataframe and not st.session_state.fish_invert_button and not st.session_state.fish_invert_file_name:
+    batch_mode = st.sidebar.toggle("Batch Mode", key="fish_invert_batch_mode", on_change=off_interacting_editable_df)
+
+    if batch_mode:
+        fish_invert_batch()
+    else:
+        uploaded_fish_invert = st.file_uploader(
+            "Upload Fish and Invert Image",
+            type=["jpg", "jpeg", "png"],
+            key="fish_invert_uploader",
+            on_change=off_interacting_editable_df
+        )
+
+        with st.sidebar.expander("Reopen a Saved Upload"):
+            reopen_id = st.text_input("Record ID", key="fish_invert_reopen_id")
+            if st.button("Reopen", key="fish_invert_reopen_button") and reopen_id.strip():
+                reopen_fish_invert_upload(reopen_id.strip())
+
+        # resume a reopened upload after the page was reloaded
+        if st.session_state.fish_invert_df is None and st.session_state.fish_invert_reopened_from is None and "fish_invert_reopen" in st.query_params:
+            reopen_fish_invert_upload(st.query_params["fish_invert_reopen"])
+
+        if uploaded_fish_invert is not None and st.session_state.fish_invert_reopened_from is None and not st.session_state.fish_invert_job_cancelled and st.session_state.fish_invert_job_id is None and not st.session_state.fish_dataframe and not st.session_state.fish_invert_button and not st.session_state.fish_invert_file_name:
             image = handle_image_orientation(Image.open(uploaded_fish_invert))
             st.session_state.fish_invert_image = image
-            save_uploaded_image(image, FISH_INVERT_IMAGE)
-            
-            with st.spinner("Generating Fish and Invert Labels", show_time=True):
-                fish_and_invert_labels = image_label_generator_fish_invert(FISH_INVERT_IMAGE)
-                st.toast("Fish and Invert Labels Generated", icon='✅')
-                fish_and_invert_df = create_fish_slate_dataframe(fish_and_invert_labels.model_dump(), FISH_INVERT_CSV)
-                st.session_state.fish_invert_df = fish_and_invert_df
-        # add the image to the sidebar
+            st.session_state.fish_invert_image_bytes = encode_png(image)
+            # downscale and re-encode the photo before sending it to the model
+            model_image, preprocess_stats = preprocess_slate_image(image, source_bytes=uploaded_fish_invert.size)
+            st.toast(f"Image reduced to {preprocess_stats['bytes_after'] // 1024} KB for labelling")
+            # queue the extraction, a worker runs it outside of this script run
+            st.session_state.fish_invert_job_id = submit_job(model_image, "fish_and_invert")
+            st.query_params["fish_invert_job"] = st.session_state.fish_invert_job_id
+
+        if st.session_state.fish_invert_job_cancelled:
+            st.info("Label generation cancelled. Upload another image to start again.")
+
+        # resume a job started before the page was reloaded
+        if st.session_state.fish_invert_job_id is None and "fish_invert_job" in st.query_params:
+            st.session_state.fish_invert_job_id = st.query_params["fish_invert_job"]
+
+        if st.session_state.fish_invert_df is None and st.session_state.fish_invert_job_id is not None:
+            load_fish_invert_job(st.session_state.fish_invert_job_id)
+
+    if st.session_state.fish_invert_df is None:
+        return
+
+    # add the image to the sidebar
+    if st.session_state.fish_invert_image is None and st.session_state.fish_invert_image_url:
+        st.sidebar.image(st.session_state.fish_invert_image_url, caption="Saved Fish and Invert Image")
+    else:
         try:
             st.sidebar.image(st.session_state.fish_invert_image, caption="Uploaded Fish and Invert Image")
         except Exception as error:
             st.error(f"Upload got corrupted! Please refresh the page and try again!")
             print(str(error))
             st.stop()
-        # editable df 
-        edited_df = st.data_editor(st.session_state.fish_invert_df, on_change=interacting_editable_df)
-        # add the text input
-        file_name = st.text_input("File Name to be Saved", value=None, on_change = file_name_input)
-        if not file_name:
-            st.error("Please enter a file name to save the files.")
-            st.stop()
-        # set the image extension
-        save_image_name = file_name + ".png"
-        save_excel_name = file_name + ".xlsx"
-        if st.button("Save Files", on_click=save_button):
-            download_capability = True
-            with st.spinner("Saving Files", show_time=True):
-                # initiate excel creation and file saving
-                fish_response = fish_excel_data_extractor(edited_df)
-                fish_slate_excel_creation(fish_response, st.session_state.slate_information,save_excel_name)
-                # create the data id
-                data_id = str(uuid.uuid4())
-                # save files
-                # save the excel
-                excel_url = upload_to_s3(save_excel_name, upload_bucket_path(st.user['name'], st.user['sub'], 'excel', 'fish_and_invert', f"{data_id}_{file_name}"))
-                if excel_url:
-                    st.toast(f"Excel Uploaded", icon='✅')
-                else:
-                    download_capability = False
-                    # save the image
-                image_url = upload_to_s3(FISH_INVERT_IMAGE, upload_bucket_path(st.user['name'], st.user['sub'], 'image', 'fish_and_invert', f"{data_id}_{file_name}"))
-                if image_url:
-                    st.toast(f"Image Uploaded", icon='✅')
-                else:
-                    download_capability = False
-                # add a record to the database
-                if download_capability:
-                    db_response = add_record(DB_TABLE_NAME, data_id, st.user['sub'], st.user['name'], image_url, excel_url, "success")
-                    print(db_response)
-                    if db_response['success']:
-                        st.toast(f"Record Saved", icon='✅')
-                    else:
-                        download_capability = False
-            # download the excel file
-            if not download_capability:
-                st.error(f"Error saving files. Please contact support for assistance.")
-                st.stop()
-            st.download_button(
-                label="Download as Excel",
-                data=load_and_prepare_excel_for_fish_slate(save_excel_name),
-                file_name=save_excel_name,
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                on_click='ignore'
+    # editable df 
+    # the species names place the rows on the slate, only the counts are editable
+    edited_df = st.data_editor(st.session_state.fish_invert_df, disabled=["name"], on_change=interacting_editable_df)
+    # add the text input
+    file_name = st.text_input("File Name to be Saved", value=None, on_change = file_name_input)
+    if not file_name:
+        st.error("Please enter a file name to save the files.")
+        st.stop()
+    # set the excel extension
+    save_excel_name = file_name + ".xlsx"
+    if st.button("Save Files", on_click=save_button):
+        download_capability = True
+        # saving a reopened upload replaces it, so every slate is stored and counted once
+        reopened = st.session_state.fish_invert_reopened_record
+        # the data id also correlates the timing spans of the save
+        data_id = reopened['data_id'] if reopened else str(uuid.uuid4())
+        with st.spinner("Saving Files", show_time=True), trace_context(data_id), span("slate.save", slate_type='fish_and_invert'):
+            # initiate excel creation in memory
+            fish_response = fish_excel_data_extractor(edited_df)
+            excel_bytes = fish_slate_excel_creation(fish_response, st.session_state.slate_information)
+            # structured copy of the edited slate for analytics and reloading
+            result_bytes = encode_result(build_result_document(
+                data_id, 'fish_and_invert', fish_response, st.session_state.slate_information, st.session_state.fish_invert_model_output
+            ))
+            result_key = reopened['result_key'] if reopened else upload_bucket_path(st.user['name'], st.user['sub'], 'result', 'fish_and_invert', f"{data_id}_{file_name}")
+            artifacts = {
+                "excel": (excel_bytes, upload_bucket_path(st.user['name'], st.user['sub'], 'excel', 'fish_and_invert', f"{data_id}_{file_name}"), EXCEL_MIME_TYPE),
+                "result": (result_bytes, result_key, RESULT_CONTENT_TYPE),
+            }
+            # a reopened upload keeps pointing at its stored image
+            if st.session_state.fish_invert_image_bytes is not None:
+                artifacts["image"] = (st.session_state.fish_invert_image_bytes, upload_bucket_path(st.user['name'], st.user['sub'], 'image', 'fish_and_invert', f"{data_id}_{file_name}"), 'image/png')
+            # a new version on every save keeps cached copies of an overwritten result apart
+            record_attributes = {'result_key': result_key, 'result_version': uuid.uuid4().hex}
+            # upload the artifacts together, then add the record once all are stored
+            save_response = upload_artifacts(
+                artifacts,
+                commit=lambda urls: add_record(
+                    DB_TABLE_NAME, data_id, st.user['sub'], st.user['name'], urls.get('image') or st.session_state.fish_invert_image_url, urls['excel'], "success",
+                    creation_date=reopened['creation_date'] if reopened else None,
+                    additional_attributes=record_attributes,
+                    count_upload=reopened is None
+                )
             )
+            print(save_response)
+            if save_response['success']:
+                st.toast(f"Files Uploaded and Record Saved", icon='✅')
+            else:
+                download_capability = False
+        # download the excel file
+        if not download_capability:
+            st.error(f"Error saving files. Please contact support for assistance.")
+            st.stop()
+        st.download_button(
+            label="Download as Excel",
+            data=excel_bytes,
+            file_name=save_excel_name,
+            mime=EXCEL_MIME_TYPE,
+            on_click='ignore'
+        )
 
 if __name__ == "__main__":
     fish_invert_slate()
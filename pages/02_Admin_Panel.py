@@ -1,8 +1,14 @@
 import streamlit as st
 import os
 
-from db_utils import get_recent_records
-from visualization import display_upload_analytics
+from analytics_store import get_analytics_store
+from db_utils import get_daily_rollups
+from substrate_analytics import summarize_results
+from result_loader import S3_SOURCE_PREFIX
+from visualization import display_upload_analytics, display_substrate_cover
+from visualization import display_stage_timings, display_trace, display_cache_stats
+from tracing import stage_percentiles, load_spans
+from llm import EXTRACTION_CACHE
 import pandas as pd
 
 # Set page configuration
@@ -18,6 +24,17 @@ os.environ["ENV"] = st.secrets["aws"]["ENV"]
 # environment variables
 admin_users = st.secrets["admin"]["ADMIN_USERS"]
 DB_TABLE_NAME = f"{os.environ['ENV']}-reefcheck"
+# key prefix of the substrate uploads inside the AWS_BUCKET_NAME bucket (not a bucket name)
+SUBSTRATE_UPLOADS_PREFIX = f"{os.environ['ENV']}/substrate/"
+
+
+TIMING_WINDOWS = {"Last hour": 1, "Last 24 hours": 24, "Last 7 days": 24 * 7, "Last 30 days": 24 * 30}
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_substrate_cover(source: str, by_date: bool) -> pd.DataFrame:
+    # reading every saved result is the slow part, so keep the summary for a while
+    return summarize_results(source, by=("site", "date") if by_date else ("site",))
 
 # Authentication
 if not st.user.is_logged_in:
@@ -39,21 +56,57 @@ with st.sidebar:
         value=30,
         step=7
     )
+    refresh = st.button("Refresh Data")
     st.markdown("---")
     st.caption(f"Logged in as: {st.user['email']}")
 
 # Main content
 st.title("ReefCheck Admin Dashboard")
 
-# Get recent records
+# Sync new records into the local store, then read the selected window locally
+analytics_store = get_analytics_store(DB_TABLE_NAME)
 with st.spinner("Loading upload data..."):
-    recent_records = get_recent_records(DB_TABLE_NAME, days=days_to_show)
+    sync_result = analytics_store.sync(force=refresh)
+if not sync_result['success']:
+    st.warning(f"⚠️ Showing the last synced data: {sync_result['message']}")
+recent_records = analytics_store.get_recent_records(days=days_to_show)
+
+# Chart from the daily rollup counters (at most 90 small items), falling back
+# to the raw records until the rollups have been backfilled
+daily_rollups = get_daily_rollups(DB_TABLE_NAME, days=days_to_show)
+rollups_df = None
+if daily_rollups['success'] and not daily_rollups['data'].empty:
+    rollups_df = daily_rollups['data']
 if recent_records['success']:
     if recent_records['data'] is not None and not recent_records['data'].empty:
         st.toast("✅ Data loaded successfully")
         # Display the analytics dashboard
-        display_upload_analytics(recent_records['data'], days=days_to_show)
+        display_upload_analytics(recent_records['data'], days=days_to_show, rollups_df=rollups_df)
     else:
         st.info("ℹ️ No recent uploads found in the selected date range.")
 else:
-    st.error(f"❌ Failed to load data: {recent_records['message']}")
\ No newline at end of file
+    st.error(f"❌ Failed to load data: {recent_records['message']}")
+
+# Substrate percent cover across all saved results
+st.header("🪸 Substrate Percent Cover")
+by_date = st.toggle("Split sites by survey date")
+if st.button("Compute Percent Cover"):
+    with st.spinner("Aggregating substrate results...", show_time=True):
+        try:
+            st.session_state.substrate_cover_df = load_substrate_cover(S3_SOURCE_PREFIX + SUBSTRATE_UPLOADS_PREFIX, by_date)
+        except Exception as error:
+            st.error(f"❌ Failed to aggregate substrate results: {str(error)}")
+if st.session_state.get("substrate_cover_df") is not None:
+    display_substrate_cover(st.session_state.substrate_cover_df)
+
+# Where the time of the saves and extractions goes, from the tracing spans
+st.header("⏱️ Pipeline Timings")
+timing_window = st.selectbox("Window", list(TIMING_WINDOWS), index=1)
+display_stage_timings(stage_percentiles(TIMING_WINDOWS[timing_window]))
+# counters of the extraction cache since this app process started (separate worker processes keep their own)
+st.subheader("Extraction Cache")
+display_cache_stats(EXTRACTION_CACHE.stats())
+
+trace_id = st.text_input("Trace a save by Record ID (or an extraction by job ID)")
+if trace_id:
+    display_trace(load_spans(correlation_id=trace_id.strip()))
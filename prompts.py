@@ -66,3 +66,75 @@ Impacts – Coral Damage – boat/anchor · Coral Damage – dynamite · Coral D
 Coral Disease – Black Band % colonies · White band % colonies  
 Rare Animals – Shark · Turtle · Manta · Other
 """
+
+SUBSTRATE_RECHECK_INSTRUCTIONS = """
+You will see a photo (or part of a photo) of a Reef-Check substrate slate. A first reading could not read some cells with confidence.
+
+Look again at ONLY these cells, given as segment: distances
+
+{cells}
+
+For every listed cell return segment (exactly as given above), distance (exactly as given above), label and label_status:
+
+1. label one of HC, NIA, RB, OT, SC, SP, SD, RKC, RC, SI, or no_label if the cell is crossed out / empty.
+
+2. label_status True if the label is clearly readable or the cell is clearly crossed out; False if you are still guessing.
+
+Do not return any cell that is not listed. Never invent a label.
+"""
+
+FISH_INVERT_RECHECK_INSTRUCTIONS = """
+You will see a photo (or part of a photo) of a diver's fish and invertebrate tally sheet. A first reading could not read some counts with confidence.
+
+Rotate the slate 90 degrees clockwise so headers read left-to-right.
+
+Depth rows (exact text): 0–20 m (distance_one) · 25–45 m (distance_two) · 50–70 m (distance_three) · 75–95 m (distance_four)
+
+Look again at ONLY these species rows:
+
+{rows}
+
+For every listed species return one row with its name (exactly as given above) and the count and *_clear flag of all four depths:
+• count – integer you see (digits are normally circled), 0 if the cell is blank
+• *_clear – true if the numeral is crisp; false if you are still guessing
+
+Treat a circled “S” as the digit 5. Do not return any species that is not listed.
+"""
+
+SUBSTRATE_SEGMENT_INSTRUCTIONS = """
+You will see one column block of a Reef-Check substrate slate, or the whole slate. Read only {segment_name}: the block with distances (rows) from {first} to {last} incremented by 0.5. Ignore every other block, including parts of the neighbouring blocks visible at the left and right edge.
+
+For every distance value in the left-most column of {segment_name} extract:
+
+1. distance the numeric value (e.g., 0.5, 17.5).
+
+2. label one of HC, NIA, RB, OT, SC, SP, SD, RKC, RC, SI, or no_label if the cell is crossed out / empty.
+
+3. label_status True if the label is clearly readable or the cell is clearly crossed out; False if the text is smudged or only partially visible and you are guessing.
+
+Key rule for “no_label”:
+
+1. A cell that contains only one of the following counts as no_label, label_status=true
+
+2. A single diagonal slash (/ or \\)
+
+3. A straight vertical or horizontal line
+
+4. An “X” or check mark
+
+5. is completely blank
+
+Return all 40 distances of the block, in order. Never invent a label for these cells.
+
+Guessing rule:
+
+Guess only if you see shapes that resemble letters/numbers of a substrate code but they are smudged or incomplete; then set label_status=false
+"""
+
+SUBSTRATE_INFO_INSTRUCTIONS = """
+You will see a photo of a Reef-Check substrate slate. Read only the survey information written on it: site name, country/island, team leader, data recorded by, depth, date and time. Use an empty string for a field that is not filled in.
+"""
+
+SECTION_REREQUEST_NOTE = """
+A first reading of this part of the slate was incomplete or did not match the printed layout. Read it again carefully and return every row.
+"""
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import PIL.Image
+
+from cache_utils import image_fingerprint
+
+
+# what get_model hands out: the live model, a recorder around it, or recorded responses
+REPLAY_MODES = ("off", "record", "replay")
+RECORDING_SUFFIX = ".json"
+
+
+class MissingRecording(KeyError):
+    """
+    Raised in replay mode for a request that was never recorded.
+    """
+
+
+def recording_key(model_name: str, response_schema: type, contents: list) -> str:
+    """
+    Key of a request: model, schema, prompt text and image content.
+    """
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(response_schema.__name__.encode("utf-8"))
+    for part in contents:
+        if isinstance(part, str):
+            digest.update(part.encode("utf-8"))
+        elif isinstance(part, dict):
+            digest.update(part["data"])
+        elif isinstance(part, PIL.Image.Image):
+            digest.update(image_fingerprint(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _RecordingStream:
+    """
+    Passes a streamed response through and records its chunks and their timing.
+    """
+
+    def __init__(self, response, on_done):
+        self._response = response
+        self._on_done = on_done
+
+    async def _chunks(self):
+        start = time.perf_counter()
+        chunks, offsets = [], []
+        async for chunk in self._response:
+            chunks.append(chunk.text)
+            offsets.append(time.perf_counter() - start)
+            yield chunk
+        self._on_done(chunks, offsets)
+
+    def __aiter__(self):
+        return self._chunks()
+
+
+class _ReplayStream:
+    def __init__(self, chunks: List[str], offsets: List[float], latency_scale: float):
+        self._chunks = chunks
+        self._offsets = offsets
+        self._latency_scale = latency_scale
+
+    async def _replay(self):
+        previous = 0.0
+        for text, offset in zip(self._chunks, self._offsets):
+            if self._latency_scale:
+                await asyncio.sleep((offset - previous) * self._latency_scale)
+            previous = offset
+            yield _Chunk(text)
+
+    def __aiter__(self):
+        return self._replay()
+
+
+class RecordingModel:
+    """
+    GenerativeModel stand-in that calls the wrapped model and writes every
+    response (text, chunks and latency) to directory, one JSON file per request.
+    """
+
+    def __init__(self, model, model_name: str, response_schema: type, directory: str):
+        self._model = model
+        self._model_name = model_name
+        self._response_schema = response_schema
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _save(self, contents: list, chunks: List[str], offsets: List[float], seconds: float) -> None:
+        key = recording_key(self._model_name, self._response_schema, contents)
+        recording = {
+            "model": self._model_name,
+            "schema": self._response_schema.__name__,
+            "recorded_at": datetime.utcnow().isoformat(),
+            "seconds": seconds,
+            "chunks": chunks,
+            "offsets": offsets,
+        }
+        path = os.path.join(self._directory, key + RECORDING_SUFFIX)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(recording, handle, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def generate_content(self, contents: list, **kwargs):
+        start = time.perf_counter()
+        response = self._model.generate_content(contents, **kwargs)
+        seconds = time.perf_counter() - start
+        self._save(contents, [response.text], [seconds], seconds)
+        return response
+
+    async def generate_content_async(self, contents: list, stream: bool = False, **kwargs):
+        start = time.perf_counter()
+        response = await self._model.generate_content_async(contents, stream=stream, **kwargs)
+        if not stream:
+            seconds = time.perf_counter() - start
+            self._save(contents, [response.text], [seconds], seconds)
+            return response
+
+        first_byte = time.perf_counter() - start
+
+        def on_done(chunks, offsets):
+            offsets = [first_byte + offset for offset in offsets]
+            self._save(contents, chunks, offsets, offsets[-1] if offsets else first_byte)
+
+        return _RecordingStream(response, on_done)
+
+
+class ReplayModel:
+    """
+    GenerativeModel stand-in that answers from the files of a RecordingModel.
+
+    The recorded latency is reproduced times latency_scale (0 answers at
+    once), and streamed requests get the recorded chunks.
+    """
+
+    def __init__(self, model_name: str, response_schema: type, directory: str, latency_scale: float = 1.0):
+        self._model_name = model_name
+        self._response_schema = response_schema
+        self._directory = directory
+        self._latency_scale = latency_scale
+
+    def _load(self, contents: list) -> dict:
+        key = recording_key(self._model_name, self._response_schema, contents)
+        path = os.path.join(self._directory, key + RECORDING_SUFFIX)
+        try:
+            with open(path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            raise MissingRecording(f"No recorded {self._response_schema.__name__} response {key}") from None
+
+    def generate_content(self, contents: list, **kwargs):
+        recording = self._load(contents)
+        time.sleep(recording["seconds"] * self._latency_scale)
+        return _Chunk("".join(recording["chunks"]))
+
+    async def generate_content_async(self, contents: list, stream: bool = False, **kwargs):
+        recording = self._load(contents)
+        if stream:
+            return _ReplayStream(recording["chunks"], recording["offsets"], self._latency_scale)
+
+        await asyncio.sleep(recording["seconds"] * self._latency_scale)
+        return _Chunk("".join(recording["chunks"]))
+
+
+def wrap_model(model, model_name: str, response_schema: type, mode: str, directory: Optional[str], latency_scale: float = 1.0):
+    """
+    Return model as is, recorded or replaced by its recordings, depending on mode.
+    """
+    if mode == "record":
+        return RecordingModel(model, model_name, response_schema, directory)
+    if mode == "replay":
+        return ReplayModel(model_name, response_schema, directory, latency_scale)
+    return model
@@ -0,0 +1,80 @@
+import glob
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+
+# saved slate results are SegmentationLabels / SegmentationLabelsFishInvert JSON documents
+RESULT_SUFFIX = ".json"
+# folder of the result documents in every upload folder (s3_utils.upload_bucket_path)
+RESULT_FOLDER = "results"
+S3_SOURCE_PREFIX = "s3://"
+RESULT_CHUNK_SIZE = 500
+RESULT_LOADER_WORKERS = 16
+
+
+def list_results(source: str) -> List[str]:
+    """
+    List the result documents of a source.
+
+    Args:
+        source (str): Local directory (searched recursively) or "s3://<prefix>"
+            for a key prefix of the configured bucket holding upload folders,
+            e.g. "s3://prod/substrate/"; only their results/ folders are listed
+
+    Returns:
+        List[str]: File paths or S3 keys in sorted order
+    """
+    if source.startswith(S3_SOURCE_PREFIX):
+        # imported here so local sources do not need the AWS settings
+        from s3_utils import list_s3_keys
+
+        return list_s3_keys(source[len(S3_SOURCE_PREFIX):], suffix=RESULT_SUFFIX, folder=RESULT_FOLDER)
+
+    return sorted(glob.glob(os.path.join(source, "**", f"*{RESULT_SUFFIX}"), recursive=True))
+
+
+def read_result(source: str, location: str) -> Optional[dict]:
+    """
+    Read one result document; None if it is missing or not valid JSON.
+    """
+    try:
+        if source.startswith(S3_SOURCE_PREFIX):
+            from s3_utils import read_s3_object
+
+            return json.loads(read_s3_object(location))
+
+        with open(location, "rb") as handle:
+            return json.loads(handle.read())
+    except Exception as e:
+        print(f"Skipping result {location}: {str(e)}")
+        return None
+
+
+def iter_results(
+    source: str,
+    chunk_size: int = RESULT_CHUNK_SIZE,
+    max_workers: int = RESULT_LOADER_WORKERS
+) -> Iterator[List[Tuple[str, dict]]]:
+    """
+    Stream the result documents of a source in chunks.
+
+    Only one chunk of parsed documents is held at a time, so the memory use
+    stays bounded however many results the source holds. The documents of a
+    chunk are read concurrently.
+
+    Args:
+        source (str): Local directory or "s3://<prefix>"
+        chunk_size (int, optional): Documents per chunk. Defaults to RESULT_CHUNK_SIZE.
+        max_workers (int, optional): Concurrent reads. Defaults to RESULT_LOADER_WORKERS.
+
+    Yields:
+        List[Tuple[str, dict]]: (path or key, document) pairs; unreadable documents are skipped
+    """
+    locations = list_results(source)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(locations), chunk_size):
+            chunk = locations[start:start + chunk_size]
+            documents = executor.map(lambda location: read_result(source, location), chunk)
+            yield [(location, document) for location, document in zip(chunk, documents) if document is not None]
@@ -1,14 +1,30 @@
-import boto3
+from io import BytesIO
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 import streamlit as st
 import os
 
+from aws_clients import get_client
+from tracing import traced
+
 os.environ["AWS_ACCESS_KEY_ID"] = st.secrets["aws"]["AWS_ACCESS_KEY"]
 os.environ["AWS_SECRET_ACCESS_KEY"] = st.secrets["aws"]["AWS_SECRET_KEY"]
 os.environ["AWS_REGION"] = st.secrets["aws"]["REGION_NAME"]
 os.environ["AWS_BUCKET_NAME"] = st.secrets["aws"]["AWS_BUCKET_NAME"]
 
+# multipart settings for large slate photos; small workbooks go up in a single request
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True
+)
+
 # AWS S3 utilities
+@traced()
 def upload_to_s3(file_path: str, s3_key: str) -> str:
     """
     Uploads a file to AWS S3 bucket.
@@ -25,13 +41,8 @@ def upload_to_s3(file_path: str, s3_key: str) -> str:
         bool: True if upload was successful, False otherwise
     """
     try:
-        # Initialize S3 client
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=os.environ["AWS_ACCESS_KEY_ID"],
-            aws_secret_access_key=os.environ["AWS_SECRET_ACCESS_KEY"],
-            region_name=os.environ["AWS_REGION"]
-        )
+        # Shared, pooled S3 client
+        s3 = get_client('s3')
         
         # Upload the file
         s3.upload_file(
@@ -59,6 +70,113 @@ def upload_to_s3(file_path: str, s3_key: str) -> str:
         return None
 
 
+@traced()
+def upload_fileobj_to_s3(data: Union[bytes, BinaryIO], s3_key: str, content_type: Optional[str] = None) -> str:
+    """
+    Uploads in-memory data to AWS S3 bucket without touching the local disk.
+
+    Large payloads are sent as a multipart upload (S3_TRANSFER_CONFIG).
+    Throttling and transient errors are retried by the client itself
+    (aws_clients.BOTO_CONFIG), so a failure here is final.
+    
+    Args:
+        data: Bytes or a binary file-like object to upload
+        s3_key: Destination key/path in the bucket
+        content_type: MIME type stored with the object
+        
+    Returns:
+        str: Public URL of the uploaded object, None if the upload failed
+    """
+    # boto3 closes file-like objects after an upload, so hand it a copy
+    if not isinstance(data, bytes):
+        data.seek(0)
+        data = data.read()
+
+    extra_args = {'ACL': 'public-read'}
+    if content_type:
+        extra_args['ContentType'] = content_type
+
+    try:
+        # Shared, pooled S3 client
+        s3 = get_client('s3')
+
+        # Upload the buffer
+        s3.upload_fileobj(
+            BytesIO(data),
+            os.environ["AWS_BUCKET_NAME"],
+            s3_key,
+            ExtraArgs=extra_args,
+            Config=S3_TRANSFER_CONFIG
+        )
+        print(f"Buffer uploaded to s3://{os.environ['AWS_BUCKET_NAME']}/{s3_key}")
+        # create the object url
+        object_url = f"https://{os.environ['AWS_BUCKET_NAME']}.s3.{os.environ['AWS_REGION']}.amazonaws.com/{s3_key}"
+        return object_url
+
+    except NoCredentialsError:
+        print("AWS credentials not available")
+        return None
+    except PartialCredentialsError:
+        print("Incomplete AWS credentials")
+        return None
+    except Exception as e:
+        print(f"Error uploading buffer to S3: {str(e)}")
+        return None
+
+
+@traced()
+def upload_artifacts(
+    artifacts: Dict[str, Tuple[Union[bytes, BinaryIO], str, Optional[str]]],
+    commit: Optional[Callable[[Dict[str, str]], Dict]] = None
+) -> Dict:
+    """
+    Uploads several artifacts of one save concurrently, then commits the save.
+
+    commit is only called once every upload has succeeded, so a database
+    record never points at a missing object. It runs in the calling thread.
+    
+    Args:
+        artifacts: name -> (data, s3_key, content_type), e.g. {"excel": ..., "image": ...}
+        commit: Callable receiving name -> object URL and returning a dict with a 'success' key
+        
+    Returns:
+        Dict: success, message, urls (name -> URL or None) and the commit response
+    """
+    with ThreadPoolExecutor(max_workers=max(1, len(artifacts))) as executor:
+        futures = {
+            # every upload keeps the trace context (data_id, parent span) of the save
+            name: executor.submit(contextvars.copy_context().run, upload_fileobj_to_s3, data, s3_key, content_type)
+            for name, (data, s3_key, content_type) in artifacts.items()
+        }
+        urls = {name: future.result() for name, future in futures.items()}
+
+    failed = [name for name, url in urls.items() if not url]
+    if failed:
+        return {
+            'success': False,
+            'message': f"Upload failed for: {', '.join(failed)}",
+            'urls': urls,
+            'commit': None
+        }
+
+    commit_response = commit(urls) if commit is not None else None
+    if commit_response is not None and not commit_response.get('success'):
+        return {
+            'success': False,
+            'message': commit_response.get('message', 'Commit failed'),
+            'urls': urls,
+            'commit': commit_response
+        }
+
+    return {
+        'success': True,
+        'message': 'Artifacts uploaded successfully',
+        'urls': urls,
+        'commit': commit_response
+    }
+
+
+@traced()
 def download_from_s3(s3_key: str, local_path: str) -> bool:
     """
     Downloads a file from AWS S3 bucket.
@@ -75,13 +193,8 @@ def download_from_s3(s3_key: str, local_path: str) -> bool:
         bool: True if download was successful, False otherwise
     """
     try:
-        # Initialize S3 client
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=os.environ["AWS_ACCESS_KEY_ID"],
-            aws_secret_access_key=os.environ["AWS_SECRET_ACCESS_KEY"],
-            region_name=os.environ["AWS_REGION"]
-        )
+        # Shared, pooled S3 client
+        s3 = get_client('s3')
         
         # Download the file
         s3.download_file(os.environ["AWS_BUCKET_NAME"], s3_key, local_path)
@@ -104,6 +217,60 @@ def upload_bucket_path(user_name: str, user_id:str, type_: str, slate_type: str,
     user_name_ = "_".join(user_names)
 
     if type_ == 'image':
-        return f"{os.environ["ENV"]}/{slate_type}/{user_name_}_{user_id}/images/{data_id}.png"
+        return f"{os.environ['ENV']}/{slate_type}/{user_name_}_{user_id}/images/{data_id}.png"
     elif type_ == 'excel':
-        return f"{os.environ["ENV"]}/{slate_type}/{user_name_}_{user_id}/excel/{data_id}.xlsx"
\ No newline at end of file
+        return f"{os.environ['ENV']}/{slate_type}/{user_name_}_{user_id}/excel/{data_id}.xlsx"
+    elif type_ == 'result':
+        return f"{os.environ['ENV']}/{slate_type}/{user_name_}_{user_id}/results/{data_id}.json"
+
+
+@traced()
+def list_s3_keys(prefix: str, suffix: str = "", folder: Optional[str] = None) -> List[str]:
+    """
+    Lists the keys under a prefix of the AWS S3 bucket.
+    
+    Args:
+        prefix: Key prefix to list, e.g. "prod/substrate/"
+        suffix: Only keep keys ending with this, e.g. ".json"
+        folder: Only list the folder of this name in every folder directly
+            under prefix, e.g. "results" for "prod/substrate/<user>/results/",
+            so the other objects are never listed
+        
+    Returns:
+        List[str]: Matching keys in key order
+    """
+    # Shared, pooled S3 client
+    s3 = get_client('s3')
+    paginator = s3.get_paginator('list_objects_v2')
+    bucket = os.environ["AWS_BUCKET_NAME"]
+
+    prefixes = [prefix]
+    if folder:
+        prefixes = [
+            common['Prefix'] + folder + '/'
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/')
+            for common in page.get('CommonPrefixes', [])
+        ]
+
+    keys = []
+    for folder_prefix in prefixes:
+        for page in paginator.paginate(Bucket=bucket, Prefix=folder_prefix):
+            keys.extend(item['Key'] for item in page.get('Contents', []) if item['Key'].endswith(suffix))
+    return keys
+
+
+@traced()
+def read_s3_object(s3_key: str) -> bytes:
+    """
+    Reads an object of the AWS S3 bucket into memory.
+    
+    Args:
+        s3_key: Source key/path in the bucket
+        
+    Returns:
+        bytes: Object body
+    """
+    # Shared, pooled S3 client
+    s3 = get_client('s3')
+    response = s3.get_object(Bucket=os.environ["AWS_BUCKET_NAME"], Key=s3_key)
+    return response['Body'].read()
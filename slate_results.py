@@ -0,0 +1,133 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+import streamlit as st
+
+from cache_utils import ExtractionCache
+from db_utils import get_record
+from fish_slate import FishSlate
+from s3_utils import read_s3_object
+from substrate_grid import SubstrateGrid
+
+
+# saved next to the image and workbook of every upload (upload_bucket_path type_ 'result')
+RESULT_CONTENT_TYPE = 'application/json'
+RESULT_FORMAT_VERSION = 1
+
+# local copy of reopened results (optional "results" section in the secrets);
+# saving a reopened upload overwrites its result key, so entries are keyed by the
+# result_version of the record as well
+result_settings = st.secrets.get("results", {})
+RESULT_CACHE = ExtractionCache(
+    cache_dir=result_settings.get("CACHE_DIR", ".results_cache"),
+    max_entries=int(result_settings.get("MAX_ENTRIES", 5000)),
+    max_bytes=int(result_settings.get("MAX_BYTES", 200 * 1024 * 1024)),
+    max_age_seconds=int(result_settings.get("MAX_AGE_SECONDS", 30 * 24 * 60 * 60))
+)
+
+
+def build_result_document(
+    data_id: str,
+    slate_type: str,
+    edited: Union[SubstrateGrid, FishSlate],
+    slate_information: Optional[dict] = None,
+    model_output: Optional[dict] = None
+) -> dict:
+    """
+    Build the structured result of a saved slate.
+
+    The top level has the SegmentationLabels / SegmentationLabelsFishInvert
+    shape of the edited grid, with the slate information as info_segment, so
+    the result readers (result_loader, the analytics modules) take it as is.
+    The unedited model output is kept under model_output.
+
+    Args:
+        data_id (str): Record id of the upload
+        slate_type (str): 'substrate' or 'fish_and_invert'
+        edited (SubstrateGrid | FishSlate): Grid as saved by the user
+        slate_information (dict, optional): Site, date, team, ... of the slate
+        model_output (dict, optional): Validated model output (model_dump()) the grid was edited from
+
+    Returns:
+        dict: The result document
+    """
+    document = {
+        "format_version": RESULT_FORMAT_VERSION,
+        "data_id": data_id,
+        "slate_type": slate_type,
+        "saved_at": datetime.utcnow().isoformat(),
+        "info_segment": [slate_information] if slate_information else [],
+    }
+    document.update(edited.to_response())
+    document["model_output"] = model_output
+    return document
+
+
+def encode_result(document: dict) -> bytes:
+    """
+    Compact UTF-8 JSON of a result document.
+    """
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_result(data: bytes) -> dict:
+    return json.loads(data)
+
+
+def load_result(result_key: str, result_version: str = "") -> Optional[dict]:
+    """
+    Read a result document from S3, served from RESULT_CACHE when present.
+
+    Args:
+        result_key (str): S3 key stored as result_key on the record
+        result_version (str, optional): result_version stored on the record
+
+    Returns:
+        dict: The result document, None if it could not be read
+    """
+    cache_key = hashlib.sha256(f"{result_key}#{result_version}".encode("utf-8")).hexdigest()
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return decode_result(cached)
+
+    try:
+        data = read_s3_object(result_key)
+    except Exception as e:
+        print(f"Error reading result {result_key}: {str(e)}")
+        return None
+
+    RESULT_CACHE.set(cache_key, data.decode("utf-8"))
+    return decode_result(data)
+
+
+def reopen_result(table_name: str, data_id: str, user_id: str, slate_type: str) -> Dict:
+    """
+    Load the saved result of an upload for editing.
+
+    Args:
+        table_name (str): Records table
+        data_id (str): Record ID of the upload
+        user_id (str): Only uploads of this user can be reopened
+        slate_type (str): 'substrate' or 'fish_and_invert'
+
+    Returns:
+        Dict: success, message, data (the result document) and record
+    """
+    record_response = get_record(table_name, data_id)
+    record = record_response['data']
+    if not record_response['success'] or record.get('user_id') != user_id:
+        return {'success': False, 'message': f'Upload {data_id} not found', 'data': None, 'record': None}
+
+    result_key = record.get('result_key')
+    if not result_key:
+        return {'success': False, 'message': 'No structured result was saved with this upload', 'data': None, 'record': record}
+
+    document = load_result(result_key, record.get('result_version', ''))
+    if document is None:
+        return {'success': False, 'message': 'The saved result could not be read', 'data': None, 'record': record}
+    if document.get('slate_type') != slate_type:
+        return {'success': False, 'message': f"Upload {data_id} is not a {slate_type} slate", 'data': None, 'record': record}
+
+    return {'success': True, 'message': 'Result loaded', 'data': document, 'record': record}
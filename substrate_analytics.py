@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from result_loader import iter_results, RESULT_CHUNK_SIZE
+from substrate_grid import (
+    SEGMENT_KEYS, POINTS_PER_SEGMENT, GRID_SHAPE, SUBSTRATE_LABELS, SUMMARY_LABELS
+)
+
+
+_LABEL_CODES = {label: code for code, label in enumerate(SUBSTRATE_LABELS)}
+# category codes of the summary labels, i.e. the columns of every cover array
+_SUMMARY_CODES = np.array([_LABEL_CODES[label] for label in SUMMARY_LABELS])
+SEGMENT_NAMES = tuple(f"S{index + 1}" for index in range(len(SEGMENT_KEYS)))
+
+
+@dataclass
+class SubstrateBatch:
+    """
+    Label codes of many substrate slates stacked into one array.
+
+    codes is (n, 4, 40) with the SUBSTRATE_LABELS category codes of every
+    point, -1 where a point is missing or has an unknown label. sites, dates
+    and sources hold the survey site, survey date and result location of
+    every slate.
+    """
+    codes: np.ndarray
+    sites: np.ndarray
+    dates: np.ndarray
+    sources: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def from_results(cls, results: Iterable[Tuple[str, dict]]) -> "SubstrateBatch":
+        """
+        Build the batch from (source, SegmentationLabels model_dump()) pairs.
+        Site and date come from the first info_segment entry.
+        """
+        results = list(results)
+        codes = np.full((len(results),) + GRID_SHAPE, -1, dtype=np.int8)
+        sites, dates, sources = [], [], []
+
+        for slate_index, (source, result) in enumerate(results):
+            for segment_index, key in enumerate(SEGMENT_KEYS):
+                records = (result.get(key) or [])[:POINTS_PER_SEGMENT]
+                codes[slate_index, segment_index, :len(records)] = [
+                    _LABEL_CODES.get(record.get("label"), -1) for record in records
+                ]
+            info = (result.get("info_segment") or [{}])[0]
+            sites.append((info.get("site_name") or "").strip() or "Unknown site")
+            dates.append(info.get("date"))
+            sources.append(source)
+
+        return cls(
+            codes,
+            np.asarray(sites, dtype=object),
+            pd.to_datetime(pd.Series(dates, dtype=object), errors="coerce", format="mixed").to_numpy(dtype="datetime64[D]"),
+            np.asarray(sources, dtype=object)
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["SubstrateBatch"]) -> "SubstrateBatch":
+        if not batches:
+            return cls.from_results([])
+        return cls(
+            np.concatenate([batch.codes for batch in batches]),
+            np.concatenate([batch.sites for batch in batches]),
+            np.concatenate([batch.dates for batch in batches]),
+            np.concatenate([batch.sources for batch in batches])
+        )
+
+
+def load_substrate_batch(source: str, chunk_size: int = RESULT_CHUNK_SIZE) -> SubstrateBatch:
+    """
+    Load the substrate results of a local directory or "s3://<prefix>".
+
+    The JSON documents are read chunk by chunk and only their label codes are
+    kept, so the batch takes 160 bytes per slate.
+    """
+    return SubstrateBatch.concat([SubstrateBatch.from_results(chunk) for chunk in iter_results(source, chunk_size)])
+
+
+def segment_counts(codes: np.ndarray) -> np.ndarray:
+    """
+    Count the summary labels of every segment.
+
+    Args:
+        codes (np.ndarray): (n, 4, 40) label codes
+
+    Returns:
+        np.ndarray: (n, 4, len(SUMMARY_LABELS)) point counts, like the COUNTIF cells of the workbook
+    """
+    segments = codes.reshape(-1, POINTS_PER_SEGMENT).astype(np.intp)
+    # one bincount over all segments: offset the codes of segment i by i * labels
+    offsets = np.arange(len(segments))[:, None] * len(SUBSTRATE_LABELS)
+    valid = segments >= 0
+    counts = np.bincount((segments + offsets)[valid], minlength=len(segments) * len(SUBSTRATE_LABELS))
+
+    return counts.reshape(codes.shape[:-1] + (len(SUBSTRATE_LABELS),))[..., _SUMMARY_CODES]
+
+
+def segment_cover(codes: np.ndarray) -> np.ndarray:
+    """
+    (n, 4, labels) cover fraction of every segment: label points / 40.
+    """
+    return segment_counts(codes) / POINTS_PER_SEGMENT
+
+
+def slate_cover(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and SD of the segment cover of every slate.
+
+    Matches the "Mean % per segment" and "SD" columns of the workbook, so the
+    SD is the sample SD over the four segments.
+
+    Returns:
+        tuple: ((n, labels) mean cover, (n, labels) SD)
+    """
+    cover = segment_cover(codes)
+    return cover.mean(axis=1), cover.std(axis=1, ddof=1)
+
+
+def _frame_keys(batch: SubstrateBatch) -> dict:
+    return {"site": batch.sites, "date": batch.dates, "source": batch.sources}
+
+
+def segment_cover_frame(batch: SubstrateBatch) -> pd.DataFrame:
+    """
+    One row per slate and segment with the cover fraction of every summary label.
+    """
+    cover = segment_cover(batch.codes).reshape(-1, len(SUMMARY_LABELS))
+    columns = {key: np.repeat(values, len(SEGMENT_KEYS)) for key, values in _frame_keys(batch).items()}
+    columns["segment"] = np.tile(np.asarray(SEGMENT_NAMES, dtype=object), len(batch))
+    columns.update({label: cover[:, index] for index, label in enumerate(SUMMARY_LABELS)})
+    return pd.DataFrame(columns)
+
+
+def slate_cover_frame(batch: SubstrateBatch) -> pd.DataFrame:
+    """
+    One row per slate with the mean cover and SD of every summary label.
+    """
+    mean, sd = slate_cover(batch.codes)
+    columns = _frame_keys(batch)
+    columns.update({label: mean[:, index] for index, label in enumerate(SUMMARY_LABELS)})
+    columns.update({f"{label}_sd": sd[:, index] for index, label in enumerate(SUMMARY_LABELS)})
+    return pd.DataFrame(columns)
+
+
+def site_cover_frame(batch: SubstrateBatch, by: Sequence[str] = ("site",)) -> pd.DataFrame:
+    """
+    Percent cover per site (or per site and date with by=("site", "date")).
+
+    Every slate counts once. For each group and summary label the frame holds
+    the number of slates, the mean cover of each segment (S1-S4), the mean
+    slate cover and its sample SD across the slates (NaN for one slate).
+    """
+    keys = _frame_keys(batch)
+    grouped = pd.DataFrame({key: keys[key] for key in by}).groupby(list(by), sort=True, dropna=False)
+    group_index = grouped.ngroup().to_numpy()
+    groups = grouped.size().index.to_frame(index=False)
+    group_count = len(groups)
+    labels = len(SUMMARY_LABELS)
+
+    # per slate: the four segment covers and the mean cover, (n, 5, labels)
+    cover = segment_cover(batch.codes)
+    values = np.concatenate([cover, cover.mean(axis=1, keepdims=True)], axis=1)
+
+    slates = np.bincount(group_index, minlength=group_count)
+    sums = np.zeros((group_count,) + values.shape[1:])
+    np.add.at(sums, group_index, values)
+    squares = np.zeros((group_count, labels))
+    np.add.at(squares, group_index, values[:, -1] ** 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / slates[:, None, None]
+        variance = (squares - sums[:, -1] * means[:, -1]) / (slates[:, None] - 1)
+    sd = np.sqrt(np.clip(variance, 0, None))
+
+    return pd.DataFrame({
+        **{name: np.repeat(groups[name].to_numpy(), labels) for name in by},
+        "label": np.tile(np.asarray(SUMMARY_LABELS, dtype=object), group_count),
+        "slates": np.repeat(slates, labels),
+        **{segment: means[:, index].ravel() for index, segment in enumerate(SEGMENT_NAMES)},
+        "mean_cover": means[:, -1].ravel(),
+        "sd_cover": sd.ravel(),
+    })
+
+
+def summarize_results(source: str, by: Sequence[str] = ("site",)) -> pd.DataFrame:
+    """
+    Load the substrate results of a source and return site_cover_frame of them.
+    """
+    return site_cover_frame(load_substrate_batch(source), by=by)
@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# slate layout
+SEGMENT_KEYS = ("segment_one", "segment_two", "segment_three", "segment_four")
+SEGMENT_DISTANCES = ("0 - 19.5m", "25 - 44.5m", "50 - 65.5m", "75 - 94.5m")
+SEGMENT_STARTS = (0.0, 25.0, 50.0, 75.0)
+POINTS_PER_SEGMENT = 40
+POINT_SPACING = 0.5
+GRID_SHAPE = (len(SEGMENT_KEYS), POINTS_PER_SEGMENT)
+
+SUBSTRATE_LABELS = ("HC", "NIA", "RB", "OT", "SC", "SP", "SD", "RKC", "RC", "SI", "no_label")
+FIELDS = ("distance", "label", "clear")
+# substrate codes of the workbook summary tables, in table order
+SUMMARY_LABELS = ("HC", "SC", "RKC", "NIA", "SP", "RC", "RB", "SD", "SI", "OT")
+
+LABEL_DTYPE = pd.CategoricalDtype(SUBSTRATE_LABELS)
+_LABEL_CODES = {label: code for code, label in enumerate(SUBSTRATE_LABELS)}
+
+# columns of the editable DataFrame, built once
+DATAFRAME_COLUMNS = pd.MultiIndex.from_arrays([
+    np.repeat(SEGMENT_KEYS, len(FIELDS)),
+    np.repeat(SEGMENT_DISTANCES, len(FIELDS)),
+    [f"{field}_{index}" for index in range(len(SEGMENT_KEYS)) for field in FIELDS],
+])
+
+_NUMBER_PATTERN = r"(-?\d+(?:\.\d+)?)"
+
+
+def canonical_distances() -> np.ndarray:
+    """
+    Return the (4, 40) distances printed on the slate (0, 0.5, ... 94.5).
+    """
+    return np.asarray(SEGMENT_STARTS)[:, None] + POINT_SPACING * np.arange(POINTS_PER_SEGMENT)
+
+
+def parse_distances(values) -> np.ndarray:
+    """
+    Parse distances given as numbers or text such as "17.5" or "17.5m"; NaN where none is found.
+    """
+    values = np.asarray(values, dtype=object).ravel()
+    try:
+        # plain numbers and numeric strings, None becomes NaN
+        return values.astype(float)
+    except (TypeError, ValueError):
+        text = pd.Series(values, dtype=object).astype(str)
+        return text.str.extract(_NUMBER_PATTERN, expand=False).astype(float).to_numpy()
+
+
+def label_categorical(values) -> pd.Categorical:
+    """
+    Build the label categorical, keeping unknown labels as extra categories.
+    """
+    values = np.asarray(values, dtype=object).ravel()
+    codes = np.fromiter((_LABEL_CODES.get(value, -2) for value in values), dtype=np.int8, count=len(values))
+
+    unknown = codes == -2
+    if not unknown.any():
+        return pd.Categorical.from_codes(codes, dtype=LABEL_DTYPE)
+
+    # missing values stay missing, anything else becomes an extra category
+    present = np.array([isinstance(value, str) and value != "" for value in values[unknown]])
+    extra = sorted(set(values[unknown][present]))
+    extra_codes = {label: len(SUBSTRATE_LABELS) + index for index, label in enumerate(extra)}
+    codes[unknown] = [extra_codes.get(value, -1) for value in values[unknown]]
+    return pd.Categorical.from_codes(codes, categories=list(SUBSTRATE_LABELS) + extra)
+
+
+# text of the slate distances, so formatting is a lookup for the usual values
+_DISTANCE_TEXT = {value: f"{value:g}" for value in canonical_distances().ravel().tolist()}
+
+
+@dataclass
+class SubstrateGrid:
+    """
+    The 4 x 40 substrate grid of one slate as typed arrays.
+
+    Rows are the segments (SEGMENT_KEYS) and columns the 40 points of a
+    segment. Missing points have a NaN distance and a missing label.
+    """
+    distances: np.ndarray
+    labels: pd.Categorical
+    clear: np.ndarray
+
+    @property
+    def label_codes(self) -> np.ndarray:
+        """(4, 40) category codes of the labels, -1 where missing."""
+        return np.asarray(self.labels.codes).reshape(GRID_SHAPE)
+
+    def distance_text(self) -> np.ndarray:
+        """(4, 40) distances formatted as on the slate, "" where missing."""
+        text = [_DISTANCE_TEXT.get(value) or ("" if value != value else f"{value:g}") for value in self.distances.ravel().tolist()]
+        return np.array(text, dtype=object).reshape(GRID_SHAPE)
+
+    def label_text(self) -> np.ndarray:
+        """(4, 40) labels as strings, "" where missing."""
+        codes = np.asarray(self.labels.codes)
+        text = np.asarray(self.labels.categories, dtype=object)[codes]
+        text[codes < 0] = ""
+        return text.reshape(GRID_SHAPE)
+
+    @classmethod
+    def from_response(cls, response_data: dict) -> "SubstrateGrid":
+        """
+        Build the grid from SegmentationLabels output (model_dump() or the
+        segment_* part of it). Points past the 40th of a segment are dropped.
+        """
+        distances = np.full(GRID_SHAPE, None, dtype=object)
+        labels = np.full(GRID_SHAPE, None, dtype=object)
+        clear = np.zeros(GRID_SHAPE, dtype=bool)
+
+        for index, key in enumerate(SEGMENT_KEYS):
+            records = (response_data.get(key) or [])[:POINTS_PER_SEGMENT]
+            count = len(records)
+            if count == 0:
+                continue
+            distances[index, :count] = [record["distance"] for record in records]
+            labels[index, :count] = [record["label"] for record in records]
+            clear[index, :count] = [bool(record["label_status"]) for record in records]
+
+        return cls(parse_distances(distances).reshape(GRID_SHAPE), label_categorical(labels), clear)
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame) -> "SubstrateGrid":
+        """
+        Build the grid from the (edited) DataFrame returned by to_dataframe.
+        """
+        values = data.to_numpy(dtype=object)[:POINTS_PER_SEGMENT]
+        rows = len(values)
+
+        # (points, segment * field) -> (field, segment, points)
+        fields = np.full((len(FIELDS),) + GRID_SHAPE, None, dtype=object)
+        fields[:, :, :rows] = values.reshape(rows, len(SEGMENT_KEYS), len(FIELDS)).transpose(2, 1, 0)
+
+        clear = pd.Series(fields[2].ravel(), dtype=object).fillna(False).astype(bool).to_numpy()
+        return cls(
+            parse_distances(fields[0]).reshape(GRID_SHAPE),
+            label_categorical(fields[1]),
+            clear.reshape(GRID_SHAPE)
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Editable DataFrame: one row per point, and for every segment a float
+        distance, a categorical label and a bool clarity column under a
+        (segment, distance range, column) MultiIndex.
+        """
+        codes = self.label_codes
+        arrays = []
+        for index in range(len(SEGMENT_KEYS)):
+            arrays.append(self.distances[index])
+            arrays.append(pd.Categorical.from_codes(codes[index], dtype=self.labels.dtype))
+            arrays.append(self.clear[index])
+
+        df = pd.DataFrame(dict(enumerate(arrays)))
+        df.columns = DATAFRAME_COLUMNS
+        return df
+
+    def to_response(self) -> dict:
+        """
+        SegmentationLabels-shaped segment_* lists, as used by the workbook writers.
+        """
+        distance_text = self.distance_text()
+        label_text = self.label_text()
+
+        return {
+            key: [
+                {"distance": distance, "label": label, "label_status": bool(status)}
+                for distance, label, status in zip(distance_text[index], label_text[index], self.clear[index])
+            ]
+            for index, key in enumerate(SEGMENT_KEYS)
+        }
+
+    def excel_rows(self) -> list:
+        """
+        The 20 rows of the workbook record block.
+
+        Each row holds (distance, label, label_status) for point i and point
+        i + 20 of every segment, i.e. 4 segments x 2 halves x 3 fields.
+        """
+        half = POINTS_PER_SEGMENT // 2
+        fields = np.stack([self.distance_text(), self.label_text(), self.clear.astype(object)])
+        # (field, segment, half, row) -> (row, segment, half, field)
+        rows = fields.reshape(len(FIELDS), len(SEGMENT_KEYS), 2, half).transpose(3, 1, 2, 0)
+
+        return rows.reshape(half, -1).tolist()
+
+
+def substrate_grid(response_data) -> SubstrateGrid:
+    """
+    Return response_data as a SubstrateGrid, converting model output if needed.
+    """
+    if isinstance(response_data, SubstrateGrid):
+        return response_data
+    return SubstrateGrid.from_response(response_data)
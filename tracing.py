@@ -0,0 +1,317 @@
+import atexit
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+import pandas as pd
+import streamlit as st
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+# tracing settings (optional "tracing" section in the secrets)
+tracing_settings = st.secrets.get("tracing", {})
+
+TRACING_ENABLED = bool(tracing_settings.get("ENABLED", True))
+# one JSON line per finished span, logged at INFO to "reefcheck.trace" (route it with a logging handler)
+TRACE_LOG = bool(tracing_settings.get("LOG", False))
+# also start OpenTelemetry spans (needs opentelemetry-api and a configured SDK/exporter)
+TRACE_OPENTELEMETRY = bool(tracing_settings.get("OPENTELEMETRY", False)) and otel_trace is not None
+TRACE_DB_PATH = tracing_settings.get("DB_PATH", os.path.join(".traces", "spans.sqlite3"))
+TRACE_RETENTION_DAYS = int(tracing_settings.get("RETENTION_DAYS", 30))
+# spans older than the retention are purged by the writer thread this often
+TRACE_PURGE_SECONDS = float(tracing_settings.get("PURGE_SECONDS", 60 * 60))
+
+TRACE_LOGGER = logging.getLogger("reefcheck.trace")
+
+# correlation id of the current save / job, normally the data_id of the upload
+_CORRELATION_ID = contextvars.ContextVar("trace_correlation_id", default=None)
+_CURRENT_SPAN = contextvars.ContextVar("trace_current_span", default=None)
+
+# bookkeeping keys of a span dict that are not part of the span
+_INTERNAL_KEYS = ("root", "buffer", "flushed")
+
+_DB_LOCK = threading.Lock()
+_DB_READY = set()
+
+# finished spans are stored by one background thread, off the traced calls
+_SPAN_QUEUE = queue.Queue()
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+
+def _connect(db_path: str = TRACE_DB_PATH) -> sqlite3.Connection:
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(db_path, timeout=30)
+    with _DB_LOCK:
+        if db_path not in _DB_READY:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spans (
+                    span_id TEXT PRIMARY KEY,
+                    parent_id TEXT,
+                    correlation_id TEXT,
+                    name TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    attributes TEXT
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS spans_started ON spans (started_at, name)")
+            connection.execute("CREATE INDEX IF NOT EXISTS spans_correlation ON spans (correlation_id)")
+            _DB_READY.add(db_path)
+    return connection
+
+
+def _write_spans(spans: list) -> None:
+    """
+    Store finished spans; errors are only printed, they never reach a traced call.
+    """
+    try:
+        with contextlib.closing(_connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        span["span_id"], span["parent_id"], span["correlation_id"], span["name"], span["started_at"],
+                        span["duration_ms"], span["status"], json.dumps(span["attributes"], default=str)
+                    )
+                    for span in spans
+                ]
+            )
+    except Exception as e:
+        print(f"Error storing trace spans: {str(e)}")
+
+
+def _write_loop() -> None:
+    next_purge = 0.0
+    while True:
+        batches = [_SPAN_QUEUE.get()]
+        # store everything queued in the meantime in one transaction
+        while True:
+            try:
+                batches.append(_SPAN_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        _write_spans([span for batch in batches for span in batch])
+
+        if time.monotonic() >= next_purge:
+            try:
+                purge_spans()
+            except Exception as e:
+                print(f"Error purging trace spans: {str(e)}")
+            next_purge = time.monotonic() + TRACE_PURGE_SECONDS
+
+        for _ in batches:
+            _SPAN_QUEUE.task_done()
+
+
+def _enqueue_spans(spans: list) -> None:
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None or not _WRITER.is_alive():
+            _WRITER = threading.Thread(target=_write_loop, name="trace-writer", daemon=True)
+            _WRITER.start()
+    _SPAN_QUEUE.put(spans)
+
+
+@atexit.register
+def flush_spans() -> None:
+    """
+    Wait until every finished span has been stored.
+    """
+    if _WRITER is not None:
+        _SPAN_QUEUE.join()
+
+
+@contextlib.contextmanager
+def trace_context(correlation_id: str):
+    """
+    Tag every span started inside the block with correlation_id (e.g. the data_id of a save).
+    """
+    token = _CORRELATION_ID.set(correlation_id)
+    try:
+        yield
+    finally:
+        _CORRELATION_ID.reset(token)
+
+
+def _finish(record: dict) -> None:
+    if TRACE_LOG:
+        TRACE_LOGGER.info(json.dumps({key: value for key, value in record.items() if key not in _INTERNAL_KEYS}, default=str))
+
+    # spans are queued for storage together when their root span ends
+    root = record["root"]
+    if root is record:
+        record["flushed"] = True
+        _enqueue_spans(record.pop("buffer") + [record])
+    elif root["flushed"]:
+        _enqueue_spans([record])
+    else:
+        root["buffer"].append(record)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as one span.
+
+    Spans nest: a span started inside another one records it as its parent
+    and is stored with it. The span dict is yielded, so attributes can be
+    added while it runs (see annotate).
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    parent = _CURRENT_SPAN.get()
+    record = {
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "correlation_id": _CORRELATION_ID.get(),
+        "name": name,
+        "started_at": time.time(),
+        "duration_ms": 0.0,
+        "status": "ok",
+        "attributes": attributes,
+    }
+    record["root"] = parent["root"] if parent else record
+    if parent is None:
+        record.update(buffer=[], flushed=False)
+
+    token = _CURRENT_SPAN.set(record)
+    otel_span = contextlib.nullcontext()
+    if TRACE_OPENTELEMETRY:
+        otel_attributes = {key: str(value) for key, value in attributes.items()}
+        if record["correlation_id"]:
+            otel_attributes["data_id"] = record["correlation_id"]
+        otel_span = otel_trace.get_tracer("reefcheck").start_as_current_span(name, attributes=otel_attributes)
+
+    start = time.perf_counter()
+    try:
+        with otel_span:
+            yield record
+    except BaseException as error:
+        record["status"] = "error"
+        record["attributes"]["error"] = type(error).__name__
+        raise
+    finally:
+        record["duration_ms"] = (time.perf_counter() - start) * 1000
+        _CURRENT_SPAN.reset(token)
+        _finish(record)
+
+
+def annotate(**attributes: Any) -> None:
+    """
+    Add attributes to the current span, if there is one.
+    """
+    record = _CURRENT_SPAN.get()
+    if record is not None:
+        record["attributes"].update(attributes)
+
+
+def traced(name: Optional[str] = None):
+    """
+    Decorator running every call of a function (or coroutine function) in a
+    span named name, "<module>.<function>" by default.
+    """
+    def decorator(function):
+        span_name = name or f"{function.__module__}.{function.__name__}"
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def carry_context(coroutine):
+    """
+    Wrap a coroutine so it runs under the current correlation id and span,
+    for coroutines handed to another thread's event loop.
+    """
+    correlation_id, parent = _CORRELATION_ID.get(), _CURRENT_SPAN.get()
+
+    async def run():
+        correlation_token = _CORRELATION_ID.set(correlation_id)
+        span_token = _CURRENT_SPAN.set(parent)
+        try:
+            return await coroutine
+        finally:
+            _CURRENT_SPAN.reset(span_token)
+            _CORRELATION_ID.reset(correlation_token)
+
+    return run()
+
+
+def purge_spans(retention_days: int = TRACE_RETENTION_DAYS) -> int:
+    """
+    Delete spans older than retention_days; returns the number deleted.
+    """
+    with contextlib.closing(_connect()) as connection, connection:
+        cursor = connection.execute("DELETE FROM spans WHERE started_at < ?", (time.time() - retention_days * 86400,))
+        return cursor.rowcount
+
+
+def load_spans(hours: float = 24, correlation_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    Spans started in the last hours, or all spans of one correlation id.
+    """
+    with contextlib.closing(_connect()) as connection:
+        if correlation_id:
+            query, params = "SELECT * FROM spans WHERE correlation_id = ? ORDER BY started_at", (correlation_id,)
+        else:
+            query, params = "SELECT * FROM spans WHERE started_at >= ? ORDER BY started_at", (time.time() - hours * 3600,)
+        spans = pd.read_sql_query(query, connection, params=params)
+
+    spans["started_at"] = pd.to_datetime(spans["started_at"], unit="s")
+    return spans
+
+
+def stage_percentiles(hours: float = 24) -> pd.DataFrame:
+    """
+    Calls, p50, p95, p99, mean and max duration (ms) of every span name in the window.
+    """
+    spans = load_spans(hours)
+    if spans.empty:
+        return pd.DataFrame(columns=["stage", "calls", "errors", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms"])
+
+    durations = spans.groupby("name")["duration_ms"]
+    stats = pd.DataFrame({
+        "calls": durations.size(),
+        "errors": (spans["status"] != "ok").groupby(spans["name"]).sum(),
+        "p50_ms": durations.quantile(0.50),
+        "p95_ms": durations.quantile(0.95),
+        "p99_ms": durations.quantile(0.99),
+        "mean_ms": durations.mean(),
+        "max_ms": durations.max(),
+    })
+    return stats.rename_axis("stage").reset_index().sort_values("p95_ms", ascending=False, ignore_index=True)
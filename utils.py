@@ -1,21 +1,29 @@
-from collections import defaultdict
+from typing import Optional, Union
 import pandas as pd
 from io import BytesIO
 import xlsxwriter
 from openpyxl import load_workbook
-from PIL import Image, ExifTags
+from PIL import Image, ImageOps
 import streamlit as st
 import os
 
+from substrate_grid import SubstrateGrid, substrate_grid, SUMMARY_LABELS
+from fish_slate import FishSlate, fish_slate, FISH_GROUPS, DISTANCE_COLUMNS
+from tracing import traced
+
 
 # environment variables
 os.environ["ENV"] = st.secrets["aws"]["ENV"]
 
 
 # Image utilities
+@traced()
 def handle_image_orientation(image: Image.Image) -> Image.Image:
     """
     Handle image orientation based on EXIF data.
+
+    The orientation tag is dropped from the returned image, so running the
+    preprocessing EXIF transpose afterwards does not rotate it a second time.
     
     Args:
         image: PIL Image object
@@ -23,113 +31,57 @@ def handle_image_orientation(image: Image.Image) -> Image.Image:
     Returns:
         PIL Image object with correct orientation
     """
-    try:
-        for orientation in ExifTags.TAGS.keys():
-            if ExifTags.TAGS[orientation] == 'Orientation':
-                break
-        exif = dict(image._getexif().items())
-
-        if exif[orientation] == 3:
-            image = image.rotate(180, expand=True)
-        elif exif[orientation] == 6:
-            image = image.rotate(270, expand=True)
-        elif exif[orientation] == 8:
-            image = image.rotate(90, expand=True)
-    except (AttributeError, KeyError, IndexError):
-        print("Image does not have exif data")
-        # cases: image don't have exif data
-        pass
-    
-    return image
-
-# substrate analysis
-def generate_keys(key_list, multiplier = 3):
-    new_list = []
+    return ImageOps.exif_transpose(image)
 
-    for label in key_list:
-        new_list.extend([label]*multiplier)
 
-    return new_list
-
-
-def create_substrate_dataframe(response_data: dict, csv_name: str) -> pd.DataFrame:
-    segment_distances = ["0 - 19.5m", "25 - 44.5m", "50 - 65.5m", "75 - 94.5m"]
+def encode_png(image: Image.Image) -> bytes:
+    """
+    Encode an image as PNG in memory.
+    """
+    with BytesIO() as buffer:
+        image.save(buffer, format='PNG')
+        return buffer.getvalue()
 
+# substrate analysis
+@traced()
+def create_substrate_dataframe(response_data: dict, csv_name: Optional[str] = None) -> pd.DataFrame:
     # pop out the slate info 
     info_segment = response_data.pop('info_segment', None)
-    # get unique keys
-    response_keys = list(response_data.keys())
-    # create dataframes
-    df = pd.concat([pd.DataFrame.from_dict(response_data[key]) for key in list(response_data.keys())], axis = 1)
-
-    # create unique column names
-    column_names = []
-    for num in range(len(list(response_data.keys()))):
-        column_names.extend([f"distance_{num}", f"label_{num}", f"clear_{num}"])
-    # set column names
-    df.columns = column_names
-
-    # generate multi-level index
-    segment_list = generate_keys(list(response_data.keys()))
-    merge_list = generate_keys(segment_distances)
-
-    # create multi index
-    arrays = [
-        segment_list,
-        merge_list,
-        column_names
-    ]
-    columns = pd.MultiIndex.from_arrays(arrays)
-    # create a dataframe
-    df = pd.DataFrame(df.iloc[:,:].values, columns=columns)  
+    # typed 4 x 40 grid, one row per point and three columns per segment
+    df = SubstrateGrid.from_response(response_data).to_dataframe()
 
-    # save the dataframe to a csv file
-    df.to_csv(csv_name, index=False)
+    # save the dataframe to a csv file only when asked to
+    if csv_name:
+        df.to_csv(csv_name, index=False)
 
     return df, info_segment
 
 
-def extract_details(info: dict) -> list:
-
-    return [info["distance"], info["label"], info["label_status"]]
-
-
-def extract_single_attributes(selected_set: list, index_val: int) -> list:
-    sub_segments = []
-    # first segment
-    first_set = selected_set[index_val]
-    second_set = selected_set[index_val + 20]
-    sub_segments.extend(extract_details(first_set))
-    sub_segments.extend(extract_details(second_set))
-
-    return sub_segments
+def write_workbook_bytes(workbook_bytes: bytes, excel_name: Optional[Union[str, BytesIO]] = None) -> bytes:
+    """
+    Optionally copy finished workbook bytes to a file path or buffer, and hand them back.
+    """
+    if isinstance(excel_name, str):
+        with open(excel_name, "wb") as excel_file:
+            excel_file.write(workbook_bytes)
+    elif excel_name is not None:
+        excel_name.write(workbook_bytes)
 
+    return workbook_bytes
 
-def substrate_excel_creation(response_data: dict, info_data: dict, excel_name: str):
-    selected_set_one = response_data["segment_one"]
-    selected_set_two = response_data["segment_two"]
-    selected_set_three = response_data["segment_three"]
-    selected_set_four = response_data["segment_four"]
 
+def substrate_excel_rows(response_data: Union[dict, SubstrateGrid]) -> list:
+    return substrate_grid(response_data).excel_rows()
 
-    final_segments = []
-    for index in range(20):
-        sub_set_segments = []
-        # first segment
-        sub_set_segments.extend(extract_single_attributes(selected_set_one, index))
-        # seconds segment
-        sub_set_segments.extend(extract_single_attributes(selected_set_two, index))
-        # seconds segment
-        sub_set_segments.extend(extract_single_attributes(selected_set_three, index))
-        # seconds segment
-        sub_set_segments.extend(extract_single_attributes(selected_set_four, index))
-        # append the segment
-        final_segments.append(sub_set_segments)
 
-    # Create a workbook and add a worksheet.
-    workbook = xlsxwriter.Workbook(excel_name)
-    worksheet = workbook.add_worksheet()
+def write_substrate_layout(workbook: xlsxwriter.Workbook, worksheet) -> dict:
+    """
+    Write everything on the substrate sheet that does not depend on the slate:
+    formats, headers, legend, summary tables and formulas.
 
+    Returns:
+        dict: the formats used for the slate specific cells
+    """
     # Text Formats
     text_bold = workbook.add_format({'bold': True, 'font_name': 'Arial'})
     text_normal_bold = workbook.add_format({'bold': True, 'center_across': True, 'font_name': 'Arial'})
@@ -216,54 +168,6 @@ def substrate_excel_creation(response_data: dict, info_data: dict, excel_name: s
     worksheet.merge_range("I14:L14", "50 - 69.5m", cell_bold)
     worksheet.merge_range("M14:P14", "75 - 94.5m", cell_bold)
 
-    info_col = 3
-    info_row = 0
-
-    info_fields = [
-        "site_name",
-        "country_island",
-        "depth",
-        "date",
-        "team_leader",
-        "data_recorded_by",
-        "time",
-    ]
-
-    for field_idx in range(0, len(info_fields), 2):
-        worksheet.merge_range(
-            info_row,        # row index (0-based)
-            info_col,
-            info_row,
-            info_col + 4,
-            info_data.get(info_fields[field_idx], ""),
-            border
-        )
-
-        if field_idx + 1 < len(info_fields):
-            worksheet.merge_range(
-                info_row,        # row index (0-based)
-                info_col+8,
-                info_row,
-                info_col + 12,
-                info_data.get(info_fields[field_idx+1], ""),
-                border
-            )
-        info_row += 1
-            
-
-    
-    row = 14
-    # adding records
-    for diff_segments in final_segments:
-        col = 0
-        for range_index in range(0, 24, 3):
-            worksheet.write(row, col, diff_segments[range_index], bold_border)
-            col += 1
-            worksheet.write(row, col, diff_segments[range_index +1], not_clear if not diff_segments[range_index +2] else border)
-            col += 1
-        row += 1
-
-
     worksheet.write(35, 0, "# of HC with disease:", text_bold)
     worksheet.write(36, 0, "# of HC with bleaching:", text_bold)
     worksheet.write(37, 0, "% of HC with disease:", text_bold_red)
@@ -325,7 +229,7 @@ def substrate_excel_creation(response_data: dict, info_data: dict, excel_name: s
     worksheet.merge_range("I51:J51", "Grand total", lower_table_cell_border)
 
 
-    subs_list_ = ["HC", "SC", "RKC", "NIA", "SP", "RC", "RB", "SD", "SI", "OT"]
+    subs_list_ = SUMMARY_LABELS
 
     summary_row_index = 51
     for substrate_code in subs_list_:
@@ -408,12 +312,87 @@ def substrate_excel_creation(response_data: dict, info_data: dict, excel_name: s
     worksheet.write(64, 11, "PLEASE TURN TO THE GRAPHS TAB",instructions)
     worksheet.write(66, 0, "This page is ready to print",instructions)
 
+    return {"border": border, "bold_border": bold_border, "not_clear": not_clear}
+
+
+def write_substrate_info(worksheet, info_data: dict, formats: dict):
+    border = formats["border"]
+
+    info_col = 3
+    info_row = 0
+
+    info_fields = [
+        "site_name",
+        "country_island",
+        "depth",
+        "date",
+        "team_leader",
+        "data_recorded_by",
+        "time",
+    ]
+
+    for field_idx in range(0, len(info_fields), 2):
+        worksheet.merge_range(
+            info_row,        # row index (0-based)
+            info_col,
+            info_row,
+            info_col + 4,
+            info_data.get(info_fields[field_idx], ""),
+            border
+        )
+
+        if field_idx + 1 < len(info_fields):
+            worksheet.merge_range(
+                info_row,        # row index (0-based)
+                info_col+8,
+                info_row,
+                info_col + 12,
+                info_data.get(info_fields[field_idx+1], ""),
+                border
+            )
+        info_row += 1
+
+
+def write_substrate_records(worksheet, final_segments: list, formats: dict):
+    border = formats["border"]
+    bold_border = formats["bold_border"]
+    not_clear = formats["not_clear"]
+
+    row = 14
+    # adding records
+    for diff_segments in final_segments:
+        col = 0
+        for range_index in range(0, 24, 3):
+            worksheet.write(row, col, diff_segments[range_index], bold_border)
+            col += 1
+            worksheet.write(row, col, diff_segments[range_index +1], not_clear if not diff_segments[range_index +2] else border)
+            col += 1
+        row += 1
+
+
+@traced()
+def substrate_excel_creation(response_data: dict, info_data: dict, excel_name: Optional[Union[str, BytesIO]] = None) -> bytes:
+    final_segments = substrate_excel_rows(response_data)
+
+    # Create a workbook and add a worksheet.
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    worksheet = workbook.add_worksheet()
+
+    formats = write_substrate_layout(workbook, worksheet)
+    write_substrate_info(worksheet, info_data, formats)
+    write_substrate_records(worksheet, final_segments, formats)
 
     workbook.close()
 
+    return write_workbook_bytes(output.getvalue(), excel_name)
+
 
-def load_and_prepare_excel_for_substrate(excel_name: str):
+@traced()
+def load_and_prepare_excel_for_substrate(excel_name: Union[str, BytesIO]):
     # Load the workbook and select the active sheet
+    if not isinstance(excel_name, str):
+        excel_name.seek(0)
     workbook = load_workbook(excel_name)
     with BytesIO() as buffer:
         workbook.save(buffer)
@@ -421,38 +400,26 @@ def load_and_prepare_excel_for_substrate(excel_name: str):
         return buffer.getvalue()
 
 
-def create_fish_slate_dataframe(response_data: dict, csv_name: str) -> pd.DataFrame:
-    # distances are constants
-    distances = ["0 - 20m", "25 - 45m", "50 - 75m", "75 - 95m"]
+@traced()
+def create_fish_slate_dataframe(response_data: dict, csv_name: Optional[str] = None) -> pd.DataFrame:
+    # one row per species of the slate, counts and clarity per distance
+    info_df = FishSlate.from_response(response_data).to_dataframe()
 
-    main_keys = list(response_data.keys())
-
-    info_df = pd.concat([pd.DataFrame.from_dict(response_data[key_]) for key_ in main_keys])
-    
-    new_columns = []
-    new_columns.append("name")
-    for distance_index in range(len(distances)):
-        new_columns.extend([distances[distance_index], "set_{}_clear".format(distance_index)])
-
-    info_df.columns = new_columns
-
-    # save the dataframe to a csv file
-    info_df.to_csv(csv_name, index=False)
+    # save the dataframe to a csv file only when asked to
+    if csv_name:
+        info_df.to_csv(csv_name, index=False)
 
     return info_df
 
 
-def fish_slate_excel_creation(response_data: dict, info_data: dict, excel_name: str):
-
-    data_list = []
-
-    for key_ in list(response_data.keys()):
-        data_list.extend(response_data[key_])
+@traced()
+def fish_slate_excel_creation(response_data: Union[dict, FishSlate], info_data: dict, excel_name: Optional[Union[str, BytesIO]] = None) -> bytes:
+    slate = fish_slate(response_data)
 
-
-    distances = ["0 - 20m", "25 - 45m", "50 - 75m", "75 - 95m"]
+    distances = DISTANCE_COLUMNS
     # Create a workbook and add a worksheet.
-    workbook = xlsxwriter.Workbook(excel_name)
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
     worksheet = workbook.add_worksheet()
 
     # Add a bold format to use to highlight cells.
@@ -515,23 +482,27 @@ def fish_slate_excel_creation(response_data: dict, info_data: dict, excel_name:
 
     row = 5
     col = 0
-    for key_ in list(response_data.keys()):
-        worksheet.write(row, col, key_, sub_format)
+    for group in FISH_GROUPS:
+        worksheet.write(row, col, group, sub_format)
         row +=1 
-        for data_dict in response_data[key_]:
-            worksheet.write(row, col, data_dict["name"], border)
-            worksheet.write(row, col+1, data_dict["distance_one"], not_clear if not data_dict["distance_one_clear"] else border)
-            worksheet.write(row, col+2, data_dict["distance_two"], not_clear if not data_dict["distance_two_clear"] else border)
-            worksheet.write(row, col+3, data_dict["distance_three"], not_clear if not data_dict["distance_three_clear"] else border)
-            worksheet.write(row, col+4, data_dict["distance_four"], not_clear if not data_dict["distance_four_clear"] else border)
+        names, counts, clear = slate.group_rows(group)
+        for name, count_row, clear_row in zip(names, counts.tolist(), clear.tolist()):
+            worksheet.write(row, col, name, border)
+            for index, (count, is_clear) in enumerate(zip(count_row, clear_row)):
+                worksheet.write(row, col + index + 1, count, border if is_clear else not_clear)
             row += 1
 
 
     workbook.close()
 
+    return write_workbook_bytes(output.getvalue(), excel_name)
+
 
-def load_and_prepare_excel_for_fish_slate(excel_name: str):
+@traced()
+def load_and_prepare_excel_for_fish_slate(excel_name: Union[str, BytesIO]):
     # Load the workbook and select the active sheet
+    if not isinstance(excel_name, str):
+        excel_name.seek(0)
     workbook = load_workbook(excel_name)
     with BytesIO() as buffer:
         workbook.save(buffer)
@@ -540,71 +511,8 @@ def load_and_prepare_excel_for_fish_slate(excel_name: str):
 
 
 def substrate_excel_data_extractor(data: pd.DataFrame) -> dict:
-    suffixes = ["one", "two", "three", "four"]
-    annots = defaultdict(list)
-    column_list = list(data.columns)
-    count = 0
-
-    for index in range(0, 12, 3):
-        distance = data[column_list[index]].to_list()
-        label = data[column_list[index + 1]].to_list()
-        status = data[column_list[index + 2]].to_list()
-
-        for distance_, label_, status_ in zip(distance, label, status):
-            annots["segment_{}".format(suffixes[count])].append({
-                "distance": distance_,
-                "label": label_,
-                "label_status": status_
-            })
-
-        count +=1
-
-    return dict(annots)
-
-
-def extract_fish_details(fish_details: list) -> list:
-    total_records = []
-
-    for record_ in fish_details:
-        sample_dict = {}
-        sample_dict["name"] = record_["name"]
-        sample_dict["distance_one"] = record_["0 - 20m"]
-        sample_dict["distance_one_clear"] = record_["set_0_clear"]
-        sample_dict["distance_two"] = record_["25 - 45m"]
-        sample_dict["distance_two_clear"] = record_["set_1_clear"]
-        sample_dict["distance_three"] = record_["50 - 75m"]
-        sample_dict["distance_three_clear"] = record_["set_2_clear"]
-        sample_dict["distance_four"] = record_["75 - 95m"]
-        sample_dict["distance_four_clear"] = record_["set_3_clear"]
-        total_records.append(sample_dict)
-
-    return total_records
-
-
-def fish_excel_data_extractor(data: pd.DataFrame) -> dict:
-    # get data records
-    records = data.to_dict(orient='records')
-
-    annots = defaultdict(list)
-
-    # original records
-    fish_records = records[: 12]
-    invertebrates_records = records[12: 26]
-    impacts_records = records[26: 33]
-    coral_disease_records = records[33: 35]
-    rare_animals_records = records[35: 39]
-
-    # processed records
-    process_dict = {
-        "fish": fish_records,
-        "invertebrates": invertebrates_records,
-        "impacts": impacts_records,
-        "coral_disease": coral_disease_records,
-        "rare_animals": rare_animals_records
-
-    }
-    
-    for key_ in process_dict.keys():
-        annots[key_].extend(extract_fish_details(process_dict[key_]))
+    return SubstrateGrid.from_dataframe(data).to_response()
+
 
-    return dict(annots)
\ No newline at end of file
+def fish_excel_data_extractor(data: pd.DataFrame) -> FishSlate:
+    return FishSlate.from_dataframe(data)
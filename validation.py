@@ -0,0 +1,268 @@
+import difflib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fish_slate import FISH_GROUPS, DISTANCE_KEYS, normalize_species_name
+from substrate_grid import (
+    SEGMENT_KEYS, SEGMENT_STARTS, POINTS_PER_SEGMENT, POINT_SPACING, SUBSTRATE_LABELS, canonical_distances,
+    parse_distances
+)
+
+
+# label of a point that was not read; shown empty in the editor and the workbook
+MISSING_LABEL = ""
+# a section with fewer usable records than this share is requested again
+MIN_SECTION_SHARE = 0.5
+# difflib ratio a near-miss name has to reach
+LABEL_CUTOFF = 0.6
+SPECIES_CUTOFF = 0.85
+
+# spellings of a crossed-out / empty cell
+_NO_LABEL_ALIASES = {"NOLABEL", "NONE", "NA", "EMPTY", "BLANK", "X", "NL"}
+# characters the model reads in place of letters of a substrate code
+_OCR_LETTERS = str.maketrans({"0": "O", "1": "I", "L": "I", "5": "S", "8": "B"})
+_CODES = {label.upper().replace("_", ""): label for label in SUBSTRATE_LABELS}
+_CANONICAL_DISTANCES = canonical_distances()
+
+_GROUP_SPECIES = {group: {normalize_species_name(name): name for name in names} for group, names in FISH_GROUPS.items()}
+_SPECIES_GROUP = {key: group for group, names in _GROUP_SPECIES.items() for key in names}
+
+
+@dataclass
+class RepairReport:
+    """
+    Outcome of a repair: the repaired output, what was changed and the
+    sections (segments or species groups) too broken to repair, which
+    should be requested again.
+    """
+    output: dict
+    issues: List[str] = field(default_factory=list)
+    failed_sections: List[str] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.issues and not self.failed_sections
+
+
+def match_label(label: Optional[str]) -> Tuple[str, bool]:
+    """
+    Map a label to the SUBSTRATE_LABELS vocabulary.
+
+    Returns:
+        tuple: (label, exact). exact is False for a near miss ("H C" and
+        "hc" are exact, "5D" becomes "SD" as a near miss); MISSING_LABEL when
+        nothing is close enough
+    """
+    if label in _CODES.values():
+        return label, True
+
+    key = re.sub(r"[^A-Z0-9]", "", str(label or "").upper())
+    if not key:
+        # a slash, dash or blank
+        return ("no_label", True) if label else (MISSING_LABEL, False)
+    if key in _CODES:
+        return _CODES[key], True
+    if key in _NO_LABEL_ALIASES:
+        return "no_label", True
+
+    key = key.translate(_OCR_LETTERS)
+    if key in _CODES:
+        return _CODES[key], False
+
+    scores = sorted(((difflib.SequenceMatcher(None, key, code).ratio(), code) for code in _CODES), reverse=True)
+    (best, code), (second, _) = scores[0], scores[1]
+    if best >= LABEL_CUTOFF and best > second:
+        return _CODES[code], False
+    return MISSING_LABEL, False
+
+
+def _slots(distances: np.ndarray, start: float) -> np.ndarray:
+    steps = (distances - start) / POINT_SPACING
+    fits = (np.abs(steps - np.round(steps)) < 1e-6) & (steps >= 0) & (steps < POINTS_PER_SEGMENT)
+    return np.where(fits, np.round(np.nan_to_num(steps)), -1).astype(int)
+
+
+def _segment_slots(distances: np.ndarray, segment_index: int) -> np.ndarray:
+    """
+    Canonical slot (0-39) of every distance of a segment, -1 where it does not fit.
+    Distances counted from the start of the segment (0-19.5) are accepted too.
+    """
+    start = SEGMENT_STARTS[segment_index]
+    slots = _slots(distances, start)
+    if start and (slots >= 0).sum() < MIN_SECTION_SHARE * len(distances):
+        local = _slots(distances, 0.0)
+        if (local >= 0).sum() > (slots >= 0).sum():
+            return local
+    return slots
+
+
+def repair_substrate(response_data: dict) -> RepairReport:
+    """
+    Align a SegmentationLabels result (model_dump()) to the slate grid.
+
+    Every segment is returned with exactly its 40 canonical distances.
+    Records are placed by their distance, falling back to their position
+    when the distance is unusable; a slot read twice keeps the first
+    record. Labels are mapped to the vocabulary (near misses are marked
+    unclear) and slots without a record are filled as unclear with
+    MISSING_LABEL. Segments with less than MIN_SECTION_SHARE of their
+    slots found are listed in failed_sections.
+    """
+    output = {key: value for key, value in response_data.items() if key not in SEGMENT_KEYS}
+    report = RepairReport(output)
+
+    for segment_index, key in enumerate(SEGMENT_KEYS):
+        records = response_data.get(key) or []
+        canonical = _CANONICAL_DISTANCES[segment_index]
+        slots = _segment_slots(parse_distances([record.get("distance") for record in records]), segment_index)
+
+        placed: List[Optional[dict]] = [None] * POINTS_PER_SEGMENT
+        unplaced = []
+        for position, (slot, record) in enumerate(zip(slots.tolist(), records)):
+            if slot >= 0 and placed[slot] is None:
+                placed[slot] = record
+            elif slot < 0:
+                unplaced.append((position, record))
+            else:
+                report.issues.append(f"{key}: distance {record.get('distance')} read twice")
+        for position, record in unplaced:
+            if position < POINTS_PER_SEGMENT and placed[position] is None:
+                placed[position] = record
+                report.issues.append(f"{key}: distance {record.get('distance')!r} placed by position")
+            else:
+                report.issues.append(f"{key}: distance {record.get('distance')!r} dropped")
+
+        found = sum(record is not None for record in placed)
+        if found < MIN_SECTION_SHARE * POINTS_PER_SEGMENT:
+            report.failed_sections.append(key)
+        if found < POINTS_PER_SEGMENT:
+            report.issues.append(f"{key}: {POINTS_PER_SEGMENT - found} distances missing")
+        if len(records) > POINTS_PER_SEGMENT:
+            report.issues.append(f"{key}: {len(records)} records for {POINTS_PER_SEGMENT} distances")
+
+        repaired = []
+        for distance, record in zip(canonical.tolist(), placed):
+            text = f"{distance:g}"
+            if record is None:
+                repaired.append({"distance": text, "label": MISSING_LABEL, "label_status": False})
+                continue
+            label, exact = match_label(record.get("label"))
+            if label != record.get("label"):
+                report.issues.append(f"{key} {text}: label {record.get('label')!r} read as {label!r}")
+            repaired.append({"distance": text, "label": label, "label_status": bool(record.get("label_status")) and exact})
+        output[key] = repaired
+
+    return report
+
+
+def match_species(name: Optional[str], group: Optional[str] = None) -> Optional[str]:
+    """
+    Slate name of a species, matching exact, normalized and near-miss
+    spellings; within group when given. None when nothing is close enough.
+    """
+    names = _GROUP_SPECIES[group] if group else _SPECIES_GROUP
+    key = normalize_species_name(name or "")
+    if key in names:
+        return names[key] if group else _GROUP_SPECIES[names[key]][key]
+
+    close = difflib.get_close_matches(key, list(names), n=1, cutoff=SPECIES_CUTOFF)
+    if not close:
+        return None
+    return names[close[0]] if group else _GROUP_SPECIES[names[close[0]]][close[0]]
+
+
+def _count(value) -> Tuple[int, bool]:
+    """
+    (count, usable) of a count cell; negative or non-numeric counts become 0.
+    """
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        return 0, False
+    return (count, True) if count >= 0 else (0, False)
+
+
+def repair_fish_invert(response_data: dict) -> RepairReport:
+    """
+    Align a SegmentationLabelsFishInvert result (model_dump()) to the slate.
+
+    Every group is returned with exactly its species, in slate order and
+    with the printed names. Rows are matched by name (near misses too),
+    rows filed under the wrong group are moved, and unmatched rows fill the
+    remaining species of their group by position. Species the model left out
+    are added with zero counts marked unclear, as are unusable counts.
+    Groups with less than MIN_SECTION_SHARE of their species matched by name
+    are listed in failed_sections.
+    """
+    output = {key: value for key, value in response_data.items() if key not in FISH_GROUPS}
+    report = RepairReport(output)
+
+    rows: Dict[str, Dict[str, dict]] = {group: {} for group in FISH_GROUPS}
+    unmatched: Dict[str, List[dict]] = {group: [] for group in FISH_GROUPS}
+    for group in FISH_GROUPS:
+        for record in response_data.get(group) or []:
+            home = group
+            name = match_species(record.get("name"), group)
+            if name is None:
+                name = match_species(record.get("name"))
+                if name is None:
+                    unmatched[group].append(record)
+                    continue
+                home = _SPECIES_GROUP[normalize_species_name(name)]
+                report.issues.append(f"{group}: {name!r} moved to {home}")
+
+            if name in rows[home]:
+                report.issues.append(f"{home}: {name!r} read twice")
+                continue
+            if name != record.get("name"):
+                report.issues.append(f"{group}: {record.get('name')!r} read as {name!r}")
+            rows[home][name] = record
+
+    for group, names in FISH_GROUPS.items():
+        group_rows = rows[group]
+        if len(group_rows) < MIN_SECTION_SHARE * len(names):
+            report.failed_sections.append(group)
+
+        free = [name for name in names if name not in group_rows]
+        for name, record in zip(free, unmatched[group]):
+            report.issues.append(f"{group}: {record.get('name')!r} placed as {name!r} by position")
+            group_rows[name] = record
+        for record in unmatched[group][len(free):]:
+            report.issues.append(f"{group}: {record.get('name')!r} dropped")
+
+        repaired = []
+        for name in names:
+            record = group_rows.get(name)
+            if record is None:
+                report.issues.append(f"{group}: {name!r} missing")
+                record = {}
+            row = {"name": name}
+            for key in DISTANCE_KEYS:
+                count, usable = _count(record.get(key))
+                if record and not usable:
+                    report.issues.append(f"{group} {name!r}: {key} {record.get(key)!r} set to 0")
+                row[key] = count
+                row[f"{key}_clear"] = bool(record.get(f"{key}_clear")) and usable
+            repaired.append(row)
+        output[group] = repaired
+
+    return report
+
+
+def validate_substrate(response_data: dict) -> List[str]:
+    """
+    Problems of a SegmentationLabels result, empty when it matches the slate.
+    """
+    report = repair_substrate(response_data)
+    return report.issues + [f"{key}: cannot be repaired" for key in report.failed_sections]
+
+
+def validate_fish_invert(response_data: dict) -> List[str]:
+    """
+    Problems of a SegmentationLabelsFishInvert result, empty when it matches the slate.
+    """
+    report = repair_fish_invert(response_data)
+    return report.issues + [f"{group}: cannot be repaired" for group in report.failed_sections]
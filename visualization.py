@@ -4,6 +4,67 @@ import streamlit as st
 import plotly.express as px
 from datetime import datetime, timedelta
 
+def _plot_daily_counts(daily_counts: pd.Series, days: int) -> None:
+    """
+    Draw the uploads per day chart and summary metrics.
+    
+    Args:
+        daily_counts (pd.Series): Uploads indexed by every day of the window
+        days (int): Number of days shown
+    """
+    # Create a DataFrame for plotting
+    plot_df = pd.DataFrame({
+        'Date': daily_counts.index,
+        'Uploads': daily_counts.values
+    })
+    
+    # Ensure the date column is in the correct format
+    plot_df['Date'] = pd.to_datetime(plot_df['Date']).dt.date
+    
+    # Create the bar chart using Plotly
+    fig = px.bar(
+        plot_df,
+        x='Date',
+        y='Uploads',
+        title=f'Uploads Per Day (Last {days} Days)',
+        labels={'Date': 'Date', 'Uploads': 'Number of Uploads'},
+        color_discrete_sequence=['#1f77b4']
+    )
+    
+    # Update layout for better readability
+    fig.update_layout(
+        xaxis_title='Date',
+        yaxis_title='Number of Uploads',
+        xaxis_tickformat='%b %d, %Y',
+        hovermode='x',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=400
+    )
+    
+    # Add a line connecting the bars
+    fig.add_scatter(
+        x=plot_df['Date'],
+        y=plot_df['Uploads'],
+        mode='lines+markers',
+        line=dict(color='#ff7f0e', width=2),
+        marker=dict(size=8, color='#ff7f0e'),
+        name='Trend',
+        hovertemplate='%{y} uploads on %{x|%b %d, %Y}<extra></extra>'
+    )
+    
+    # Display the chart
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Show some statistics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Uploads", int(daily_counts.sum()))
+    with col2:
+        st.metric("Average Daily Uploads", f"{daily_counts.mean():.1f}")
+    with col3:
+        st.metric("Busiest Day", f"{daily_counts.idxmax().strftime('%b %d, %Y')}")
+
 def plot_uploads_per_day(records_df: pd.DataFrame, days: int = 30) -> None:
     """
     Display a bar chart of uploads per day for the specified number of days.
@@ -40,61 +101,38 @@ def plot_uploads_per_day(records_df: pd.DataFrame, days: int = 30) -> None:
         # Reindex with the complete date range, filling missing values with 0
         daily_counts = daily_counts.reindex(date_range, fill_value=0)
         
-        # Create a DataFrame for plotting
-        plot_df = pd.DataFrame({
-            'Date': daily_counts.index,
-            'Uploads': daily_counts.values
-        })
-        
-        # Ensure the date column is in the correct format
-        plot_df['Date'] = pd.to_datetime(plot_df['Date']).dt.date
-        
-        # Create the bar chart using Plotly
-        fig = px.bar(
-            plot_df,
-            x='Date',
-            y='Uploads',
-            title=f'Uploads Per Day (Last {days} Days)',
-            labels={'Date': 'Date', 'Uploads': 'Number of Uploads'},
-            color_discrete_sequence=['#1f77b4']
-        )
-        
-        # Update layout for better readability
-        fig.update_layout(
-            xaxis_title='Date',
-            yaxis_title='Number of Uploads',
-            xaxis_tickformat='%b %d, %Y',
-            hovermode='x',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=40, b=20),
-            height=400
-        )
-        
-        # Add a line connecting the bars
-        fig.add_scatter(
-            x=plot_df['Date'],
-            y=plot_df['Uploads'],
-            mode='lines+markers',
-            line=dict(color='#ff7f0e', width=2),
-            marker=dict(size=8, color='#ff7f0e'),
-            name='Trend',
-            hovertemplate='%{y} uploads on %{x|%b %d, %Y}<extra></extra>'
-        )
-        
-        # Display the chart
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Show some statistics
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Uploads", int(daily_counts.sum()))
-        with col2:
-            st.metric("Average Daily Uploads", f"{daily_counts.mean():.1f}")
-        with col3:
-            st.metric("Busiest Day", f"{daily_counts.idxmax().strftime('%b %d, %Y')}")
+        _plot_daily_counts(daily_counts, days)
     else:
         st.error("No 'creation_date' column found in the data.")
 
+def _plot_user_counts(user_counts: pd.DataFrame) -> None:
+    """
+    Draw the uploads by user chart.
+    
+    Args:
+        user_counts (pd.DataFrame): Columns 'User' and 'Uploads'
+    """
+    fig = px.bar(
+        user_counts,
+        x='User',
+        y='Uploads',
+        title='Uploads by User',
+        labels={'User': 'User', 'Uploads': 'Number of Uploads'},
+        color='User',
+        color_discrete_sequence=px.colors.qualitative.Plotly
+    )
+    
+    fig.update_layout(
+        xaxis_title='User',
+        yaxis_title='Number of Uploads',
+        showlegend=False,
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=400
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+
 def plot_uploads_by_user(records_df: pd.DataFrame) -> None:
     """
     Display a bar chart of uploads by user.
@@ -110,46 +148,75 @@ def plot_uploads_by_user(records_df: pd.DataFrame) -> None:
         user_counts = records_df['user_name'].value_counts().reset_index()
         user_counts.columns = ['User', 'Uploads']
         
-        fig = px.bar(
-            user_counts,
-            x='User',
-            y='Uploads',
-            title='Uploads by User',
-            labels={'User': 'User', 'Uploads': 'Number of Uploads'},
-            color='User',
-            color_discrete_sequence=px.colors.qualitative.Plotly
-        )
-        
-        fig.update_layout(
-            xaxis_title='User',
-            yaxis_title='Number of Uploads',
-            showlegend=False,
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=40, b=20),
-            height=400
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        _plot_user_counts(user_counts)
     else:
         st.error("No 'user_name' column found in the data.")
 
-def display_upload_analytics(records_df: pd.DataFrame, days: int = 30) -> None:
+def plot_rollup_uploads_per_day(rollups_df: pd.DataFrame, days: int = 30) -> None:
+    """
+    Display the uploads per day chart from the daily rollup counters.
+    
+    Args:
+        rollups_df (pd.DataFrame): Rollups from get_daily_rollups (date, user_id, user_name, uploads)
+        days (int, optional): Number of days to display. Defaults to 30.
+    """
+    if rollups_df.empty:
+        st.warning("No records available to display.")
+        return
+    
+    daily_counts = rollups_df.groupby('date')['uploads'].sum()
+    
+    # Fill the days without a rollup with 0
+    end_date = datetime.utcnow().date()
+    start_date = end_date - timedelta(days=days-1)
+    date_range = pd.date_range(start=start_date, end=end_date, freq='D')
+    daily_counts = daily_counts.reindex(date_range, fill_value=0)
+    
+    _plot_daily_counts(daily_counts, days)
+
+def plot_rollup_uploads_by_user(rollups_df: pd.DataFrame) -> None:
+    """
+    Display the uploads by user chart from the daily rollup counters.
+    
+    Args:
+        rollups_df (pd.DataFrame): Rollups from get_daily_rollups (date, user_id, user_name, uploads)
+    """
+    if rollups_df.empty:
+        st.warning("No records available to display.")
+        return
+    
+    # user names can change over time, so group by id and show the latest name
+    latest_names = rollups_df.sort_values('date').groupby('user_id')['user_name'].last()
+    user_counts = rollups_df.groupby('user_id')['uploads'].sum().sort_values(ascending=False)
+    user_counts = pd.DataFrame({'User': latest_names[user_counts.index].values, 'Uploads': user_counts.values})
+    
+    _plot_user_counts(user_counts)
+
+def display_upload_analytics(records_df: pd.DataFrame, days: int = 30, rollups_df: Optional[pd.DataFrame] = None) -> None:
     """
     Display a dashboard of upload analytics.
     
     Args:
         records_df (pd.DataFrame): DataFrame containing records from DynamoDB
         days (int, optional): Number of days to display. Defaults to 30.
+        rollups_df (pd.DataFrame, optional): Daily rollup counters; when given the
+            charts are drawn from them instead of the raw records. Defaults to None.
     """
     st.header("📊 Upload Analytics")
     
     # Uploads per day chart
     st.subheader("Daily Uploads")
-    plot_uploads_per_day(records_df, days)
+    if rollups_df is not None:
+        plot_rollup_uploads_per_day(rollups_df, days)
+    else:
+        plot_uploads_per_day(records_df, days)
     
     # Uploads by user chart
     st.subheader("Uploads by User")
-    plot_uploads_by_user(records_df)
+    if rollups_df is not None:
+        plot_rollup_uploads_by_user(rollups_df)
+    else:
+        plot_uploads_by_user(records_df)
     
     # Show recent uploads in a table
     st.subheader("Recent Uploads")
@@ -180,3 +247,179 @@ def display_upload_analytics(records_df: pd.DataFrame, days: int = 30) -> None:
         )
     else:
         st.info("No recent uploads to display.")
+
+def display_substrate_cover(site_cover_df: pd.DataFrame) -> None:
+    """
+    Display the substrate percent cover per site.
+    
+    Args:
+        site_cover_df (pd.DataFrame): Output of substrate_analytics.site_cover_frame
+            (site, label, slates, S1-S4, mean_cover, sd_cover)
+    """
+    if site_cover_df.empty:
+        st.info("No substrate results available to summarize.")
+        return
+    
+    # one bar per site, or per site and survey date when split by date
+    plot_df = site_cover_df.copy()
+    if 'date' in plot_df.columns:
+        plot_df['site'] = plot_df['site'] + ' (' + pd.to_datetime(plot_df['date']).dt.strftime('%Y-%m-%d').fillna('no date') + ')'
+    
+    # Stacked bar chart of the mean cover of every label per site
+    fig = px.bar(
+        plot_df,
+        x='site',
+        y='mean_cover',
+        color='label',
+        title='Mean Substrate Cover per Site',
+        labels={'site': 'Site', 'mean_cover': 'Mean Cover', 'label': 'Substrate'},
+        color_discrete_sequence=px.colors.qualitative.Plotly
+    )
+    
+    fig.update_layout(
+        xaxis_title='Site',
+        yaxis_title='Mean Cover',
+        yaxis_tickformat='.0%',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=450
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Sites", site_cover_df['site'].nunique())
+    with col2:
+        st.metric("Slates", int(site_cover_df['slates'].sum() // site_cover_df['label'].nunique()))
+    
+    # Per site table, fractions shown as percentages
+    percent_columns = ['S1', 'S2', 'S3', 'S4']
+    st.dataframe(
+        site_cover_df,
+        column_config={
+            'site': 'Site',
+            'label': 'Substrate',
+            'slates': 'Slates',
+            **{column: st.column_config.NumberColumn(column, format='percent') for column in percent_columns},
+            'mean_cover': st.column_config.NumberColumn('Mean %', format='percent'),
+            'sd_cover': st.column_config.NumberColumn('SD', format='percent'),
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+def display_stage_timings(stage_df: pd.DataFrame) -> None:
+    """
+    Display the p50/p95/p99 duration of every traced pipeline stage.
+    
+    Args:
+        stage_df (pd.DataFrame): Output of tracing.stage_percentiles
+            (stage, calls, errors, p50_ms, p95_ms, p99_ms, mean_ms, max_ms)
+    """
+    if stage_df.empty:
+        st.info("No timings recorded in this window.")
+        return
+    
+    # Grouped bars of the percentiles, slowest stages first
+    plot_df = stage_df.melt(
+        id_vars='stage',
+        value_vars=['p50_ms', 'p95_ms', 'p99_ms'],
+        var_name='percentile',
+        value_name='ms'
+    )
+    plot_df['percentile'] = plot_df['percentile'].str.replace('_ms', '')
+    fig = px.bar(
+        plot_df,
+        x='ms',
+        y='stage',
+        color='percentile',
+        barmode='group',
+        orientation='h',
+        title='Duration per Stage',
+        labels={'ms': 'Milliseconds', 'stage': 'Stage', 'percentile': 'Percentile'},
+        color_discrete_sequence=px.colors.qualitative.Plotly
+    )
+    
+    fig.update_layout(
+        yaxis={'categoryorder': 'array', 'categoryarray': stage_df['stage'].tolist()[::-1]},
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=max(300, 28 * len(stage_df) + 100)
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    ms_format = st.column_config.NumberColumn
+    st.dataframe(
+        stage_df,
+        column_config={
+            'stage': 'Stage',
+            'calls': 'Calls',
+            'errors': 'Errors',
+            'p50_ms': ms_format('p50 ms', format='%.1f'),
+            'p95_ms': ms_format('p95 ms', format='%.1f'),
+            'p99_ms': ms_format('p99 ms', format='%.1f'),
+            'mean_ms': ms_format('Mean ms', format='%.1f'),
+            'max_ms': ms_format('Max ms', format='%.1f'),
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+def display_trace(spans_df: pd.DataFrame) -> None:
+    """
+    Display the spans of one save or job as a timeline.
+    
+    Args:
+        spans_df (pd.DataFrame): Output of tracing.load_spans for one correlation id
+    """
+    if spans_df.empty:
+        st.info("No spans recorded for this ID.")
+        return
+    
+    timeline_df = spans_df.copy()
+    timeline_df['finished_at'] = timeline_df['started_at'] + pd.to_timedelta(timeline_df['duration_ms'], unit='ms')
+    fig = px.timeline(
+        timeline_df,
+        x_start='started_at',
+        x_end='finished_at',
+        y='name',
+        color='status',
+        hover_data=['duration_ms', 'attributes'],
+        title='Spans',
+        labels={'name': 'Stage', 'status': 'Status'}
+    )
+    
+    fig.update_yaxes(autorange='reversed')
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=max(300, 24 * timeline_df['name'].nunique() + 100)
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    total_ms = (timeline_df['finished_at'].max() - timeline_df['started_at'].min()).total_seconds() * 1000
+    st.metric("Total", f"{total_ms:,.0f} ms")
+
+
+def display_cache_stats(cache_stats: Dict[str, int]) -> None:
+    """
+    Display the extraction cache counters of this app process.
+    
+    Args:
+        cache_stats (Dict[str, int]): Output of ExtractionCache.stats (hits, misses, evictions)
+    """
+    lookups = cache_stats['hits'] + cache_stats['misses']
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Cache Hits", cache_stats['hits'])
+    with col2:
+        st.metric("Cache Misses", cache_stats['misses'])
+    with col3:
+        st.metric("Hit Rate", f"{cache_stats['hits'] / lookups:.0%}" if lookups else "–")
+    with col4:
+        st.metric("Evictions", cache_stats['evictions'])
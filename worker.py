@@ -0,0 +1,176 @@
+"""
+Extraction worker for the slate job queue.
+
+The app starts one worker inside its own process (see start_background_worker).
+More workers can be run as separate processes against the same job database:
+
+    python worker.py --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from job_queue import claim_job, complete_job, fail_job, fail_exhausted_jobs, purge_jobs, update_job_partial, renew_job_lease
+from job_queue import JOB_LEASE_SECONDS
+from batch_utils import SLATE_GENERATORS, SLATE_REPAIRERS, SLATE_RECHECKERS, crop_region_kwargs
+from llm import RateLimitGate, submit_coroutine, RECHECK_UNCLEAR
+from tracing import span, trace_context
+
+
+# worker settings (optional "jobs" section in the secrets)
+job_settings = st.secrets.get("jobs", {})
+
+WORKER_CONCURRENCY = int(job_settings.get("WORKER_CONCURRENCY", 4))
+WORKER_POLL_SECONDS = float(job_settings.get("WORKER_POLL_SECONDS", 1.0))
+IN_PROCESS_WORKER = bool(job_settings.get("IN_PROCESS_WORKER", True))
+# the lease of a running job is renewed this often, well before it expires
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 3
+# old finished jobs are purged from the job database this often
+JOB_PURGE_SECONDS = float(job_settings.get("PURGE_SECONDS", 60 * 60))
+
+_BACKGROUND_WORKER = None
+_BACKGROUND_LOCK = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """
+    Raised from the stream callback to stop the extraction of a cancelled job.
+    """
+
+
+async def process_job(job: dict, gate: RateLimitGate) -> None:
+    """
+    Run the extraction for one claimed job and store its outcome.
+
+    The response is streamed: every completed top-level field (a segment or
+    a fish group) is written to the job's partial result right away, and the
+    extraction stops once the job has been cancelled. The output is then
+    aligned to the slate layout, and cells read as unclear get a second,
+    targeted request before the job is completed.
+
+    The lease of the job is renewed while it runs. When the job is no longer
+    running for this worker (cancelled, or its lease expired and another
+    worker claimed it) the extraction is stopped and its result dropped.
+    """
+    job_id, worker_id = job["job_id"], job["worker_id"]
+    sections = {}
+    lease_lost = False
+
+    async def on_section(key, value):
+        sections[key] = value
+        still_running = await asyncio.to_thread(update_job_partial, job_id, worker_id, json.dumps(sections))
+        if not still_running:
+            raise JobCancelled(job_id)
+
+    async def extract():
+        # the job id correlates the extraction spans until the upload has a data_id
+        with trace_context(job_id), span("worker.extraction", slate_type=job["slate_type"]):
+            regions = await crop_region_kwargs(job["slate_type"], job["image"])
+            labels = await SLATE_GENERATORS[job["slate_type"]](job["image"], gate=gate, on_section=on_section, **regions)
+            labels = await SLATE_REPAIRERS[job["slate_type"]](job["image"], labels, gate=gate, **regions)
+            if RECHECK_UNCLEAR:
+                labels = await SLATE_RECHECKERS[job["slate_type"]](job["image"], labels, gate=gate, **regions)
+            return labels
+
+    async def keep_lease(extraction):
+        nonlocal lease_lost
+        while not extraction.done():
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            if not await asyncio.to_thread(renew_job_lease, job_id, worker_id):
+                lease_lost = True
+                extraction.cancel()
+                return
+
+    extraction = asyncio.ensure_future(extract())
+    heartbeat = asyncio.ensure_future(keep_lease(extraction))
+    try:
+        labels = await extraction
+    except JobCancelled:
+        print(f"Job {job_id} is no longer running for this worker")
+        return
+    except asyncio.CancelledError:
+        if lease_lost:
+            print(f"Job {job_id} is no longer running for this worker, dropping its extraction")
+            return
+        await asyncio.to_thread(fail_job, job_id, worker_id, "Worker stopped")
+        raise
+    except Exception as error:
+        print(f"Error processing job {job_id}: {str(error)}")
+        await asyncio.to_thread(fail_job, job_id, worker_id, str(error) or type(error).__name__)
+        return
+    finally:
+        heartbeat.cancel()
+
+    if not await asyncio.to_thread(complete_job, job_id, worker_id, labels.model_dump_json()):
+        print(f"Job {job_id} is no longer running for this worker, dropping its result")
+
+
+async def run_worker(
+    concurrency: int = WORKER_CONCURRENCY,
+    poll_seconds: float = WORKER_POLL_SECONDS,
+    worker_id: str = None
+) -> None:
+    """
+    Claim and process jobs forever, at most concurrency at a time.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    gate = RateLimitGate()
+    running = set()
+    next_purge = 0.0
+
+    while True:
+        while len(running) < concurrency:
+            job = await asyncio.to_thread(claim_job, worker_id)
+            if job is None:
+                break
+            task = asyncio.create_task(process_job(job, gate))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        await asyncio.to_thread(fail_exhausted_jobs)
+        if time.monotonic() >= next_purge:
+            purged = await asyncio.to_thread(purge_jobs)
+            if purged:
+                print(f"Purged {purged} old jobs")
+            next_purge = time.monotonic() + JOB_PURGE_SECONDS
+        await asyncio.sleep(poll_seconds)
+
+
+def start_background_worker(concurrency: int = WORKER_CONCURRENCY):
+    """
+    Start the in-process worker on the shared event loop, once per process.
+
+    Does nothing when IN_PROCESS_WORKER is disabled in the secrets, in which
+    case jobs are only processed by separate worker processes.
+    """
+    global _BACKGROUND_WORKER
+
+    if not IN_PROCESS_WORKER:
+        return None
+
+    with _BACKGROUND_LOCK:
+        if _BACKGROUND_WORKER is None or _BACKGROUND_WORKER.done():
+            _BACKGROUND_WORKER = submit_coroutine(run_worker(concurrency))
+
+    return _BACKGROUND_WORKER
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Extractions in flight at once")
+    parser.add_argument("--poll-seconds", type=float, default=WORKER_POLL_SECONDS, help="Delay between queue polls")
+    args = parser.parse_args()
+
+    # run on the shared loop so the async model client stays bound to a single loop
+    submit_coroutine(run_worker(args.concurrency, args.poll_seconds)).result()
+
+
+if __name__ == "__main__":
+    main()